@@ -0,0 +1,112 @@
+"""
+Scoring one formula for many patients.
+
+Times a Gail-style relative risk and hazard lookup over `--rows` patients,
+with a solver per row (`create_solver(row)(expr)` in a loop), with
+`evaluate_many(expr, rows)`, with `solver_imap(expr, rows)` over
+`--workers` processes and, if NumPy is installed, with
+`evaluate_columns(expr, columns)`, and checks that all give the same
+results. Every row has its own age, number of relatives and age at first
+live birth.
+
+Run from the project root:
+
+    python benchmarks/batch_rows.py [--rows N] [--workers N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from mathjson_solver import create_solver, evaluate_many, solver_imap  # noqa: E402
+from mathjson_solver.solver import NUMPY_AVAILABLE  # noqa: E402
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+    from mathjson_solver import evaluate_columns
+
+RELATIVE_RISK = [
+    "Multiply",
+    1.099,
+    1.698,
+    [
+        "If",
+        [["Equal", "NUMREL", 0], 1.0],
+        [
+            ["Equal", "NUMREL", 1],
+            [
+                "If",
+                [["Equal", "AGEFLB", 0], 1.244],
+                [["Equal", "AGEFLB", 1], 1.548],
+                [["Equal", "AGEFLB", 2], 2.756],
+                1.927,
+            ],
+        ],
+        6.798,
+    ],
+]
+
+EXPRESSION = [
+    "Constants",
+    ["ages", ["Array", 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75]],
+    [
+        "hazards",
+        [
+            "Array",
+            *[2.7e-06, 1.68e-05, 6.03e-05, 0.0001146, 0.0002037, 0.0002808],
+            *[0.0003209, 0.0002938, 0.0003694, 0.0003561, 0.0003078, 0.0003013],
+        ],
+    ],
+    ["Multiply", ["Interp", "ages", "hazards", "age"], RELATIVE_RISK],
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    rows = [
+        {"age": rng.uniform(20, 75), "NUMREL": rng.randint(0, 2), "AGEFLB": i % 4}
+        for i in range(args.rows)
+    ]
+    start = time.perf_counter()
+    looped = [create_solver(row)(EXPRESSION) for row in rows]
+    loop = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = evaluate_many(EXPRESSION, rows)
+    batch = time.perf_counter() - start
+    assert batched == looped
+    timings = [("solver per row", loop), ("evaluate_many", batch)]
+
+    start = time.perf_counter()
+    pooled = list(solver_imap(EXPRESSION, rows, workers=args.workers))
+    timings.append((f"solver_imap x{args.workers}", time.perf_counter() - start))
+    assert pooled == looped
+
+    if NUMPY_AVAILABLE:
+        columns = {
+            name: np.array([row[name] for row in rows])
+            for name in ("age", "NUMREL", "AGEFLB")
+        }
+        start = time.perf_counter()
+        values, fallbacks = evaluate_columns(EXPRESSION, columns)
+        timings.append(("evaluate_columns", time.perf_counter() - start))
+        assert not fallbacks
+        assert np.allclose(values, looped, rtol=1e-12, atol=0)
+
+    print(f"{'method':<18}{'seconds':>10}{'rows/sec':>14}")
+    for name, seconds in timings:
+        print(f"{name:<18}{seconds:>10.3f}{args.rows / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Growth of each construct's evaluation time with the size of its input.
+
+Every entry of the `constructs` dispatch table has one or more cases below:
+a declared complexity and a function building an input of size n. Array
+constructs get arrays of n elements, variadic ones n arguments, `If` and
+`Switch` n cases, `Constants` n bindings and `TrapezoidalIntegrate` n
+steps. Constructs on scalars are declared O(1) and evaluated with n other
+parameters defined, which no construct should have to look at.
+
+Each case is timed at sizes 1e2, 1e3, ... up to `--max-size`, stopping
+early once one evaluation takes longer than `--budget` seconds, and the
+growth exponent k of time ~ n**k is fitted by least squares on the
+largest three sizes. A case is flagged if k exceeds its declared exponent
+(0 for O(1), 1 for O(n) and O(n log n)) by more than `--tolerance`. The
+exit status is 1 if a case is flagged or a construct has no case, so an
+accidentally quadratic construct, or a new construct without a declared
+complexity, fails the run.
+
+Run from the project root (TrapezoidalIntegrate requires numpy):
+
+    python benchmarks/construct_scaling.py [--max-size N] [--construct NAME]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from mathjson_solver import create_solver  # noqa: E402
+from mathjson_solver.solver import NUMPY_AVAILABLE, constructs  # noqa: E402
+
+EXPONENTS = {"1": 0, "n": 1, "n log n": 1}
+
+
+def _array(n):
+    return ["Array"] + list(range(1, n + 1))
+
+
+def _ones(n):
+    return ["Array"] + [1.0] * n
+
+
+_padding = {}
+
+
+def _padded(n):
+    """n parameters the expression does not use, and x = 0.5."""
+    if n not in _padding:
+        _padding.clear()
+        _padding[n] = {f"p{i}": i for i in range(n)}
+        _padding[n]["x"] = 0.5
+    return _padding[n]
+
+
+SCALARS = {
+    "Divide": ["Divide", "x", 2],
+    "Negate": ["Negate", "x"],
+    "Power": ["Power", "x", 2],
+    "Root": ["Root", "x", 3],
+    "Sqrt": ["Sqrt", "x"],
+    "Square": ["Square", "x"],
+    "Exp": ["Exp", "x"],
+    "Log": ["Log", "x", 2],
+    "Log2": ["Log2", "x"],
+    "Log10": ["Log10", "x"],
+    "Ln": ["Ln", "x"],
+    "Lb": ["Lb", "x"],
+    "Lg": ["Lg", "x"],
+    "LogOnePlus": ["LogOnePlus", "x"],
+    "Equal": ["Equal", "x", 1],
+    "IsTrue": ["IsTrue", "x"],
+    "IsFalse": ["IsFalse", "x"],
+    "StrictEqual": ["StrictEqual", "x", 1],
+    "Greater": ["Greater", "x", 1],
+    "GreaterEqual": ["GreaterEqual", "x", 1],
+    "Less": ["Less", "x", 1],
+    "LessEqual": ["LessEqual", "x", 1],
+    "NotEqual": ["NotEqual", "x", 1],
+    "Abs": ["Abs", "x"],
+    "Round": ["Round", "x", 1],
+    "Int": ["Int", "x"],
+    "Float": ["Float", "x"],
+    "Floor": ["Floor", "x"],
+    "Ceil": ["Ceil", "x"],
+    "Str": ["Str", "x"],
+    "Not": ["Not", "x"],
+    "IsDefined": ["IsDefined", "x"],
+    "IsUndefined": ["IsUndefined", "y"],
+    "Strptime": ["Strptime", "2024-03-01", "%Y-%m-%d"],
+    "Strftime": ["Strftime", "2024-03-01", "%d.%m.%Y"],
+    "Today": ["Today"],
+    "Now": ["Now"],
+    "TimeDeltaWeeks": ["TimeDeltaWeeks", 2],
+    "TimeDeltaHours": ["TimeDeltaHours", 2],
+    "TimeDeltaMinutes": ["TimeDeltaMinutes", 2],
+    "TimeDeltaDays": ["TimeDeltaDays", 2],
+    "Function": ["Function", ["Add", "_", 1]],
+    "Variable": ["Constants", ["v", 1], ["Variable", "v"]],
+    "Sin": ["Sin", "x"],
+    "Cos": ["Cos", "x"],
+    "Tan": ["Tan", "x"],
+    "Arcsin": ["Arcsin", "x"],
+    "Arccos": ["Arccos", "x"],
+    "Arctan": ["Arctan", "x"],
+    "Arctan2": ["Arctan2", "x", 1],
+    "Pi": ["Pi"],
+    "Cot": ["Cot", "x"],
+    "Sec": ["Sec", "x"],
+    "Csc": ["Csc", "x"],
+    "Arccot": ["Arccot", "x"],
+    "Arcsec": ["Arcsec", 2],
+    "Arccsc": ["Arccsc", 2],
+    "Sinh": ["Sinh", "x"],
+    "Cosh": ["Cosh", "x"],
+    "Tanh": ["Tanh", "x"],
+    "Coth": ["Coth", "x"],
+    "Sech": ["Sech", "x"],
+    "Csch": ["Csch", "x"],
+    "Arsinh": ["Arsinh", "x"],
+    "Arcosh": ["Arcosh", 2],
+    "Artanh": ["Artanh", "x"],
+    "Arcoth": ["Arcoth", 2],
+    "Arsech": ["Arsech", "x"],
+    "Arcsch": ["Arcsch", "x"],
+    "Hypot": ["Hypot", "x", 1],
+    "Sinc": ["Sinc", "x"],
+    "Degrees": ["Degrees"],
+    "ExponentialE": ["ExponentialE"],
+    "GoldenRatio": ["GoldenRatio"],
+    "Chop": ["Chop", "x"],
+    "Mod": ["Mod", 7, 3],
+    "Clamp": ["Clamp", "x", 0, 1],
+    "GCD": ["GCD", 12, 18],
+    "LCM": ["LCM", 12, 18],
+    "Factorial": ["Factorial", 10],
+    "Binomial": ["Binomial", 10, 3],
+    "IsPrime": ["IsPrime", 97],
+    "Erf": ["Erf", "x"],
+    "Erfc": ["Erfc", "x"],
+    "Xor": ["Xor", "x", 0],
+    "Implies": ["Implies", "x", 0],
+    "Equivalent": ["Equivalent", "x", 0],
+}
+
+
+def _variadic(head, value):
+    return lambda n: ({}, [head] + [value] * n)
+
+
+def _on_array(head, *rest, array=_array):
+    return lambda n: ({}, [head, array(n), *rest])
+
+
+def _cases(n_cases):
+    """["Switch", x, default, [0, 0], [1, 1], ...] with x matching none."""
+    return [[i, i] for i in range(n_cases)]
+
+
+def _constants(n):
+    names = [f"a{i}" for i in range(n)]
+    return {}, ["Constants"] + [[a, i] for i, a in enumerate(names)] + [["Add"] + names]
+
+
+def _if(n):
+    pairs = [[["Equal", "x", i], i] for i in range(n)]
+    return {"x": -1}, ["If"] + pairs + [0]
+
+
+def _reduce_appended(n):
+    return {}, [
+        "Reduce",
+        _array(n),
+        ["Array"],
+        ["Appended", "accumulator", ["Multiply", "current", 2]],
+        ["Variable", "accumulator"],
+        ["Variable", "current"],
+        ["Variable", "index"],
+    ]
+
+
+CASES = [(name, "1", lambda n, e=e: (_padded(n), e)) for name, e in SCALARS.items()]
+CASES += [
+    ("Add", "n", _variadic("Add", 1)),
+    ("Subtract", "n", _variadic("Subtract", 1)),
+    ("Multiply", "n", _variadic("Multiply", 1.0)),
+    ("And", "n", _variadic("And", True)),
+    ("Or", "n", _variadic("Or", False)),
+    ("Nand", "n", _variadic("Nand", True)),
+    ("Nor", "n", _variadic("Nor", False)),
+    ("Array", "n", _variadic("Array", 1)),
+    ("List", "n", _variadic("List", 1)),
+    ("Max", "n", lambda n: ({}, ["Max"] + list(range(n)))),
+    ("Min", "n", lambda n: ({}, ["Min"] + list(range(n)))),
+    ("Join", "n", lambda n: ({}, ["Join"] + [["Array", i] for i in range(n)])),
+    ("Sum", "n", _on_array("Sum")),
+    ("Product", "n", _on_array("Product", array=_ones)),
+    ("Average", "n", _on_array("Average")),
+    ("Mean", "n", _on_array("Mean")),
+    ("Median", "n log n", _on_array("Median")),
+    ("Length", "n", _on_array("Length")),
+    ("Count", "n", _on_array("Count")),
+    ("Any", "n", _on_array("Any")),
+    ("All", "n", _on_array("All")),
+    ("In", "n", lambda n: ({}, ["In", 0, _array(n)])),
+    ("Not_in", "n", lambda n: ({}, ["Not_in", 0, _array(n)])),
+    ("NotIn", "n", lambda n: ({}, ["NotIn", 0, _array(n)])),
+    ("Contains_any_of", "n", _on_array("Contains_any_of", ["Array", 0, -1])),
+    ("Contains_all_of", "n", _on_array("Contains_all_of", ["Array", 1, 2])),
+    ("Contains_none_of", "n", _on_array("Contains_none_of", ["Array", 0, -1])),
+    ("ContainsAnyOf", "n", _on_array("ContainsAnyOf", ["Array", 0, -1])),
+    ("ContainsAllOf", "n", _on_array("ContainsAllOf", ["Array", 1, 2])),
+    ("ContainsNoneOf", "n", _on_array("ContainsNoneOf", ["Array", 0, -1])),
+    ("Map", "n", _on_array("Map", ["Function", ["Add", "_", 1]])),
+    ("StrictMap", "n", _on_array("StrictMap", ["Square"])),
+    ("Filter", "n", _on_array("Filter", ["Function", ["Greater", "_", 5]])),
+    (
+        "HasMatchingSublist",
+        "n",
+        _on_array("HasMatchingSublist", 3, 0, True, ["Less"], 9),
+    ),
+    ("MultiplyByScalar", "n", _on_array("MultiplyByScalar", 2)),
+    ("AddScalar", "n", _on_array("AddScalar", 2)),
+    ("SubtractScalar", "n", _on_array("SubtractScalar", 2)),
+    ("MultiplyByArray", "n", lambda n: ({}, ["MultiplyByArray", _array(n), _array(n)])),
+    ("AddArray", "n", lambda n: ({}, ["AddArray", _array(n), _array(n)])),
+    ("SubtractArray", "n", lambda n: ({}, ["SubtractArray", _array(n), _array(n)])),
+    ("GenerateRange", "n", lambda n: ({}, ["GenerateRange", n])),
+    ("Range", "n", lambda n: ({}, ["Range", n])),
+    ("AtIndex", "n", _on_array("AtIndex", -1)),
+    ("At", "n", _on_array("At", -1)),
+    ("Slice", "n", _on_array("Slice", 1, -1)),
+    ("First", "n", _on_array("First")),
+    ("Last", "n", _on_array("Last")),
+    ("Rest", "n", _on_array("Rest")),
+    ("Most", "n", _on_array("Most")),
+    ("Reverse", "n", _on_array("Reverse")),
+    ("Sort", "n log n", lambda n: ({}, ["Sort", ["Array"] + list(range(n, 0, -1))])),
+    ("IsEmpty", "n", _on_array("IsEmpty")),
+    ("Unique", "n", _on_array("Unique")),
+    ("Zip", "n", lambda n: ({}, ["Zip", _array(n), _array(n)])),
+    ("CumulativeSum", "n", _on_array("CumulativeSum")),
+    ("CumulativeProduct", "n", _on_array("CumulativeProduct", array=_ones)),
+    ("Variance", "n", _on_array("Variance")),
+    ("StandardDeviation", "n", _on_array("StandardDeviation")),
+    ("Appended", "n", _on_array("Appended", 0)),
+    ("Interp", "n", lambda n: ({}, ["Interp", _array(n), _array(n), n / 3])),
+    ("FindIntervalIndex", "n", _on_array("FindIntervalIndex", 2.5)),
+    ("Reduce", "n", _on_array("Reduce", ["Add"], 0)),
+    ("Reduce", "n", _reduce_appended),
+    ("Switch", "n", lambda n: ({}, ["Switch", -1, 0] + _cases(n))),
+    ("StrictSwitch", "n", lambda n: ({}, ["StrictSwitch", -1, 0] + _cases(n))),
+    ("Which", "n", lambda n: ({}, ["Which", -1, 0] + _cases(n))),
+    ("If", "n", _if),
+    ("Constants", "n", _constants),
+]
+if NUMPY_AVAILABLE:
+    CASES.append(
+        (
+            "TrapezoidalIntegrate",
+            "n",
+            lambda n: (
+                {},
+                ["TrapezoidalIntegrate", ["Sin", "t"], 0, 1, n, ["Variable", "t"]],
+            ),
+        )
+    )
+
+
+def time_once(solver, expression):
+    """Seconds per evaluation: the best of 3 runs of a loop taking >= 2 ms."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            solver(expression)
+        elapsed = time.perf_counter() - start
+        if elapsed >= 2e-3:
+            break
+        number *= 10
+    best = elapsed
+    for _ in range(2):
+        start = time.perf_counter()
+        for _ in range(number):
+            solver(expression)
+        best = min(best, time.perf_counter() - start)
+    return best / number
+
+
+def fit_exponent(points):
+    """The least squares slope of log(time) against log(size)."""
+    xs = [math.log(n) for n, _ in points]
+    ys = [math.log(t) for _, t in points]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum(
+        (x - mx) ** 2 for x in xs
+    )
+
+
+def measure(build, max_size, budget):
+    points = []
+    n = 100
+    while n <= max_size:
+        parameters, expression = build(n)
+        seconds = time_once(create_solver(parameters), expression)
+        points.append((n, seconds))
+        if seconds > budget:
+            break
+        n *= 10
+    return points
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-size", type=float, default=1e6)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--construct", action="append", help="(repeatable)")
+    args = parser.parse_args(argv)
+
+    cases = [c for c in CASES if not args.construct or c[0] in args.construct]
+    declared = {name for name, _, _ in CASES}
+    missing = sorted(set(constructs) - declared)
+    if not NUMPY_AVAILABLE:
+        missing.remove("TrapezoidalIntegrate")
+
+    flagged = []
+    print(f"{'construct':<22}{'declared':>10}{'largest n':>11}{'seconds':>12}{'k':>7}")
+    for name, complexity, build in cases:
+        points = measure(build, args.max_size, args.budget)
+        exponent = fit_exponent(points[-3:]) if len(points) > 1 else 0.0
+        worse = exponent > EXPONENTS[complexity] + args.tolerance
+        if worse:
+            flagged.append(name)
+        n, seconds = points[-1]
+        print(
+            f"{name:<22}{'O(' + complexity + ')':>10}{n:>11,}{seconds:>12.6f}"
+            f"{exponent:>7.2f}{'  WORSE' if worse else ''}"
+        )
+    for name in missing:
+        print(f"{name}: no declared complexity", file=sys.stderr)
+    if flagged:
+        print(f"scaling worse than declared: {', '.join(flagged)}", file=sys.stderr)
+    return 1 if flagged or (missing and not args.construct) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
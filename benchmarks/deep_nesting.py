@@ -0,0 +1,108 @@
+"""
+Evaluation of deeply nested expressions with the iterative solver.
+
+Machine-generated formulas nest far deeper than hand-written ones: rule
+builders emit long `If` chains, generated sums are deep `Add` trees, and
+parameters refer to parameters that refer to parameters. This times
+`create_iterative_solver` on each shape at depths of 1k, 10k and 100k, and
+notes whether the recursive interpreter (`create_solver`) copes at all.
+The `If` chains select their innermost rule, so every level is visited.
+
+Run from the project root:
+
+    python benchmarks/deep_nesting.py [--depths 1000,10000,100000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from mathjson_solver import (  # noqa: E402
+    compile_tape,
+    create_iterative_solver,
+    create_solver,
+)
+
+
+def add_tree(depth):
+    expression = 0
+    for _ in range(depth):
+        expression = ["Add", expression, 1]
+    return {}, expression
+
+
+def if_chain(depth):
+    """["If", cond, value, ["If", cond, value, ...]], as CortexJS writes it."""
+    expression = -1
+    for i in range(depth):
+        expression = ["If", ["Equal", "x", i], i, expression]
+    return {"x": 0}, expression
+
+
+def rule_chain(depth):
+    """Python-form If rules, each nested in the default of the previous one."""
+    expression = -1
+    for i in range(depth):
+        expression = ["If", [["Equal", "x", i], i], expression]
+    return {"x": 0}, expression
+
+
+def parameter_chain(depth):
+    parameters = {"p0": 0}
+    for i in range(1, depth):
+        parameters[f"p{i}"] = ["Add", f"p{i - 1}", 1]
+    return parameters, f"p{depth - 1}"
+
+
+SHAPES = {
+    "add tree": add_tree,
+    "if chain": if_chain,
+    "rule chain": rule_chain,
+    "parameter chain": parameter_chain,
+}
+
+
+def interpreter_status(parameters, expression, expected):
+    try:
+        result = create_solver(parameters)(expression)
+    except RecursionError:
+        return "RecursionError"
+    return "ok" if result == expected else "wrong result"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depths", default="1000,10000,100000")
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'shape':<18}{'depth':>8}{'compile s':>12}{'evaluate s':>12}"
+        f"{'nodes/sec':>14}  interpreter"
+    )
+    for depth in (int(d) for d in args.depths.split(",")):
+        for name, build in SHAPES.items():
+            parameters, expression = build(depth)
+            start = time.perf_counter()
+            compile_tape(expression)
+            compiled = time.perf_counter() - start
+
+            # The solver caches the tape on its first call; time the second.
+            solver = create_iterative_solver(parameters)
+            solver(expression)
+            start = time.perf_counter()
+            result = solver(expression)
+            evaluated = time.perf_counter() - start
+
+            print(
+                f"{name:<18}{depth:>8}{compiled:>12.4f}{evaluated:>12.4f}"
+                f"{depth / evaluated:>14,.0f}  "
+                f"{interpreter_status(parameters, expression, result)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Resident memory of a formula library, as lists and as compacted nodes.
+
+A worker keeps thousands of formulas in memory, and most of them are built
+from the same few literal tables. This builds a library of Gail model
+variants, each with its own ages and follow-up, and measures the memory it
+takes as plain nested lists and after `compact`, with `tracemalloc`.
+
+Run from the project root (requires numpy, like the Gail tests):
+
+    python benchmarks/formula_memory.py [--formulas N]
+"""
+
+import argparse
+import copy
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mathjson_solver import compact  # noqa: E402
+from gail_nodes_per_sec import harvest_gail_cases  # noqa: E402
+
+
+def library(size):
+    """`size` copies of the Gail models, each with its own current age."""
+    models = [expression for _, _, expression in harvest_gail_cases()]
+    formulas = []
+    for i in range(size):
+        formula = copy.deepcopy(models[i % len(models)])
+        formulas.append(["Constants", ["current_age", 30 + i / size], formula])
+    return formulas
+
+
+def resident(build):
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--formulas", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    formulas = library(args.formulas)
+    lists = resident(lambda: copy.deepcopy(formulas))
+    nodes = resident(lambda: [compact(x) for x in formulas])
+    print(f"{'representation':<16}{'bytes':>14}{'bytes/formula':>16}")
+    for name, size in (("lists", lists), ("compact nodes", nodes)):
+        print(f"{name:<16}{size:>14,}{size / args.formulas:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Evaluation throughput (nodes/sec) on the Gail model expressions.
+
+The expressions are harvested straight from tests/test_gail_model.py, so
+the benchmark always tracks the real-world models the test suite checks.
+A node is one call of the solver's evaluator; the count is taken in a
+separate, profiled pass so the timed pass runs uninstrumented. With
+`--backend` the same expressions are timed through `compile_expression`
+("closures"), `compile_to_python` ("python") or `compile_tape` ("tape"),
+each compiled once outside the timed region, or through `create_cse_solver`
+("cse"), whose analysis is cached by a solver created outside the timed
+region; the interpreter's node count is kept, so all backends report
+comparable rates.
+
+Run from the project root (requires numpy, like the Gail tests):
+
+    python benchmarks/gail_nodes_per_sec.py [--repeat N] [--backend NAME]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from mathjson_solver import (  # noqa: E402
+    compile_expression,
+    compile_tape,
+    compile_to_python,
+    create_cse_solver,
+    create_solver,
+)
+
+
+class _Harvested(Exception):
+    pass
+
+
+def harvest_gail_cases():
+    """Return (test name, parameters, expression) for each Gail test."""
+    path = os.path.join(ROOT, "tests", "test_gail_model.py")
+    spec = importlib.util.spec_from_file_location("_gail_cases", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    cases = []
+
+    def recording_create_solver(parameters):
+        def record(expression):
+            cases.append((current, parameters, expression))
+            raise _Harvested
+
+        return record
+
+    module.create_solver = recording_create_solver
+    for current in sorted(n for n in dir(module) if n.startswith("test_")):
+        try:
+            getattr(module, current)()
+        except _Harvested:
+            pass
+    return cases
+
+
+def count_nodes(parameters, expression):
+    solver = create_solver(parameters)
+    code = solver.evaluate.__code__
+    count = 0
+
+    def profiler(frame, event, arg):
+        nonlocal count
+        if event == "call" and frame.f_code is code:
+            count += 1
+
+    sys.setprofile(profiler)
+    try:
+        solver(expression)
+    finally:
+        sys.setprofile(None)
+    return count
+
+
+def cse(expression):
+    solvers = {}
+
+    def evaluate(parameters):
+        if id(parameters) not in solvers:
+            solvers[id(parameters)] = create_cse_solver(parameters)
+        return solvers[id(parameters)](expression)
+
+    return evaluate
+
+
+BACKENDS = {
+    "closures": compile_expression,
+    "python": compile_to_python,
+    "tape": compile_tape,
+    "cse": cse,
+}
+
+
+def time_evaluation(parameters, expression, repeat, backend="interpreter"):
+    if backend in BACKENDS:
+        evaluate = BACKENDS[backend](expression)
+    else:
+
+        def evaluate(parameters):
+            return create_solver(parameters)(expression)
+
+    best = float("inf")
+    evaluate(parameters)  # warm up caches outside the timed region
+    for _ in range(repeat):
+        start = time.perf_counter()
+        evaluate(parameters)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--backend", choices=["interpreter"] + list(BACKENDS), default="interpreter"
+    )
+    args = parser.parse_args(argv)
+
+    total_nodes = 0
+    total_seconds = 0.0
+    print(f"{'case':<26}{'nodes':>10}{'seconds':>12}{'nodes/sec':>14}")
+    for name, parameters, expression in harvest_gail_cases():
+        nodes = count_nodes(parameters, expression)
+        seconds = time_evaluation(parameters, expression, args.repeat, args.backend)
+        total_nodes += nodes
+        total_seconds += seconds
+        print(f"{name:<26}{nodes:>10}{seconds:>12.4f}{nodes / seconds:>14,.0f}")
+    print(
+        f"{'total':<26}{total_nodes:>10}{total_seconds:>12.4f}"
+        f"{total_nodes / total_seconds:>14,.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Import time and first evaluation latency of `mathjson_solver`.
+
+Each run starts a fresh interpreter that imports the package under
+`python -X importtime`, then creates a solver and evaluates one formula.
+Reports the median, over `--runs` runs, of the package's cumulative import
+time and of the time from the start of the import to the first result, and
+lists the heavy modules that were imported. Exits with status 1 if the
+median import time is over `--budget-ms`, so it can guard against new
+eager imports.
+
+Run from the project root:
+
+    python benchmarks/import_time.py [--runs N] [--budget-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("numpy", "statistics", "datetime", "concurrent.futures", "re", "typing")
+
+PROGRAM = f"""
+import sys, time
+start = time.perf_counter()
+import mathjson_solver
+solver = mathjson_solver.create_solver({{"weight": 72, "height": 1.8}})
+solver(["Divide", "weight", ["Square", "height"]])
+print((time.perf_counter() - start) * 1000)
+print(",".join(m for m in {HEAVY!r} if m in sys.modules))
+"""
+
+
+def run_once():
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROGRAM],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH=os.path.join(ROOT, "src")),
+    )
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == "mathjson_solver":
+            import_ms = int(fields[1]) / 1000
+    first_ms, loaded = process.stdout.splitlines()
+    return import_ms, float(first_ms), loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    runs = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r[0] for r in runs)
+    first_ms = statistics.median(r[1] for r in runs)
+    print(f"import mathjson_solver      {import_ms:8.1f} ms")
+    print(f"first evaluation latency    {first_ms:8.1f} ms (includes the import)")
+    print(f"heavy modules imported      {runs[0][2] or '-'}")
+    if import_ms > args.budget_ms:
+        print(f"over budget: {import_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
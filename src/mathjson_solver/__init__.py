@@ -1,2 +1,34 @@
-from .__main__ import create_mathjson_solver as create_solver
-from .__main__ import MathJSONException, extract_variables
+from .solver import create_mathjson_solver as create_solver
+from .solver import MathJSONException, Solver, extract_variables
+
+# Everything else is imported from its module when it is first used, so
+# that `import mathjson_solver` loads only the interpreter. `evaluate_columns`
+# also imports NumPy.
+_LAZY = {
+    "compile_expression": "compiler",
+    "compile_to_python": "codegen",
+    "to_python_source": "codegen",
+    "compile_tape": "tape",
+    "create_iterative_solver": "tape",
+    "fold_constants": "optimize",
+    "share_subexpressions": "optimize",
+    "create_cse_solver": "optimize",
+    "compact": "nodes",
+    "evaluate_many": "batch",
+    "solver_imap": "batch",
+    "evaluate_columns": "columnar",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+
+        value = getattr(import_module(f".{_LAZY[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,55 @@
+"""
+Evaluation from asyncio code.
+
+`await solver.evaluate_async(expr)` evaluates `expr` in an executor, so a
+long evaluation (a nested `TrapezoidalIntegrate`, a large `Map`) does not
+block the event loop:
+
+    solver = create_solver(parameters)
+    result = await solver.evaluate_async(expr)
+
+`executor` is a `concurrent.futures` executor, by default the event loop's
+default thread pool. In a thread the evaluation is cancelled cooperatively:
+when the awaiting task is cancelled, the evaluation stops before the next
+node it would evaluate. A `ProcessPoolExecutor` is sent the pickled solver
+and expression; an evaluation that has started in a worker process runs to
+completion even if the task is cancelled.
+
+`providers` maps parameter names to awaitables, or to functions returning
+awaitables, e.g. database lookups. They are awaited concurrently before the
+evaluation begins, and their values are put in front of the solver's
+parameters (see `Solver.with_params`).
+"""
+
+import asyncio
+import inspect
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+async def evaluate_async(solver, expression, providers=None, executor=None):
+    """Evaluate `expression` with `solver` in `executor`; see the module."""
+    if providers:
+        names = list(providers)
+        values = await asyncio.gather(*(_provide(providers[n]) for n in names))
+        solver = solver.with_params(dict(zip(names, values)))
+    loop = asyncio.get_running_loop()
+    if isinstance(executor, ProcessPoolExecutor):
+        return await loop.run_in_executor(executor, _evaluate, solver, expression)
+    cancelled = threading.Event()
+    evaluate = solver.cancellable(cancelled)
+    try:
+        return await loop.run_in_executor(executor, evaluate, expression)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+async def _provide(provider):
+    if not inspect.isawaitable(provider):
+        provider = provider()
+    return await provider
+
+
+def _evaluate(solver, expression):
+    return solver(expression)
@@ -0,0 +1,127 @@
+"""
+Evaluation of one expression over many parameter rows.
+
+Scoring a formula for every row of a table by calling
+`create_solver(row)(expr)` in a loop analyses the expression again for each
+row. `evaluate_many(expr, rows)` compiles it once (see `compile_expression`)
+and evaluates the compiled expression against each row, in order:
+
+    evaluate_many(["Multiply", "weight", 2], [{"weight": 70}, {"weight": 81}])
+    # [140.0, 162.0]
+
+A row that fails does not stop the batch: its result is the
+`MathJSONException` it raised, or one wrapping any other exception, such as
+an `OverflowError`. With `as_array=True` the results are
+collected into an `array("d")` instead of a list, with NaN for rows that
+failed or whose result is not a number.
+
+`solver_imap(expr, rows, workers=N, chunksize=K)` spreads the rows over a
+pool of N worker processes, K rows per task. The expression is sent to and
+compiled by each worker once, when it starts; after that only rows and
+results cross process boundaries. Results are yielded in order, and at most
+two chunks per worker are read ahead of the consumer, so `rows` can be a
+generator over more rows than fit in memory.
+"""
+
+import numbers
+import os
+from array import array
+from collections import deque
+from itertools import islice
+
+from .solver import MathJSONException
+from .compiler import CompiledExpression, compile_expression
+
+_NAN = float("nan")
+
+
+def evaluate_many(expression, rows, as_array=False):
+    """
+    Evaluate `expression` against each parameter dict of the iterable `rows`
+    and return the results in order, as a list or, with `as_array`, as an
+    `array("d")`. `expression` can also be a `CompiledExpression`.
+    """
+    if isinstance(expression, CompiledExpression):
+        compiled = expression
+    else:
+        compiled = compile_expression(expression)
+    if as_array:
+        results = array("d")
+        append = results.append
+        for row in rows:
+            try:
+                value = compiled(row)
+            except Exception:
+                append(_NAN)
+                continue
+            append(float(value) if isinstance(value, numbers.Real) else _NAN)
+        return results
+    results = []
+    append = results.append
+    for row in rows:
+        try:
+            append(compiled(row))
+        except Exception as e:
+            append(_row_error(e, compiled.expression))
+    return results
+
+
+def _row_error(e, expression):
+    """`e` as the `MathJSONException` result of a failed row."""
+    if isinstance(e, MathJSONException):
+        return e
+    error = MathJSONException(e, expression)
+    error.__cause__ = e
+    return error
+
+
+def solver_imap(expression, rows, workers=None, chunksize=1000):
+    """
+    Evaluate `expression` against each parameter dict of the iterable `rows`
+    in `workers` processes (default: one per CPU) and yield the results in
+    order, as `evaluate_many` returns them. Rows are read lazily, `chunksize`
+    at a time. `expression` can also be a `CompiledExpression`; the workers
+    compile its expression again.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    if isinstance(expression, CompiledExpression):
+        expression = expression.expression
+    # Imported here: it loads multiprocessing, which most users never need.
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    rows = iter(rows)
+    pending = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_start_worker, initargs=(expression,)
+    ) as pool:
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < 2 * workers:
+                    chunk = list(islice(rows, chunksize))
+                    if chunk:
+                        pending.append(pool.submit(_evaluate_chunk, chunk))
+                    else:
+                        exhausted = True
+                if not pending:
+                    return
+                yield from pending.popleft().result()
+        finally:
+            # The consumer stopped early: drop the chunks not started yet.
+            for future in pending:
+                future.cancel()
+
+
+# The expression compiled by `_start_worker`, in each worker process.
+_worker_expression = None
+
+
+def _start_worker(expression):
+    global _worker_expression
+    _worker_expression = compile_expression(expression)
+
+
+def _evaluate_chunk(rows):
+    return evaluate_many(_worker_expression, rows)
@@ -0,0 +1,270 @@
+"""
+Macro benchmarks on the real-world models, run as `python -m mathjson_solver.bench`.
+
+The workloads are taken from the project's own test suite, so they track
+the models it checks:
+
+- `gail`: the Gail model expressions of tests/test_gail_model.py;
+- `integration`: the numerical integration cases of
+  docs/integration-test-cases.md, as encoded in
+  tests/test_TrapezoidalIntegratel.py;
+- `state_tuples`: the state tuple `Reduce` patterns of
+  tests/test_state_tuples_reduce.py;
+- `batch_10k`: a relative risk formula scored with `evaluate_many` for
+  `--rows` synthetic patients (10,000 by default).
+
+Each evaluation of the first three is timed as a user would run it,
+`create_solver(parameters)(expression)`; for `batch_10k` one sample is the
+whole batch. For each workload the 50th, 95th and 99th latency percentiles
+and the throughput (evaluations or rows per second) are reported:
+
+    python -m mathjson_solver.bench --repeat 20 --save results.json
+    python -m mathjson_solver.bench --baseline results.json --threshold 0.2
+
+With `--baseline` the median latencies are compared with those of an
+earlier `--save`d run, and the exit status is 1 if any workload is slower
+by more than `--threshold` (a fraction, 0.2 by default). The test files
+are looked for under `--root`, by default the source checkout this module
+is in; a workload whose file is missing, or which needs NumPy when it is
+not installed, is skipped.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from .solver import MathJSONException
+from .solver import create_mathjson_solver as create_solver
+from .batch import evaluate_many
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RELATIVE_RISK = [
+    "Constants",
+    ["age_risk", ["Exp", ["Multiply", 0.0937, ["Subtract", "AGE", 50]]]],
+    [
+        "family_risk",
+        [
+            "If",
+            [["Equal", "NUMREL", 0], 1.0],
+            [["Equal", "NUMREL", 1], 2.607],
+            6.798,
+        ],
+    ],
+    [
+        "Multiply",
+        "age_risk",
+        "family_risk",
+        ["Power", 1.18, "AGEFLB"],
+        ["If", ["Greater", "BIOPSIES", 0], 1.7, 1.0],
+    ],
+]
+
+
+class _Harvested(Exception):
+    pass
+
+
+def harvest(path):
+    """
+    Return (test name, parameters, expression) for each `solver(expression)`
+    call the tests in the file at `path` make, running each test up to its
+    first call. Parametrized tests are run for each set of arguments, tests
+    marked to be skipped are left out.
+    """
+    spec = importlib.util.spec_from_file_location("_bench_cases", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    cases = []
+
+    def recording_create_solver(parameters):
+        def record(expression):
+            cases.append((current, parameters, expression))
+            raise _Harvested
+
+        return record
+
+    module.create_solver = recording_create_solver
+    for name in sorted(n for n in dir(module) if n.startswith("test_")):
+        test = getattr(module, name)
+        marks = getattr(test, "pytestmark", [])
+        if any(m.name == "skipif" and m.args and m.args[0] for m in marks):
+            continue
+        calls = [{}]
+        for mark in marks:
+            if mark.name == "parametrize":
+                names = [n.strip() for n in mark.args[0].split(",")]
+                calls = [dict(zip(names, values)) for values in mark.args[1]]
+        for i, kwargs in enumerate(calls):
+            current = f"{name}[{i}]" if kwargs else name
+            try:
+                test(**kwargs)
+            except _Harvested:
+                pass
+    return cases
+
+
+def synthetic_rows(count, seed=0):
+    generator = random.Random(seed)
+    return [
+        {
+            "AGE": generator.randint(35, 80),
+            "NUMREL": generator.randint(0, 2),
+            "AGEFLB": generator.randint(0, 3),
+            "BIOPSIES": generator.randint(0, 2),
+        }
+        for _ in range(count)
+    ]
+
+
+def percentile(sorted_values, fraction):
+    """The nearest-rank percentile of a sorted, non-empty list."""
+    index = max(
+        0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def summarize(samples, count):
+    """Latency percentiles in ms and throughput for samples of `count` each."""
+    samples = sorted(samples)
+    return {
+        "samples": len(samples),
+        "p50_ms": percentile(samples, 0.50) * 1e3,
+        "p95_ms": percentile(samples, 0.95) * 1e3,
+        "p99_ms": percentile(samples, 0.99) * 1e3,
+        "per_sec": count * len(samples) / sum(samples),
+    }
+
+
+def time_cases(cases, repeat):
+    for _, parameters, expression in cases:  # warm up outside the timed runs
+        _evaluate(parameters, expression)
+    samples = []
+    for _ in range(repeat):
+        for _, parameters, expression in cases:
+            start = time.perf_counter()
+            _evaluate(parameters, expression)
+            samples.append(time.perf_counter() - start)
+    return summarize(samples, 1)
+
+
+def time_batch(rows, repeat):
+    evaluate_many(RELATIVE_RISK, rows[:100])
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        evaluate_many(RELATIVE_RISK, rows)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, len(rows))
+
+
+def _evaluate(parameters, expression):
+    try:
+        return create_solver(parameters)(expression)
+    except MathJSONException:
+        # A case that checks an error is timed up to the error.
+        return None
+
+
+def _harvested(root, name):
+    path = os.path.join(root, "tests", name)
+    if not os.path.exists(path):
+        return None
+    try:
+        return harvest(path) or None
+    except ImportError:
+        # The test module needs pytest, or NumPy, and it is not installed.
+        return None
+
+
+WORKLOADS = {
+    "gail": lambda args: _harvested(args.root, "test_gail_model.py"),
+    "integration": lambda args: _harvested(args.root, "test_TrapezoidalIntegratel.py"),
+    "state_tuples": lambda args: _harvested(args.root, "test_state_tuples_reduce.py"),
+    "batch_10k": lambda args: synthetic_rows(args.rows),
+}
+
+
+def run(args):
+    """Time the selected workloads and return the results as a dict."""
+    workloads = {}
+    for name in args.workload or list(WORKLOADS):
+        work = WORKLOADS[name](args)
+        if work is None:
+            print(f"{name}: skipped, its test cases were not found", file=sys.stderr)
+            continue
+        if name == "batch_10k":
+            workloads[name] = time_batch(work, args.repeat)
+        else:
+            workloads[name] = time_cases(work, args.repeat)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "workloads": workloads,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return (workload, baseline p50, current p50) for each regression."""
+    regressions = []
+    for name, current in results["workloads"].items():
+        before = baseline.get("workloads", {}).get(name)
+        if before is None:
+            continue
+        if current["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            regressions.append((name, before["p50_ms"], current["p50_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m mathjson_solver.bench",
+        description="Time the real-world model workloads and compare them "
+        "with a baseline.",
+    )
+    parser.add_argument(
+        "--workload", action="append", choices=list(WORKLOADS), help="(repeatable)"
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--root", default=_ROOT, help="project root with tests/")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print(f"{'workload':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per sec':>14}")
+    for name, r in results["workloads"].items():
+        print(
+            f"{name:<14}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}"
+            f"{r['p99_ms']:>10.3f}{r['per_sec']:>14,.0f}"
+        )
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(
+                f"regression: {name} p50 {before:.3f} ms -> {after:.3f} ms "
+                f"({after / before - 1:+.0%})",
+                file=sys.stderr,
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
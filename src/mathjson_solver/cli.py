@@ -0,0 +1,229 @@
+"""
+Command line batch evaluation, run as `python -m mathjson_solver.cli`.
+
+Evaluates the expression in a JSON file against each row of a JSONL or CSV
+stream of parameters and writes one result per row, in order:
+
+    python -m mathjson_solver.cli risk.json patients.csv -o scores.jsonl --workers 4
+
+Input is read from the file given or from stdin, output written to `-o` or
+stdout. The formats follow the file extensions (`.csv`, anything else is
+JSONL) and can be set with `--input-format` and `--output-format`. CSV
+fields that look like numbers are passed as numbers, others as strings.
+
+Rows are read, evaluated and written a chunk at a time, so memory use does
+not grow with the input. A row that fails does not stop the run: a JSONL
+result is `{"row": i, "result": value}` or `{"row": i, "error": message}`,
+and CSV output has the columns `row`, `result` (as JSON) and `error`. A row
+fails when its evaluation raises, when it cannot be read (a line that is not
+a JSON object, a CSV record with the wrong number of fields), or when its
+result has no JSON form, such as `Infinity` or `NaN`. The number of rows,
+errors and rows per second are reported on stderr at the end.
+
+`python -m mathjson_solver` runs the same command line.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext
+from itertools import islice
+
+from .solver import MathJSONException
+from .batch import evaluate_many, solver_imap
+from .compiler import compile_expression
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m mathjson_solver.cli",
+        description="Evaluate a MathJSON expression for each row of a JSONL or "
+        "CSV stream of parameters.",
+    )
+    parser.add_argument("expression", help="JSON file with the expression")
+    parser.add_argument("input", nargs="?", default="-", help="rows (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="results (default: stdout)")
+    parser.add_argument("--input-format", choices=("jsonl", "csv"))
+    parser.add_argument("--output-format", choices=("jsonl", "csv"))
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes (default: 1)"
+    )
+    parser.add_argument("--chunksize", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    with open(args.expression) as f:
+        expression = json.load(f)
+    input_format = args.input_format or _format_of(args.input)
+    output_format = args.output_format or _format_of(args.output)
+
+    start = time.perf_counter()
+    rows = errors = 0
+    with _open(args.input, "r", sys.stdin) as source, _open(
+        args.output, "w", sys.stdout
+    ) as target:
+        write = _writer(output_format, target)
+        for result in _evaluate(
+            expression, _reader(input_format, source), args.workers, args.chunksize
+        ):
+            errors += write(rows, result)
+            rows += 1
+    seconds = time.perf_counter() - start
+    print(
+        f"{rows} rows, {errors} errors in {seconds:.3f} s "
+        f"({rows / seconds if seconds else 0:,.0f} rows/sec)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _evaluate(expression, rows, workers, chunksize):
+    """
+    The results for `rows`, in order; a row that could not be read, a
+    `MathJSONException`, is passed through as its result.
+    """
+    # For each row read, its error or None, in order; filled as `readable`
+    # is consumed, so always ahead of the results.
+    read = deque()
+
+    def readable():
+        for row in rows:
+            if isinstance(row, MathJSONException):
+                read.append(row)
+            else:
+                read.append(None)
+                yield row
+
+    for result in _evaluate_rows(expression, readable(), workers, chunksize):
+        while read[0] is not None:
+            yield read.popleft()
+        read.popleft()
+        yield result
+    yield from read
+
+
+def _evaluate_rows(expression, rows, workers, chunksize):
+    if workers > 1:
+        yield from solver_imap(expression, rows, workers, chunksize)
+        return
+    compiled = compile_expression(expression)
+    while True:
+        chunk = list(islice(rows, chunksize))
+        if not chunk:
+            return
+        yield from evaluate_many(compiled, chunk)
+
+
+def _format_of(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _open(path, mode, stream):
+    """`open(path, mode)`, or `stream` for "-"."""
+    return nullcontext(stream) if path == "-" else open(path, mode, newline="")
+
+
+def _reader(input_format, source):
+    """
+    The parameter dicts of `source`, and a `MathJSONException` for each row
+    that cannot be read.
+    """
+    if input_format == "csv":
+        return _csv_rows(source)
+    return _jsonl_rows(source)
+
+
+def _jsonl_rows(source):
+    for line in source:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield _input_error(e, line)
+            continue
+        if isinstance(row, dict):
+            yield row
+        else:
+            yield _input_error(ValueError("Row is not a JSON object"), line)
+
+
+def _csv_rows(source):
+    reader = csv.reader(source)
+    try:
+        fields = next(reader, [])
+    except csv.Error as e:
+        yield _input_error(e, "header")
+        return
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield _input_error(e, f"line {reader.line_num}")
+            continue
+        if not record:
+            continue
+        if len(record) != len(fields):
+            error = ValueError(f"{len(record)} fields, expected {len(fields)}")
+            yield _input_error(error, record)
+            continue
+        yield {k: _csv_value(v) for k, v in zip(fields, record)}
+
+
+def _input_error(e, row):
+    """`e` as the result of a row that could not be read."""
+    error = MathJSONException(e, row.strip() if isinstance(row, str) else row)
+    error.__cause__ = e
+    return error
+
+
+def _csv_value(text):
+    for number in (int, float):
+        try:
+            return number(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _writer(output_format, target):
+    """`write(i, result)`, which writes row `i` and tells if it is an error."""
+    if output_format == "csv":
+        writer = csv.writer(target)
+        writer.writerow(["row", "result", "error"])
+
+        def write(i, result):
+            text, error = _encode(result)
+            writer.writerow([i, text or "", error or ""])
+            return error is not None
+
+        return write
+
+    def write(i, result):
+        text, error = _encode(result)
+        if error is None:
+            target.write(f'{{"row": {i}, "result": {text}}}\n')
+        else:
+            target.write(json.dumps({"row": i, "error": error}) + "\n")
+        return error is not None
+
+    return write
+
+
+def _encode(result):
+    """`(json, None)` for a result, or `(None, message)` for an error."""
+    if isinstance(result, MathJSONException):
+        return None, str(result)
+    try:
+        # Values JSON has no type for, such as dates, are written as text.
+        return json.dumps(result, default=str, allow_nan=False), None
+    except ValueError:
+        return None, f"Result {result!r} has no JSON form"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,564 @@
+"""
+Python source code generation for MathJSON expressions.
+
+`compile_to_python(expr)` turns `expr` into the source of a single Python
+function: straight-line code with local variables for `Constants` bindings,
+real `for` loops for the 6-argument `Reduce`, `Map`, `StrictMap`, `Filter`
+and `TrapezoidalIntegrate`, and `math.*` calls inline. The source is compiled
+once and cached per expression; `.source` exposes it for auditing:
+
+    program = compile_to_python(["Exp", ["Negate", ["Multiply", "rate", "t"]]])
+    program({"rate": 0.1, "t": 2})  # 0.8187...
+    print(program.source)
+
+Constructs without a lowering are evaluated by the interpreter, `f(node, c)`,
+from inside the generated code. Results and errors are identical to
+`create_solver(parameters)(expr)`: constructs that catch errors of their
+branches (the Python form of `If`, `Map`) re-evaluate themselves through the
+interpreter when anything inside them raises, and any error escaping the
+generated function re-evaluates the whole expression through the interpreter,
+which then raises its own `MathJSONException`.
+"""
+
+import builtins
+import math
+import numbers
+
+from . import solver as _solver
+from .solver import (
+    Scope,
+    comparison_safe_converter,
+    constructs,
+    create_mathjson_solver,
+    expanded,
+)
+
+# Inline templates for strict constructs whose function is not simply a
+# `math` or builtin function. Each must behave exactly like the function the
+# construct is declared with in `constructs`.
+_OPERATORS = {
+    "Divide": "({0} / {1})",
+    "Negate": "(-{0})",
+    "Mod": "({0} % {1})",
+    "StrictEqual": "({0} == {1})",
+    "Square": "pow({0}, 2)",
+    "Sqrt": "pow({0}, 1.0 / 2)",
+    "Root": "pow({0}, 1.0 / {1})",
+    "IsFalse": "(not bool({0}))",
+}
+
+_FUNCTION_NAME = "mathjson_expression"
+
+
+class PythonExpression:
+    """A MathJSON expression compiled to a generated Python function."""
+
+    __slots__ = ("expression", "source", "_function")
+
+    def __init__(self, expression, source, function):
+        self.expression = expression
+        self.source = source
+        self._function = function
+
+    def evaluate(self, parameters=None):
+        """Evaluate against `parameters`, as `create_solver(parameters)` would."""
+        f = create_mathjson_solver({} if parameters is None else parameters).evaluate
+        try:
+            return self._function(f, Scope())
+        except Exception:
+            return f(self.expression)
+
+    __call__ = evaluate
+
+    def __repr__(self):
+        return f"PythonExpression({self.expression!r})"
+
+
+def to_python_source(expression):
+    """Return the generated Python source for `expression`."""
+    return _generate(expanded(expression))[0]
+
+
+def compile_to_python(expression):
+    """Generate, compile and cache a Python function for `expression`."""
+    expression = expanded(expression)
+    return _compile_cached(repr(expression), expression)
+
+
+def _compile_cached(key, expression):
+    cached = _cache.get(key)
+    if cached is None:
+        try:
+            source, namespace = _generate(expression)
+            code = compile(source, f"<mathjson {_FUNCTION_NAME}>", "exec")
+        except (SyntaxError, RecursionError, MemoryError):
+            # Nesting too deep for the Python compiler: run interpreted.
+            source = _interpreted_source()
+            code = compile(source, f"<mathjson {_FUNCTION_NAME}>", "exec")
+            namespace = {"_expression": expression}
+        exec(code, namespace)
+        cached = PythonExpression(expression, source, namespace[_FUNCTION_NAME])
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = cached
+    return cached
+
+
+_CACHE_SIZE = 1024
+_cache = {}
+
+
+def _interpreted_source():
+    return f"def {_FUNCTION_NAME}(f, c):\n    return f(_expression, c)\n"
+
+
+# --- Runtime helpers referenced by the generated code ---
+
+
+def _ref(name, f, c):
+    """A symbol that is not a local binding of the generated code."""
+    if name in c:
+        return f(c[name], c)
+    if name in f.solver_parameters:
+        return f.parameter(name, c)
+    return name
+
+
+def _value(value, f, c):
+    """A local binding: the interpreter re-evaluates bound values on use."""
+    if type(value) is float or type(value) is int:
+        return value
+    return f(value, c)
+
+
+def _variable(name, f, c):
+    if name in c:
+        return f(c[name], c)
+    raise KeyError(f"Variable '{name}' is not defined")
+
+
+_HELPERS = {
+    "math": math,
+    "_ref": _ref,
+    "_value": _value,
+    "_variable": _variable,
+    "_switch_key": comparison_safe_converter,
+    "_add_values": _solver._add_values,
+    "_subtract_values": _solver._subtract_values,
+    "_interp_values": _solver._interp_values,
+    "_trapezoidal_rule": _solver._trapezoidal_rule,
+    "_solver": _solver,
+}
+
+
+# --- Code generation ---
+
+
+class _Scope:
+    """Compile-time view of a runtime Scope: its variable and local names."""
+
+    def __init__(self, var, parent=None):
+        self.var = var
+        self.locals = dict(parent.locals) if parent is not None else {}
+
+
+class _Generator:
+    def __init__(self):
+        self.lines = []
+        self.depth = 1
+        self.namespace = dict(_HELPERS)
+        self._constants = {}
+        self._counter = 0
+
+    def emit(self, line):
+        self.lines.append("    " * self.depth + line)
+
+    def fresh(self, prefix):
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+    def constant(self, value):
+        """Name under which `value` itself (not a copy) is reachable."""
+        key = (type(value), id(value))
+        if key not in self._constants:
+            name = self.fresh("_k")
+            self._constants[key] = name
+            self.namespace[name] = value
+        return self._constants[key]
+
+    def literal(self, value):
+        if type(value) in (int, float, bool) and math.isfinite(value):
+            return repr(value)
+        if type(value) is str:
+            return repr(value)
+        return self.constant(value)
+
+    def interpreted(self, s, scope):
+        return f"f({self.constant(s)}, {scope.var})"
+
+    def child_scope(self, scope):
+        child = _Scope(self.fresh("c"), scope)
+        self.emit(f"{child.var} = {scope.var}.child()")
+        return child
+
+    def bind(self, scope, name, value):
+        """Bind `name` to the expression `value` in the runtime and local scope."""
+        var = scope.locals.get(name)
+        if var is None or not var.startswith(scope.var + "_"):
+            var = f"{scope.var}_{self.fresh('v')}"
+            scope.locals[name] = var
+        self.emit(f"{var} = {value}")
+        self.emit(f"{scope.var}[{self.literal(name)}] = {var}")
+        return var
+
+    def expr(self, s, scope):
+        """Emit the statements `s` needs and return an expression for it."""
+        if isinstance(s, numbers.Number):
+            return self.literal(s)
+        if isinstance(s, str):
+            if s in scope.locals:
+                return f"_value({scope.locals[s]}, f, {scope.var})"
+            return f"_ref({self.literal(s)}, f, {scope.var})"
+        if not isinstance(s, list):
+            return self.interpreted(s, scope)
+        if not s:
+            return "None"
+        try:
+            is_construct = s[0] in constructs
+        except TypeError:
+            return self.interpreted(s, scope)
+        if not is_construct:
+            return self.constant(s)
+        lowering = _lowerings.get(s[0])
+        if lowering is None and hasattr(constructs[s[0]], "function"):
+            lowering = _lower_strict
+        result = lowering(self, s, scope) if lowering is not None else None
+        return result if result is not None else self.interpreted(s, scope)
+
+    def assign(self, target, s, scope):
+        self.emit(f"{target} = {self.expr(s, scope)}")
+
+    def deoptimising(self, s, scope, generate):
+        """
+        Run `generate()` (which assigns the result to the returned temporary)
+        and fall back to interpreting `s` if the generated code raises.
+        """
+        self.emit("try:")
+        self.depth += 1
+        target = generate()
+        self.depth -= 1
+        self.emit("except Exception:")
+        self.depth += 1
+        self.emit(f"{target} = {self.interpreted(s, scope)}")
+        self.depth -= 1
+        return target
+
+
+def _generate(expression):
+    g = _Generator()
+    scope = _Scope("c")
+    result = g.expr(expression, scope)
+    g.emit(f"return {result}")
+    header = [
+        f"def {_FUNCTION_NAME}(f, c):",
+        "    # " + repr(expression)[:200].replace("\n", " "),
+    ]
+    return "\n".join(header + g.lines) + "\n", g.namespace
+
+
+def _lower_strict(g, s, scope):
+    construct = constructs[s[0]]
+    function, arity = construct.function, construct.arity
+    if len(s) - 1 < arity:
+        return None
+    args = [g.expr(x, scope) for x in s[1 : arity + 1]]
+    if s[0] in _OPERATORS:
+        return _OPERATORS[s[0]].format(*args)
+    if getattr(math, getattr(function, "__name__", ""), None) is function:
+        call = f"math.{function.__name__}"
+    elif getattr(builtins, getattr(function, "__name__", ""), None) is function:
+        call = function.__name__
+    else:
+        call = g.constant(function)
+    return f"{call}({', '.join(args)})"
+
+
+def _lower_values(helper):
+    def lower(g, s, scope):
+        args = [g.expr(x, scope) for x in s[1:]]
+        return f"{helper}([{', '.join(args)}])"
+
+    return lower
+
+
+def _lower_multiply(g, s, scope):
+    if len(s) < 2:
+        return None
+    args = [g.expr(x, scope) for x in s[1:]]
+    if len(args) == 1:
+        return args[0]
+    return "(" + " * ".join(f"float({a})" for a in args) + ")"
+
+
+def _lower_list(g, s, scope):
+    args = [g.expr(x, scope) for x in s[1:]]
+    return f"['Array', {', '.join(args)}]" if args else "['Array']"
+
+
+def _lower_and_or(g, s, scope):
+    short_circuit = "False" if s[0] == "And" else "True"
+    test = "not " if s[0] == "And" else ""
+    target = g.fresh("t")
+    g.emit(f"{target} = {short_circuit}")
+    opened = 0
+    for x in s[1:]:
+        g.emit(f"if {test}{g.expr(x, scope)}:")
+        g.depth += 1
+        g.emit("pass")
+        g.depth -= 1
+        g.emit("else:")
+        g.depth += 1
+        opened += 1
+    g.emit(f"{target} = {'True' if s[0] == 'And' else 'False'}")
+    g.depth -= opened
+    return target
+
+
+def _branch(g, target, s, scope):
+    g.depth += 1
+    g.assign(target, s, scope)
+    g.depth -= 1
+
+
+def _lower_if(g, s, scope):
+    if len(s) < 3:
+        return None
+    is_cortexjs_form = not isinstance(s[1], list) or (
+        bool(s[1]) and isinstance(s[1][0], str) and s[1][0] in constructs
+    )
+    if is_cortexjs_form:
+        if len(s) not in (3, 4):
+            return None
+        target = g.fresh("t")
+        g.emit(f"if {g.expr(s[1], scope)}:")
+        _branch(g, target, s[2], scope)
+        g.emit("else:")
+        if len(s) == 4:
+            _branch(g, target, s[3], scope)
+        else:
+            g.emit(f"    {target} = None")
+        return target
+
+    if not all(isinstance(x, list) and len(x) == 2 for x in s[1:-1]):
+        return None
+
+    def generate():
+        # A failing condition or branch changes which branch the interpreter
+        # takes; that case is left to `deoptimising`.
+        target = g.fresh("t")
+        opened = 0
+        for condition, value in s[1:-1]:
+            g.emit(f"if {g.expr(condition, scope)}:")
+            _branch(g, target, value, scope)
+            g.emit("else:")
+            g.depth += 1
+            opened += 1
+        g.assign(target, s[-1], scope)
+        g.depth -= opened
+        return target
+
+    return g.deoptimising(s, scope, generate)
+
+
+def _lower_switch(g, s, scope):
+    if len(s) < 3 or not all(isinstance(x, list) and len(x) == 2 for x in s[3:]):
+        return None
+    strict = s[0] == "StrictSwitch"
+    value = g.fresh("t")
+    target = g.fresh("t")
+    g.emit(f"{value} = {g.expr(s[1], scope)}")
+    if not strict:
+        g.emit(f"{value} = _switch_key({value})")
+    opened = 0
+    for key, result in s[3:]:
+        key_expr = g.expr(key, scope)
+        if not strict:
+            key_expr = f"_switch_key({key_expr})"
+        g.emit(f"if {value} == {key_expr}:")
+        _branch(g, target, result, scope)
+        g.emit("else:")
+        g.depth += 1
+        opened += 1
+    g.assign(target, s[2], scope)
+    g.depth -= opened
+    return target
+
+
+def _is_hashable(x):
+    try:
+        hash(x)
+    except TypeError:
+        return False
+    return True
+
+
+def _lower_constants(g, s, scope):
+    if len(s) < 2 or not all(
+        isinstance(x, list) and len(x) >= 2 and _is_hashable(x[0]) for x in s[1:-1]
+    ):
+        return None
+    scope = g.child_scope(scope)
+    for name, value, *_ in s[1:-1]:
+        if isinstance(value, numbers.Number):
+            g.bind(scope, name, g.literal(value))
+            continue
+        # Like the interpreter, a binding that cannot be computed is None.
+        temp = g.fresh("t")
+        g.emit("try:")
+        g.depth += 1
+        g.assign(temp, value, scope)
+        g.depth -= 1
+        g.emit("except Exception:")
+        g.depth += 1
+        g.emit(f"{temp} = None")
+        g.depth -= 1
+        g.bind(scope, name, temp)
+    return g.expr(s[-1], scope)
+
+
+def _is_variable_reference(x):
+    return isinstance(x, list) and len(x) >= 2 and _is_hashable(x[1])
+
+
+def _lower_variable(g, s, scope):
+    if not _is_variable_reference(s):
+        return None
+    if s[1] in scope.locals:
+        return f"_value({scope.locals[s[1]]}, f, {scope.var})"
+    return f"_variable({g.literal(s[1])}, f, {scope.var})"
+
+
+def _lower_interp(g, s, scope):
+    if len(s) < 4:
+        return None
+    args = [g.expr(x, scope) for x in s[1:4]]
+    return f"_interp_values({', '.join(args)}, f, {scope.var})"
+
+
+def _lower_reduce(g, s, scope):
+    # Only the 6-argument Python form; the CortexJS form stays interpreted.
+    if len(s) < 7 or not all(_is_variable_reference(x) for x in s[4:7]):
+        return None
+    elements = g.fresh("t")
+    g.emit(f"{elements} = {g.expr(s[1], scope)}[1:]")
+    initial = g.fresh("t")
+    g.assign(initial, s[2], scope)
+    loop = g.child_scope(scope)
+    accumulator = g.bind(loop, s[4][1], initial)
+    index, current = g.fresh("i"), g.fresh("x")
+    g.emit(f"for {index}, {current} in enumerate({elements}):")
+    g.depth += 1
+    g.bind(loop, s[5][1], current)
+    g.bind(loop, s[6][1], index)
+    body = g.fresh("t")
+    g.assign(body, s[3], loop)
+    g.bind(loop, s[4][1], body)
+    g.depth -= 1
+    return accumulator
+
+
+def _lower_trapezoidal_integrate(g, s, scope):
+    if len(s) < 6 or not _is_variable_reference(s[5]):
+        return None
+    g.emit("if not _solver.NUMPY_AVAILABLE:")
+    g.depth += 1
+    g.emit("raise ImportError('TrapezoidalIntegrate requires numpy')")
+    g.depth -= 1
+    bounds = [g.fresh("t") for _ in range(3)]
+    for target, x in zip(bounds, s[2:5]):
+        g.assign(target, x, scope)
+    start, end, n = bounds
+    values = g.fresh("t")
+    g.emit(f"{values} = []")
+    loop = g.child_scope(scope)
+    point = g.fresh("x")
+    g.emit(f"for {point} in _solver.np.linspace({start}, {end}, {n} + 1):")
+    g.depth += 1
+    g.bind(loop, s[5][1], point)
+    g.emit(f"{values}.append({g.expr(s[1], loop)})")
+    g.depth -= 1
+    return f"_trapezoidal_rule({values}, {start}, {end}, {n})"
+
+
+def _lower_map(g, s, scope):
+    """Map, StrictMap and Filter with a ["Function", body, ...] argument."""
+    if len(s) < 3 or not (
+        isinstance(s[2], list)
+        and len(s[2]) >= 2
+        and s[2][0] == "Function"
+        and all(_is_hashable(p) for p in s[2][2:])
+    ):
+        return None
+    body, params, extra = s[2][1], s[2][2:], s[3:]
+    n_args = 1 + len(extra)
+    if params:
+        names = params[:n_args]
+    else:
+        names = (["_"] if n_args == 1 else []) + [f"_{i}" for i in range(1, n_args + 1)]
+
+    def generate():
+        collection = g.fresh("t")
+        target = g.fresh("t")
+        g.emit(f"{collection} = {g.expr(s[1], scope)}")
+        g.emit(f"{target} = None")
+        g.emit(f"if isinstance({collection}, list):")
+        g.depth += 1
+        g.emit(f"{target} = ['Array']")
+        element = g.fresh("x")
+        g.emit(f"for {element} in {collection}[1:]:")
+        g.depth += 1
+        loop = g.child_scope(scope)
+        arguments = [element] + [g.constant(x) for x in extra]
+        if not params and n_args == 1:
+            arguments = [element] + arguments
+        for name, argument in zip(names, arguments):
+            g.bind(loop, name, argument)
+        result = g.expr(body, loop)
+        if s[0] == "Filter":
+            g.emit(f"if {result}:")
+            g.depth += 1
+            g.emit(f"{target}.append({element})")
+            g.depth -= 1
+        else:
+            g.emit(f"{target}.append({result})")
+        g.depth -= 2
+        return target
+
+    if s[0] == "Map":
+        # Map keeps elements whose function call fails; leave that to the
+        # interpreter.
+        return g.deoptimising(s, scope, generate)
+    return generate()
+
+
+_lowerings = {
+    "Array": lambda g, s, scope: g.constant(s),
+    "List": _lower_list,
+    "Add": _lower_values("_add_values"),
+    "Subtract": _lower_values("_subtract_values"),
+    "Multiply": _lower_multiply,
+    "And": _lower_and_or,
+    "Or": _lower_and_or,
+    "If": _lower_if,
+    "Switch": _lower_switch,
+    "Which": _lower_switch,
+    "StrictSwitch": _lower_switch,
+    "Constants": _lower_constants,
+    "Variable": _lower_variable,
+    "Interp": _lower_interp,
+    "Reduce": _lower_reduce,
+    "TrapezoidalIntegrate": _lower_trapezoidal_integrate,
+    "Map": _lower_map,
+    "StrictMap": _lower_map,
+    "Filter": _lower_map,
+}
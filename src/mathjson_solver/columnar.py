@@ -0,0 +1,828 @@
+"""
+Columnar evaluation of a MathJSON expression with NumPy.
+
+`evaluate_columns(expr, columns)` evaluates `expr` for every row of a cohort
+at once. Parameters that vary by row are passed as 1-d NumPy arrays of equal
+length; any other value is a parameter shared by all rows:
+
+    values, fallbacks = evaluate_columns(
+        ["Multiply", ["Interp", "ages", "hazards", "age"], "relative_risk"],
+        {
+            "age": np.array([31.5, 47.0, 62.2]),
+            "relative_risk": np.array([1.0, 2.1, 1.3]),
+            "ages": ["Array", 20, 30, 40, 50, 60, 70],
+            "hazards": ["Array", 2.7e-6, 6.0e-5, 2.0e-4, 3.2e-4, 3.7e-4, 3.1e-4],
+        },
+    )
+
+Arithmetic, comparisons, `And`/`Or`/`Not`, `Exp`, logarithms, trigonometric
+functions and `Interp` are evaluated as NumPy operations over whole columns,
+`If`, `Switch` and `Which` with `np.select`, and `Constants` binds columns.
+Parts of the expression that do not depend on any column are evaluated once
+by the interpreter. Any other construct falls back to the interpreter row by
+row; `fallbacks` lists those nodes.
+
+`values` is a float64 array with the result of each row, NaN where the row
+raised an error, such as a `MathJSONException` or an `OverflowError`, or its
+result is not a number. Each row's result
+is the one `create_solver(row)(expr)` gives for that row's parameters as
+Python scalars, up to the last bit of the transcendental functions, which
+NumPy may compute differently from `math`. Rows on which a vectorised
+operation would not match the interpreter (a division by zero, a logarithm
+of a non-positive number, an overflow, an argument outside an `Interp` table,
+...) are evaluated again with the interpreter.
+"""
+
+import math
+import numbers
+
+from .solver import (
+    NUMPY_AVAILABLE,
+    ParameterGraph,
+    _add_values,
+    _multiply_values,
+    _names_in,
+    _subtract_values,
+    constructs,
+    create_mathjson_solver,
+)
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+_NUMERIC_KINDS = frozenset("bif")
+
+
+def evaluate_columns(expression, columns):
+    """
+    Evaluate `expression` for every row of `columns` and return
+    `(values, fallbacks)`: a float64 array with one result per row, and the
+    nodes that were evaluated row by row. `columns` maps parameter names to
+    1-d arrays of one length, or to values shared by all rows.
+    """
+    if not NUMPY_AVAILABLE:
+        raise ImportError(
+            "evaluate_columns requires 'numpy'. Install with 'pip install numpy'."
+        )
+    evaluator = _ColumnarEvaluator(columns)
+    with np.errstate(all="ignore"):
+        value, bad = evaluator.evaluate(expression, {})
+        values = evaluator.floats(value)
+        if bad is not None:
+            for i in np.flatnonzero(bad):
+                values[i] = evaluator.row_float(expression, i)
+    return values, evaluator.fallbacks
+
+
+class _Local:
+    """A `Constants` binding, evaluated on first reference."""
+
+    __slots__ = ("expression", "env", "result")
+
+    def __init__(self, expression, env):
+        self.expression = expression
+        self.env = env
+        self.result = None
+
+    def get(self, evaluator):
+        if self.result is None:
+            # Computed for every row, whichever rows first need it.
+            saved, evaluator.active = evaluator.active, None
+            try:
+                self.result = evaluator.evaluate(self.expression, self.env)
+            finally:
+                evaluator.active = saved
+            self.env = None
+        return self.result
+
+
+class _ColumnarEvaluator:
+    """
+    Evaluates nodes to `(value, bad)`. A value is an array with one element
+    per row or a value shared by all rows; `bad` is None or a boolean array
+    of the rows to evaluate again with the interpreter.
+    """
+
+    def __init__(self, columns):
+        self.shared = {}
+        self.columns = {}
+        for name, value in columns.items():
+            if isinstance(value, np.ndarray):
+                self.columns[name] = _normalised(value)
+            else:
+                self.shared[name] = value
+        lengths = {len(x) for x in self.columns.values()}
+        if len(lengths) != 1:
+            raise ValueError("Columns must be 1-d arrays of one length")
+        self.size = lengths.pop()
+        # Row values as Python scalars, for the interpreter.
+        self._rows = {k: v.tolist() for k, v in self.columns.items()}
+        self.parameters = dict(self.shared)
+        self.solver = create_mathjson_solver(self.parameters, parameter_cache=None)
+        self.graph = ParameterGraph(self.shared)
+        self.fallbacks = []
+        self.active = None  # rows whose value is needed, None for all
+        self._names = {}  # id(node) -> names in the node
+        self._expanding = set()
+
+    def evaluate(self, s, env):
+        if isinstance(s, numbers.Number) or s is None:
+            return s, None
+        if isinstance(s, str):
+            return self._symbol(s, env)
+        if not isinstance(s, list) or not s or s[0] not in constructs:
+            return self._interpret(s, env)
+        tainted, _ = self._dependencies(s, env)
+        if not tainted:
+            return self._interpret(s, env)
+        handler = _VECTORISED.get(s[0])
+        if handler is not None:
+            result = handler(self, s, env)
+            if result is not None:
+                return result
+        return self.per_row(s, env)
+
+    def _symbol(self, s, env):
+        if s in env:
+            value, bad = env[s].get(self)
+            if isinstance(value, np.ndarray):
+                if value.dtype.kind in _NUMERIC_KINDS:
+                    return value, bad
+                return self.per_row(s, env)
+            if isinstance(value, (list, str)):
+                # The interpreter evaluates a bound value again where it is
+                # looked up.
+                value, again = self.evaluate(value, env)
+                return value, _or(bad, again)
+            return value, bad
+        if s in self.columns:
+            value = self.columns[s]
+            if value.dtype.kind == "U" and self._may_be_names(value, env):
+                return self.per_row(s, env)
+            return value, None
+        if s in self.shared:
+            value = self.shared[s]
+            if isinstance(value, (list, str)) and value != s:
+                if s in self._expanding:
+                    return self.per_row(s, env)
+                self._expanding.add(s)
+                try:
+                    return self.evaluate(value, env)
+                finally:
+                    self._expanding.discard(s)
+            return value, None
+        return s, None
+
+    def _may_be_names(self, value, env):
+        # The interpreter looks a string up again, so a string that names a
+        # binding or a parameter does not stand for itself.
+        return any(
+            x in env or x in self.columns or x in self.shared
+            for x in np.unique(value).tolist()
+        )
+
+    def names(self, s):
+        """Every string in `s`, memoised by node."""
+        if not isinstance(s, list):
+            return {s} if isinstance(s, str) else set()
+        names = self._names.get(id(s))
+        if names is None:
+            names = self._names[id(s)] = _names_in(s)
+        return names
+
+    def _dependencies(self, s, env):
+        """
+        `(tainted, visible)`: whether `s` can read a column or a row-wise
+        binding, and the local names it can read, directly or through
+        parameter expressions.
+        """
+        names = self.names(s)
+        visible, tainted = set(), False
+        for name in names:
+            if name in env:
+                visible.add(name)
+            elif name in self.columns:
+                tainted = True
+            elif name in self.shared:
+                reachable = self.graph.reachable(name)
+                if reachable is None:
+                    return True, set(env)
+                visible.update(x for x in reachable if x in env)
+                tainted = tainted or not reachable.isdisjoint(self.columns)
+        for name in visible:
+            value, bad = env[name].get(self)
+            tainted = tainted or bad is not None or isinstance(value, np.ndarray)
+        return tainted, visible
+
+    def _interpret(self, s, env):
+        """Evaluate `s`, which reads no column, once with the interpreter."""
+        _, visible = self._dependencies(s, env)
+        scope = {name: env[name].get(self)[0] for name in visible}
+        try:
+            return self.solver(s, scope), None
+        except Exception:
+            return None, self.all_rows()
+
+    def per_row(self, s, env):
+        """Evaluate `s` row by row with the interpreter."""
+        if not any(x is s for x in self.fallbacks):
+            self.fallbacks.append(s)
+        _, visible = self._dependencies(s, env)
+        shared, by_row = {}, {}
+        for name in visible:
+            value = env[name].get(self)[0]
+            if isinstance(value, np.ndarray):
+                by_row[name] = value.tolist()
+            else:
+                shared[name] = value
+        rows = range(self.size) if self.active is None else np.flatnonzero(self.active)
+        values = [None] * self.size
+        bad = np.zeros(self.size, dtype=bool)
+        for i in rows:
+            scope = dict(shared)
+            scope.update((k, v[i]) for k, v in by_row.items())
+            try:
+                values[i] = self._row_solver(i)(s, scope)
+            except Exception:
+                bad[i] = True
+        return _column(values, rows), bad if bad.any() else None
+
+    def _row_solver(self, i):
+        self.parameters.update((k, v[i]) for k, v in self._rows.items())
+        return self.solver
+
+    def row_float(self, expression, i):
+        try:
+            value = self._row_solver(i)(expression)
+        except Exception:
+            return np.nan
+        return float(value) if isinstance(value, numbers.Real) else np.nan
+
+    def floats(self, value):
+        if not isinstance(value, np.ndarray):
+            value = float(value) if isinstance(value, numbers.Real) else np.nan
+            return np.full(self.size, value)
+        if value.dtype.kind in _NUMERIC_KINDS:
+            return value.astype(np.float64)
+        return np.array(
+            [float(x) if isinstance(x, numbers.Real) else np.nan for x in value],
+            dtype=np.float64,
+        )
+
+    def all_rows(self):
+        return np.ones(self.size, dtype=bool)
+
+    def operands(self, nodes, env):
+        values, bad = [], None
+        for x in nodes:
+            value, b = self.evaluate(x, env)
+            values.append(value)
+            bad = _or(bad, b)
+        return values, bad
+
+    def scalar(self, function, *values):
+        """
+        `function` of shared values, as the interpreter computes it; if it
+        raises, every row is evaluated again with the interpreter.
+        """
+        try:
+            return function(*values), None
+        except Exception:
+            return None, self.all_rows()
+
+    def choose(self, env, pairs, default, matches):
+        """
+        The value of the first of `pairs` (condition node, value node) whose
+        `matches(condition value)` is true in each row, else of `default`.
+        """
+        remaining, bad, picks = True, None, []
+        saved = self.active
+        try:
+            for condition, value in pairs:
+                self.active = _restricted(saved, remaining)
+                c, b = self.evaluate(condition, env)
+                bad = _or(bad, _within(b, remaining))
+                match = matches(c)
+                if match is None:
+                    return None
+                take = _and(remaining, match)
+                remaining = _and(remaining, _invert(match))
+                if take is not False:
+                    self.active = _restricted(saved, take)
+                    v, b = self.evaluate(value, env)
+                    bad = _or(bad, _within(b, take))
+                    picks.append((take, v))
+                if remaining is False:
+                    break
+            if remaining is not False:
+                self.active = _restricted(saved, remaining)
+                v, b = self.evaluate(default, env)
+                bad = _or(bad, _within(b, remaining))
+                picks.append((remaining, v))
+        finally:
+            self.active = saved
+        return _select(picks, self.size), bad
+
+
+def _normalised(column):
+    if column.ndim != 1:
+        raise ValueError("Columns must be 1-d arrays of one length")
+    kind = column.dtype.kind
+    if kind == "f":
+        return column.astype(np.float64, copy=False)
+    if kind in "iu":
+        return column.astype(np.int64, copy=False)
+    if kind in "bU":
+        return column
+    return column.astype(object)
+
+
+def _column(values, rows):
+    """Per-row Python values as an array, typed if all needed rows agree."""
+    kinds = {type(values[i]) for i in rows}
+    dtypes = {bool: np.bool_, int: np.int64, float: np.float64}
+    if len(kinds) == 1 and next(iter(kinds)) in dtypes:
+        kind = next(iter(kinds))
+        filler = kind()
+        return np.array(
+            [filler if x is None else x for x in values], dtype=dtypes[kind]
+        )
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _kind(value):
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind
+    if isinstance(value, bool):
+        return "b"
+    if isinstance(value, int):
+        return "i"
+    if isinstance(value, float):
+        return "f"
+    if isinstance(value, str):
+        return "U"
+    return "O"
+
+
+def _or(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a | b
+
+
+def _and(a, b):
+    """Conjunction of row masks, each True, False or a boolean array."""
+    if a is False or b is False:
+        return False
+    if a is True:
+        return b
+    if b is True:
+        return a
+    return a & b
+
+
+def _restricted(active, rows):
+    """`active` rows (None for all) that are among `rows` (a mask)."""
+    rows = _and(True if active is None else active, rows)
+    return None if rows is True else rows
+
+
+def _within(bad, rows):
+    """The `bad` rows (None for none) that are among `rows` (a mask)."""
+    if bad is None or rows is True:
+        return bad
+    if rows is False:
+        return None
+    return bad & rows
+
+
+def _invert(mask):
+    if isinstance(mask, bool):
+        return not mask
+    return ~mask
+
+
+def _truth(value):
+    """Python truthiness of each row, or None where it cannot be vectorised."""
+    if not isinstance(value, np.ndarray):
+        return bool(value)
+    kind = value.dtype.kind
+    if kind == "b":
+        return value
+    if kind in "if":
+        return value != 0
+    if kind == "U":
+        return np.char.str_len(value) > 0
+    return np.array([bool(x) for x in value], dtype=bool)
+
+
+def _select(picks, size):
+    if len(picks) == 1 and picks[0][0] is True:
+        return picks[0][1]
+    kinds = {_kind(v) for _, v in picks}
+    conditions = [np.broadcast_to(take, (size,)) for take, _ in picks]
+    if len(kinds) == 1 and kinds <= _NUMERIC_KINDS:
+        choices = [v for _, v in picks]
+        default = np.zeros((), dtype=np.result_type(*choices))
+        return np.select(conditions, choices, default)
+    # Rows keep their own types, e.g. 1 and 1.0 stay apart for `Equal`.
+    choices = []
+    for _, v in picks:
+        column = np.empty(size, dtype=object)
+        column[:] = v.tolist() if isinstance(v, np.ndarray) else [v] * size
+        choices.append(column)
+    return np.select(conditions, choices, default=None)
+
+
+def _numeric(values):
+    return all(_kind(v) in _NUMERIC_KINDS for v in values)
+
+
+def _floats(value):
+    return np.asarray(value, dtype=np.float64)
+
+
+def _ints(value):
+    return np.asarray(value, dtype=np.int64)
+
+
+# --- Vectorised constructs ---
+#
+# Each is called as `handler(evaluator, s, env)` for a node that depends on a
+# column, and returns `(value, bad)`, or None to evaluate `s` row by row.
+# The `bad` rows of a result include the rows where NumPy does not compute
+# what the interpreter does; those rows are evaluated again.
+
+
+def _unary(vector, invalid=None, overflow=False):
+    """A strict construct of one float argument."""
+
+    def handler(ev, s, env):
+        if len(s) < 2:
+            return None
+        (a,), bad = ev.operands(s[1:2], env)
+        if not isinstance(a, np.ndarray):
+            return ev.scalar(constructs[s[0]].function, a)
+        if not _numeric([a]):
+            return None
+        x = _floats(a)
+        result = vector(x)
+        if invalid is not None:
+            bad = _or(bad, invalid(x))
+        if overflow:
+            bad = _or(bad, np.isinf(result) & np.isfinite(x))
+        return result, bad
+
+    return handler
+
+
+def _integer_preserving(vector):
+    """A strict construct of one argument that keeps ints ints (Negate, Abs)."""
+
+    def handler(ev, s, env):
+        if len(s) < 2:
+            return None
+        (a,), bad = ev.operands(s[1:2], env)
+        if not isinstance(a, np.ndarray):
+            return ev.scalar(constructs[s[0]].function, a)
+        if not _numeric([a]):
+            return None
+        return vector(_ints(a) if a.dtype.kind == "b" else a), bad
+
+    return handler
+
+
+def _square(ev, s, env):
+    if len(s) < 2:
+        return None
+    (a,), bad = ev.operands(s[1:2], env)
+    if not isinstance(a, np.ndarray):
+        return ev.scalar(constructs[s[0]].function, a)
+    if not _numeric([a]):
+        return None
+    if a.dtype.kind == "f":
+        result = a * a
+        return result, _or(bad, np.isinf(result) & np.isfinite(a))
+    a = _ints(a)
+    # Beyond this the square does not fit in int64.
+    return a * a, _or(bad, np.abs(a) > 3037000499)
+
+
+def _power(ev, s, env):
+    if len(s) < 3:
+        return None
+    (a, b), bad = ev.operands(s[1:3], env)
+    if not (isinstance(a, np.ndarray) or isinstance(b, np.ndarray)):
+        return ev.scalar(pow, a, b)
+    if not _numeric([a, b]) or "f" not in (_kind(a), _kind(b)):
+        # int ** int is an int or a float depending on the sign of the
+        # exponent.
+        return None
+    x, y = _floats(a), _floats(b)
+    result = np.power(x, y)
+    invalid = (
+        ((x < 0) & (y != np.floor(y)))
+        | ((x == 0) & (y < 0))
+        | (~np.isfinite(result) & np.isfinite(x) & np.isfinite(y))
+    )
+    return result, _or(bad, np.broadcast_to(invalid, (ev.size,)))
+
+
+def _divide(ev, s, env):
+    if len(s) < 3:
+        return None
+    (a, b), bad = ev.operands(s[1:3], env)
+    if not (isinstance(a, np.ndarray) or isinstance(b, np.ndarray)):
+        return ev.scalar(constructs["Divide"].function, a, b)
+    if not _numeric([a, b]):
+        return None
+    x, y = _floats(a), _floats(b)
+    return x / y, _or(bad, np.broadcast_to(y == 0, (ev.size,)))
+
+
+def _log(ev, s, env):
+    if len(s) == 2:
+        return _LOG10(ev, s, env)
+    if len(s) < 3:
+        return None
+    (a, b), bad = ev.operands(s[1:3], env)
+    if not (isinstance(a, np.ndarray) or isinstance(b, np.ndarray)):
+        return ev.scalar(math.log, a, b)
+    if not _numeric([a, b]):
+        return None
+    x, y = _floats(a), _floats(b)
+    invalid = (x <= 0) | (y <= 0) | (y == 1)
+    return np.log(x) / np.log(y), _or(bad, np.broadcast_to(invalid, (ev.size,)))
+
+
+def _add(ev, s, env):
+    values, bad = ev.operands(s[1:], env)
+    if not any(isinstance(v, np.ndarray) for v in values):
+        return ev.scalar(_add_values, values)
+    if not _numeric(values):
+        return None
+    total = _floats(values[0])
+    for v in values[1:]:
+        total = total + _floats(v)
+    return total, bad
+
+
+def _multiply(ev, s, env):
+    values, bad = ev.operands(s[1:], env)
+    if not any(isinstance(v, np.ndarray) for v in values):
+        return ev.scalar(_multiply_values, values)
+    if len(values) == 1:
+        return values[0], bad
+    if not _numeric(values):
+        return None
+    product = _floats(values[0])
+    for v in values[1:]:
+        product = product * _floats(v)
+    return product, bad
+
+
+def _subtract(ev, s, env):
+    values, bad = ev.operands(s[1:], env)
+    if not any(isinstance(v, np.ndarray) for v in values):
+        return ev.scalar(_subtract_values, values)
+    if len(values) == 1:
+        return values[0], bad
+    if not _numeric(values):
+        return None
+    # Python subtracts ints as ints and anything else as floats, left to
+    # right; int64 is exact for the int rows as long as nothing overflows.
+    convert = _floats if "f" in {_kind(v) for v in values} else _ints
+    difference = convert(values[0])
+    for v in values[1:]:
+        if _kind(v) == "f" and convert is _ints:
+            return None
+        difference = difference - convert(v)
+    return difference, bad
+
+
+def _comparison(vector):
+    def handler(ev, s, env):
+        if len(s) < 3:
+            return None
+        (a, b), bad = ev.operands(s[1:3], env)
+        if not (isinstance(a, np.ndarray) or isinstance(b, np.ndarray)):
+            return ev.scalar(constructs[s[0]].function, a, b)
+        if not _numeric([a, b]):
+            return None
+        result = vector(_floats(a), _floats(b))
+        return np.broadcast_to(result, (ev.size,)), bad
+
+    return handler
+
+
+def _equal_rows(a, b, size):
+    """`Equal` of each row, or None where it cannot be vectorised."""
+    if not (isinstance(a, np.ndarray) or isinstance(b, np.ndarray)):
+        return constructs["Equal"].function(a, b)
+    ka, kb = _kind(a), _kind(b)
+    if ka == "U" and kb == "U":
+        result = a == b
+    elif ka in "bi" and kb in "bi":
+        result = _ints(a) == _ints(b)
+    elif ka == "f" and kb == "f":
+        # `Equal` compares the text of its arguments: -0.0 is not 0.0 and a
+        # NaN is equal to a NaN.
+        x, y = _floats(a), _floats(b)
+        same = (x == y) & (np.signbit(x) == np.signbit(y))
+        result = same | (np.isnan(x) & np.isnan(y))
+    elif {ka, kb} <= _NUMERIC_KINDS:
+        # The text of an int never equals the text of a float.
+        result = False
+    else:
+        return None
+    return np.broadcast_to(result, (size,))
+
+
+def _equal(negate):
+    def handler(ev, s, env):
+        if len(s) < 3:
+            return None
+        (a, b), bad = ev.operands(s[1:3], env)
+        if not (isinstance(a, np.ndarray) or isinstance(b, np.ndarray)):
+            return ev.scalar(constructs[s[0]].function, a, b)
+        result = _equal_rows(a, b, ev.size)
+        if result is None:
+            return None
+        return (~result if negate else result), bad
+
+    return handler
+
+
+def _truth_of(negate):
+    def handler(ev, s, env):
+        if len(s) < 2:
+            return None
+        (a,), bad = ev.operands(s[1:2], env)
+        if not isinstance(a, np.ndarray):
+            return ev.scalar(constructs[s[0]].function, a)
+        result = _truth(a)
+        return (~result if negate else result), bad
+
+    return handler
+
+
+def _not(ev, s, env):
+    # `Not` evaluates its argument without the local scope.
+    if len(s) < 2:
+        return None
+    value, bad = ev.evaluate(s[1], {})
+    result = _truth(value)
+    return (not result if isinstance(result, bool) else ~result), bad
+
+
+def _and_or(is_and):
+    def handler(ev, s, env):
+        # Short-circuits per row: an operand only matters to the rows that
+        # have not been decided by the ones before it.
+        undecided, bad = True, None
+        saved = ev.active
+        try:
+            for x in s[1:]:
+                ev.active = _restricted(saved, undecided)
+                value, b = ev.evaluate(x, env)
+                bad = _or(bad, _within(b, undecided))
+                truth = _truth(value)
+                undecided = _and(undecided, truth if is_and else _invert(truth))
+                if undecided is False:
+                    break
+        finally:
+            ev.active = saved
+        if isinstance(undecided, bool):
+            return undecided if is_and else not undecided, bad
+        return (undecided if is_and else ~undecided), bad
+
+    return handler
+
+
+def _if(ev, s, env):
+    if len(s) < 3:
+        return None
+    is_cortexjs_form = not isinstance(s[1], list) or (
+        bool(s[1]) and isinstance(s[1][0], str) and s[1][0] in constructs
+    )
+    if is_cortexjs_form:
+        if len(s) not in (3, 4):
+            return None
+        default = s[3] if len(s) == 4 else None
+        return ev.choose(env, [(s[1], s[2])], default, _truth)
+    if any(not isinstance(x, list) or len(x) != 2 for x in s[1:-1]):
+        return None
+    # A failing condition or branch is recovered from by the interpreter;
+    # such rows are bad, so they are evaluated again.
+    return ev.choose(env, [tuple(x) for x in s[1:-1]], s[-1], _truth)
+
+
+def _switch(ev, s, env):
+    if len(s) < 3 or any(not isinstance(x, list) or len(x) != 2 for x in s[3:]):
+        return None
+    value, bad = ev.evaluate(s[1], env)
+    result = ev.choose(
+        env,
+        [tuple(x) for x in s[3:]],
+        s[2],
+        lambda key: _equal_rows(value, key, ev.size),
+    )
+    if result is None:
+        return None
+    return result[0], _or(bad, result[1])
+
+
+def _constants(ev, s, env):
+    if any(
+        not isinstance(x, list) or len(x) < 2 or not isinstance(x[0], str)
+        for x in s[1:-1]
+    ):
+        return None
+    inner = dict(env)
+    for x in s[1:-1]:
+        # Each binding sees the bindings before it.
+        inner[x[0]] = _Local(x[1], dict(inner))
+    return ev.evaluate(s[-1], inner)
+
+
+def _interp(ev, s, env):
+    if len(s) < 4:
+        return None
+    (xs, ys, t), bad = ev.operands(s[1:4], env)
+    if not isinstance(t, np.ndarray) or not _numeric([t]):
+        return None
+    if not all(isinstance(a, list) and a and a[0] == "Array" for a in (xs, ys)):
+        return None
+    xs, ys = xs[1:], ys[1:]
+    if not all(type(x) in (int, float) for x in xs) or len(xs) != len(ys):
+        return None
+    if len(xs) < 2 or not all(type(y) is float for y in ys):
+        return None
+    x = np.array(xs, dtype=np.float64)
+    y = np.array(ys, dtype=np.float64)
+    if not (np.diff(x) > 0).all():
+        return None
+    target = _floats(t)
+    # First interval [x[i - 1], x[i]] holding the target, as the interpreter
+    # scans them; a target on a knot takes that knot's value.
+    i = np.clip(np.searchsorted(x, target, side="left"), 1, len(x) - 1)
+    x1, x2, y1, y2 = x[i - 1], x[i], y[i - 1], y[i]
+    result = y1 + (y2 - y1) * (target - x1) / (x2 - x1)
+    result = np.where(target == x1, y1, np.where(target == x2, y2, result))
+    outside = ~((x[0] <= target) & (target <= x[-1]))
+    return result, _or(bad, outside)
+
+
+_LOG10 = _unary(np.log10, lambda x: x <= 0)
+_POSITIVE = _unary(np.log, lambda x: x <= 0)
+_FINITE = lambda x: np.isinf(x)  # noqa: E731
+_UNIT = lambda x: np.abs(x) > 1  # noqa: E731
+
+_VECTORISED = {
+    "Add": _add,
+    "Subtract": _subtract,
+    "Multiply": _multiply,
+    "Divide": _divide,
+    "Negate": _integer_preserving(np.negative),
+    "Abs": _integer_preserving(np.abs),
+    "Power": _power,
+    "Sqrt": _unary(lambda x: np.power(x, 0.5), lambda x: x < 0),
+    "Square": _square,
+    "Exp": _unary(np.exp, overflow=True),
+    "Ln": _POSITIVE,
+    "Log": _log,
+    "Log2": _unary(np.log2, lambda x: x <= 0),
+    "Lb": _unary(np.log2, lambda x: x <= 0),
+    "Log10": _LOG10,
+    "Lg": _LOG10,
+    "LogOnePlus": _unary(np.log1p, lambda x: x <= -1),
+    "Sin": _unary(np.sin, _FINITE),
+    "Cos": _unary(np.cos, _FINITE),
+    "Tan": _unary(np.tan, _FINITE),
+    "Arcsin": _unary(np.arcsin, _UNIT),
+    "Arccos": _unary(np.arccos, _UNIT),
+    "Arctan": _unary(np.arctan),
+    "Sinh": _unary(np.sinh, overflow=True),
+    "Cosh": _unary(np.cosh, overflow=True),
+    "Tanh": _unary(np.tanh),
+    "Equal": _equal(False),
+    "NotEqual": _equal(True),
+    "Greater": _comparison(np.greater),
+    "GreaterEqual": _comparison(np.greater_equal),
+    "Less": _comparison(np.less),
+    "LessEqual": _comparison(np.less_equal),
+    "IsTrue": _truth_of(False),
+    "IsFalse": _truth_of(True),
+    "Not": _not,
+    "And": _and_or(True),
+    "Or": _and_or(False),
+    "If": _if,
+    "Switch": _switch,
+    "Which": _switch,
+    "Constants": _constants,
+    "Interp": _interp,
+}
@@ -0,0 +1,517 @@
+"""
+Compilation of MathJSON expressions into trees of Python closures.
+
+`compile_expression(expr)` walks `expr` once and turns every node into a
+closure called as `node(f, c)`, where `f` is the evaluator of a solver (see
+`create_mathjson_solver`) and `c` the local `Scope`. Construct lookup, the
+`If` calling-convention detection, `Reduce` arity checks and the like happen
+at compile time, so evaluating the same formula against many parameter sets
+skips all of that work:
+
+    compiled = compile_expression(["Add", "x", ["Multiply", "y", 2]])
+    compiled({"x": 1, "y": 2})  # 5.0
+    compiled({"x": 3, "y": 4})  # 11.0
+
+Only the common constructs are specialised. Any other node, and any node
+whose shape the interpreter would reject, is compiled into a call of the
+interpreter's own construct, so results and `MathJSONException`s are always
+the same as `create_solver(parameters)(expr)`.
+
+Symbols are resolved at compile time too. A name bound by an enclosing
+`Constants`, `Reduce` or `TrapezoidalIntegrate` of the compiled tree is a
+local: it gets a slot in a frame created per evaluation, and reading it is an
+indexed load. Any other name can only be a parameter, or else stands for
+itself, so it is looked up in the parameters without probing the scope.
+Binding constructs still write the scope as well, for the constructs and
+parameter expressions that the interpreter evaluates. `symbols` records how
+each name was classified, and `unknown_symbols` lists the names that are
+neither locals, parameters declared with `compile_expression(expr,
+parameters=...)`, nor construct names, e.g. misspelt parameters:
+
+    compiled = compile_expression(["Add", "wieght", 1], parameters=["weight"])
+    compiled.unknown_symbols  # frozenset({'wieght'})
+
+Without declared parameters nothing can be told apart from a parameter: any
+other name is classified as "free" and `unknown_symbols` is None.
+
+Subtrees left to the interpreter are not resolved, and their names are not
+checked.
+"""
+
+import numbers
+
+from . import solver as _solver
+from .solver import (
+    LazyBinding,
+    MathJSONException,
+    Scope,
+    comparison_safe_converter,
+    constructs,
+    create_mathjson_solver,
+    expanded,
+)
+
+# Errors that the interpreter turns into a MathJSONException naming the
+# construct that raised them.
+_WRAPPED_ERRORS = (TypeError, ValueError, IndexError, ZeroDivisionError)
+
+
+class CompiledExpression:
+    """A MathJSON expression resolved into a reusable closure tree."""
+
+    __slots__ = ("expression", "symbols", "_root", "_frame_size", "_declared")
+
+    def __init__(self, expression, parameters=None):
+        self.expression = expression = expanded(expression)
+        env = _Environment(_Resolution(parameters))
+        self._root = _compile(expression, env)
+        self._frame_size = env.resolution.frame_size
+        self.symbols = env.resolution.symbols
+        self._declared = parameters is not None
+
+    @property
+    def unknown_symbols(self):
+        """
+        Names that are neither locals, declared parameters nor constructs,
+        or None if the parameters were not declared.
+        """
+        if not self._declared:
+            return None
+        return frozenset(k for k, v in self.symbols.items() if v == "literal")
+
+    def evaluate(self, parameters=None):
+        """Evaluate against `parameters`, as `create_solver(parameters)` would."""
+        solver = create_mathjson_solver({} if parameters is None else parameters)
+        return self.evaluate_with(solver.evaluate)
+
+    def evaluate_with(self, f):
+        """
+        Evaluate with the evaluator `f` of a solver (`solver.evaluate`), as
+        `f(expression)` would, using its parameters and parameter cache.
+        """
+        f.start_evaluation()
+        return self._root(_frame(f, self._frame_size), Scope())
+
+    __call__ = evaluate
+
+    def __repr__(self):
+        return f"CompiledExpression({self.expression!r})"
+
+
+def _frame(f, size):
+    """`f` with `size` fresh local slots, for one evaluation."""
+
+    def frame(s, c=None):
+        return f(s, c)
+
+    frame.slots = [None] * size
+    frame.solver_parameters = f.solver_parameters
+    frame.parameter_graph = f.parameter_graph
+    frame.parameter_cache = f.parameter_cache
+    frame.parameter = f.parameter
+    return frame
+
+
+def compile_expression(expression, parameters=None):
+    """
+    Compile `expression` once for evaluation against many parameter sets.
+    `parameters` optionally declares the parameter names (any iterable of
+    names, e.g. a dict of sample parameters), for `unknown_symbols`; it does
+    not restrict the parameters the expression can be evaluated against.
+    """
+    return CompiledExpression(expression, parameters)
+
+
+class _Resolution:
+    """What symbol resolution found in one compiled expression."""
+
+    __slots__ = ("parameters", "symbols", "frame_size")
+
+    def __init__(self, parameters):
+        # None when undeclared: any free name may then be a parameter.
+        self.parameters = None if parameters is None else frozenset(parameters)
+        # name -> "local", "parameter", "construct", "literal" or "free"
+        self.symbols = {}
+        self.frame_size = 0
+
+    def record(self, name, kind):
+        # A name that is also free somewhere is reported by its free kind.
+        if kind != "local" or name not in self.symbols:
+            self.symbols[name] = kind
+
+
+class _Environment:
+    """The local names in scope at a point of the tree, and their slots."""
+
+    __slots__ = ("resolution", "names")
+
+    def __init__(self, resolution, names=None):
+        self.resolution = resolution
+        self.names = {} if names is None else names
+
+    def bind(self, names):
+        """A new environment with a fresh slot for each of `names`."""
+        bound = dict(self.names)
+        for name in names:
+            bound[name] = self.resolution.frame_size
+            self.resolution.frame_size += 1
+        return _Environment(self.resolution, bound)
+
+    def resolve(self, name):
+        """The slot of local `name`, or None after recording its kind."""
+        slot = self.names.get(name)
+        if slot is not None:
+            self.resolution.record(name, "local")
+            return slot
+        parameters = self.resolution.parameters
+        if parameters is not None and name in parameters:
+            self.resolution.record(name, "parameter")
+        elif name in constructs:
+            self.resolution.record(name, "construct")
+        elif parameters is None:
+            self.resolution.record(name, "free")
+        else:
+            self.resolution.record(name, "literal")
+        return None
+
+
+def _compile(s, env):
+    if isinstance(s, numbers.Number):
+        return _constant(s)
+    if isinstance(s, str):
+        slot = env.resolve(s)
+        return _free_symbol(s) if slot is None else _local_symbol(slot)
+    if not isinstance(s, list):
+        return _interpreted(s)
+    if not s:
+        return _constant(None)
+    try:
+        is_construct = s[0] in constructs
+    except TypeError:
+        # Unhashable head: let the interpreter raise exactly as it would.
+        return _interpreted(s)
+    if not is_construct:
+        return _constant(s)
+    lowering = _lowerings.get(s[0])
+    if lowering is None and hasattr(constructs[s[0]], "function"):
+        lowering = _lower_strict
+    node = lowering(s, env) if lowering is not None else None
+    return node if node is not None else _fallback(s)
+
+
+def _constant(value):
+    def node(f, c):
+        return value
+
+    return node
+
+
+def _interpreted(s):
+    def node(f, c):
+        return f(s, c)
+
+    return node
+
+
+def _local_symbol(slot):
+    def node(f, c):
+        value = f.slots[slot]
+        if type(value) is LazyBinding:
+            value = value.value()
+        if isinstance(value, numbers.Number):
+            return value
+        return f(value, c)
+
+    return node
+
+
+def _free_symbol(name):
+    # Only compiled binding constructs bind names in the scopes compiled code
+    # runs in, so a name that is not local is not in `c`.
+    def node(f, c):
+        if name in f.solver_parameters:
+            return f.parameter(name, c)
+        return name
+
+    return node
+
+
+def _guard(s, evaluate):
+    head = s[0]
+
+    def node(f, c):
+        try:
+            return evaluate(f, c)
+        except _WRAPPED_ERRORS as e:
+            raise MathJSONException(e, s, mathjson_construct=head) from e
+
+    return node
+
+
+def _fallback(s):
+    construct = constructs[s[0]]
+    return _guard(s, lambda f, c: construct(s, f, c))
+
+
+def _lower_strict(s, env):
+    construct = constructs[s[0]]
+    function, arity = construct.function, construct.arity
+    if len(s) - 1 < arity:
+        return None
+    if arity == 0:
+        return _guard(s, lambda f, c: function())
+    if arity == 1:
+        a = _compile(s[1], env)
+        return _guard(s, lambda f, c: function(a(f, c)))
+    a, b = _compile(s[1], env), _compile(s[2], env)
+    return _guard(s, lambda f, c: function(a(f, c), b(f, c)))
+
+
+def _lower_variadic(values_function):
+    def lower(s, env):
+        args = [_compile(x, env) for x in s[1:]]
+        return _guard(s, lambda f, c: values_function([a(f, c) for a in args]))
+
+    return lower
+
+
+def _lower_list(s, env):
+    args = [_compile(x, env) for x in s[1:]]
+    return _guard(s, lambda f, c: ["Array"] + [a(f, c) for a in args])
+
+
+def _lower_and(s, env):
+    args = [_compile(x, env) for x in s[1:]]
+
+    def evaluate(f, c):
+        for a in args:
+            if not a(f, c):
+                return False
+        return True
+
+    return _guard(s, evaluate)
+
+
+def _lower_or(s, env):
+    args = [_compile(x, env) for x in s[1:]]
+
+    def evaluate(f, c):
+        for a in args:
+            if a(f, c):
+                return True
+        return False
+
+    return _guard(s, evaluate)
+
+
+def _lower_if(s, env):
+    if len(s) < 3:
+        return None
+    is_cortexjs_form = not isinstance(s[1], list) or (
+        bool(s[1]) and isinstance(s[1][0], str) and s[1][0] in constructs
+    )
+    if is_cortexjs_form:
+        if len(s) not in (3, 4):
+            return None
+        condition, then = _compile(s[1], env), _compile(s[2], env)
+        otherwise = _compile(s[3], env) if len(s) == 4 else _constant(None)
+        return _guard(
+            s, lambda f, c: then(f, c) if condition(f, c) else otherwise(f, c)
+        )
+
+    if not all(isinstance(x, list) and len(x) == 2 for x in s[1:-1]):
+        return None
+    pairs = [(_compile(x[0], env), _compile(x[1], env)) for x in s[1:-1]]
+    default = _compile(s[-1], env)
+
+    def evaluate(f, c):
+        for condition, value in pairs:
+            try:
+                if condition(f, c):
+                    try:
+                        return value(f, c)
+                    except MathJSONException:
+                        # Branch failed, try next condition
+                        continue
+            except MathJSONException:
+                return default(f, c)
+        return default(f, c)
+
+    return _guard(s, evaluate)
+
+
+def _lower_switch(s, env):
+    if len(s) < 3 or not all(isinstance(x, list) and len(x) == 2 for x in s[3:]):
+        return None
+    strict = s[0] == "StrictSwitch"
+    expression, default = _compile(s[1], env), _compile(s[2], env)
+    cases = [(_compile(x[0], env), _compile(x[1], env)) for x in s[3:]]
+
+    def evaluate(f, c):
+        value = expression(f, c)
+        if strict:
+            for key, result in cases:
+                if value == key(f, c):
+                    return result(f, c)
+        else:
+            value = comparison_safe_converter(value)
+            for key, result in cases:
+                if value == comparison_safe_converter(key(f, c)):
+                    return result(f, c)
+        return default(f, c)
+
+    return _guard(s, evaluate)
+
+
+def _is_hashable(x):
+    try:
+        hash(x)
+    except TypeError:
+        return False
+    return True
+
+
+def _is_binding(x):
+    """A `[name, value]` entry of Constants."""
+    return isinstance(x, list) and len(x) >= 2 and _is_hashable(x[0])
+
+
+def _is_variable_reference(x):
+    """A `["Variable", name]` argument of Reduce or TrapezoidalIntegrate."""
+    return isinstance(x, list) and len(x) >= 2 and _is_hashable(x[1])
+
+
+def _lower_constants(s, env):
+    if len(s) < 2 or not all(_is_binding(x) for x in s[1:-1]):
+        return None
+    bindings = []
+    for x in s[1:-1]:
+        # Each value sees the names bound before it, and the outer ones. A
+        # binding gets its own slot even if it rebinds a name, since the
+        # value it shadows may not have been read yet.
+        value = _compile(x[1], env)
+        env = env.bind([x[0]])
+        bindings.append((x[0], env.names[x[0]], value))
+    body = _compile(s[-1], env)
+
+    def evaluate(f, c):
+        # Like the interpreter, bindings are evaluated when first read, from
+        # their slot or from the scope, which share one `LazyBinding`.
+        c, group = c.child(), object()
+        slots = f.slots
+
+        def run(value, c):
+            return value(f, c)
+
+        for index, (name, slot, value) in enumerate(bindings):
+            shadowed = c._bindings.get(name, _solver._UNBOUND)
+            c[name] = slots[slot] = LazyBinding(value, run, c, group, index, shadowed)
+        return body(f, c)
+
+    return _guard(s, evaluate)
+
+
+def _lower_variable(s, env):
+    if not _is_variable_reference(s):
+        return None
+    name = s[1]
+    slot = env.names.get(name)
+    if slot is not None:
+        return _guard(s, _local_symbol(slot))
+
+    def evaluate(f, c):
+        if name in c:
+            return f(c[name], c)
+        raise KeyError(f"Variable '{name}' is not defined")
+
+    return _guard(s, evaluate)
+
+
+def _lower_interp(s, env):
+    if len(s) < 4:
+        return None
+    x_array, y_array, target_x = (
+        _compile(s[1], env),
+        _compile(s[2], env),
+        _compile(s[3], env),
+    )
+    return _guard(
+        s,
+        lambda f, c: _solver._interp_values(
+            x_array(f, c), y_array(f, c), target_x(f, c), f, c
+        ),
+    )
+
+
+def _lower_trapezoidal_integrate(s, env):
+    if len(s) < 6 or not _is_variable_reference(s[5]):
+        return None
+    start, end, n = _compile(s[2], env), _compile(s[3], env), _compile(s[4], env)
+    name = s[5][1]
+    inner = env.bind([name])
+    slot = inner.names[name]
+    body = _compile(s[1], inner)
+
+    def evaluate(f, c):
+        if not _solver.NUMPY_AVAILABLE:
+            raise ImportError(
+                "TrapezoidalIntegrate requires 'numpy'. Install with 'pip install numpy'."
+            )
+        lower, upper, steps = start(f, c), end(f, c), n(f, c)
+        values = []
+        c = c.child()
+        slots = f.slots
+        for x in _solver.np.linspace(lower, upper, steps + 1):
+            c[name] = slots[slot] = x
+            values.append(body(f, c))
+        return _solver._trapezoidal_rule(values, lower, upper, steps)
+
+    return _guard(s, evaluate)
+
+
+def _lower_reduce(s, env):
+    # Only the 6-argument Python form; the CortexJS form applies its function
+    # argument through `_apply_fn` and stays interpreted.
+    if len(s) < 7 or not all(_is_variable_reference(x) for x in s[4:7]):
+        return None
+    the_list, initial_value = _compile(s[1], env), _compile(s[2], env)
+    name_accumulator, name_current, name_index = s[4][1], s[5][1], s[6][1]
+    inner = env.bind(dict.fromkeys([name_accumulator, name_current, name_index]))
+    accumulator_slot = inner.names[name_accumulator]
+    current_slot = inner.names[name_current]
+    index_slot = inner.names[name_index]
+    body = _compile(s[3], inner)
+
+    def evaluate(f, c):
+        elements = the_list(f, c)[1:]
+        accumulator = initial_value(f, c)
+        c = c.child()
+        slots = f.slots
+        c[name_accumulator] = slots[accumulator_slot] = accumulator
+        for i, x in enumerate(elements):
+            c[name_current] = slots[current_slot] = x
+            c[name_index] = slots[index_slot] = i
+            c[name_accumulator] = slots[accumulator_slot] = body(f, c)
+        return c[name_accumulator]
+
+    return _guard(s, evaluate)
+
+
+_lowerings = {
+    "Array": lambda s, env: _constant(s),
+    "List": _lower_list,
+    "Add": _lower_variadic(_solver._add_values),
+    "Subtract": _lower_variadic(_solver._subtract_values),
+    "Multiply": _lower_variadic(_solver._multiply_values),
+    "And": _lower_and,
+    "Or": _lower_or,
+    "If": _lower_if,
+    "Switch": _lower_switch,
+    "Which": _lower_switch,
+    "StrictSwitch": _lower_switch,
+    "Constants": _lower_constants,
+    "Variable": _lower_variable,
+    "Interp": _lower_interp,
+    "TrapezoidalIntegrate": _lower_trapezoidal_integrate,
+    "Reduce": _lower_reduce,
+}
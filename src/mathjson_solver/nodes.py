@@ -0,0 +1,198 @@
+"""
+Compact, immutable storage for MathJSON expressions.
+
+Expressions are nested lists, which is convenient to write but costly to keep
+resident: every list over-allocates, every formula holds its own copy of
+the head strings and of its literal tables, and a library of formulas built
+from the same hazard tables repeats each table in every formula.
+`compact(expr)` returns the same expression as a tree of `Node`s:
+
+    node = compact(["Interp", ["Array", 20, 25, 30], ["Array", 2.7e-6, 1.68e-5, 6.03e-5], "age"])
+    node.head  # 'Interp'
+    node.args[1].args  # array('d', [2.7e-06, 1.68e-05, 6.03e-05])
+    create_solver({"age": 27})(node.to_expression())
+
+Nodes are hash-consed in a process-wide table: compacting an expression that
+contains a subtree already held by another compacted expression reuses that
+subtree, so identical tables and sub-formulas are stored once across the
+whole library. Heads and string leaves are interned with `sys.intern`.
+Literal arrays of floats or of 64-bit integers keep their values in an
+`array("d")` or `array("q")`; every other node keeps its arguments in a
+tuple. A node lives as long as any expression holding it.
+
+Nodes are a storage format only: the solvers and compilers work on lists,
+and expand a `Node` they are given with `node.to_expression()`, which
+rebuilds fresh lists, so a result can never alias a shared table. Nodes
+nested inside a list expression are not expanded. The rebuild costs time
+proportional to the size of the expression on every evaluation, and the
+lists it builds are not shared, so the sharing saves memory while a formula
+is stored, not while it is evaluated. To evaluate a formula many times,
+convert it once and keep the lists, or compile them (see
+`compile_expression`), for as long as it is in use.
+"""
+
+import sys
+import weakref
+from array import array
+
+# Interned nodes, each mapped to a weak reference to itself. Children are
+# interned before their parents, so nodes compare their children by identity.
+_nodes = weakref.WeakKeyDictionary()
+
+# Head of the node standing for the empty expression `[]`.
+_EMPTY = object()
+
+_INT64 = (-(2**63), 2**63 - 1)
+
+
+class Node:
+    """An immutable `[head, *args]` list. Create nodes with `compact`."""
+
+    __slots__ = ("head", "args", "_hash", "__weakref__")
+
+    def __init__(self, head, args):
+        object.__setattr__(self, "head", head)
+        object.__setattr__(self, "args", args)
+        if isinstance(args, array):
+            key = (head, args.typecode, args.tobytes())
+        else:
+            key = (_key(head),) + tuple(_key(x) for x in args)
+        object.__setattr__(self, "_hash", hash(key))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Node is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Node is immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Node) or self._hash != other._hash:
+            return False
+        if _key(self.head) != _key(other.head):
+            return False
+        a, b = self.args, other.args
+        if isinstance(a, array) or isinstance(b, array):
+            # Bytes tell 0.0 from -0.0 and keep NaNs.
+            return (
+                type(a) is type(b)
+                and a.typecode == b.typecode
+                and a.tobytes() == b.tobytes()
+            )
+        return len(a) == len(b) and all(_key(x) == _key(y) for x, y in zip(a, b))
+
+    def __len__(self):
+        return 0 if self.head is _EMPTY else 1 + len(self.args)
+
+    def __reduce__(self):
+        # Unpickling interns the node again in the receiving process.
+        return (compact, (self.to_expression(),))
+
+    def __repr__(self):
+        return f"compact({self.to_expression()!r})"
+
+    def to_expression(self):
+        """Return the expression as fresh nested lists."""
+        return expand(self)
+
+
+def compact(expression):
+    """
+    Return `expression` as interned `Node`s. Leaves that are not lists are
+    returned as they are, with strings interned. `expression` is not
+    modified.
+    """
+    # Post-order walk with an explicit stack, so depth is not limited by the
+    # recursion limit.
+    results = []
+    stack = [(expression, False)]
+    while stack:
+        s, visited = stack.pop()
+        if not isinstance(s, list):
+            results.append(_leaf(s))
+            continue
+        if not s:
+            results.append(_intern(_EMPTY, ()))
+            continue
+        if s[0] == "Array" and len(s) > 1:
+            values = _packed(s[1:])
+            if values is not None:
+                results.append(_intern("Array", values))
+                continue
+        if not visited:
+            stack.append((s, True))
+            stack.extend((x, False) for x in reversed(s))
+            continue
+        start = len(results) - len(s)
+        items = results[start:]
+        del results[start:]
+        results.append(_intern(items[0], tuple(items[1:])))
+    return results[0]
+
+
+def expand(node):
+    """Return `node` (or a leaf) as fresh nested lists."""
+    if not isinstance(node, Node):
+        return node
+    root = []
+    stack = [(node, root)]
+    while stack:
+        n, target = stack.pop()
+        if n.head is _EMPTY:
+            continue
+        if isinstance(n.args, array):
+            target.append(n.head)
+            target.extend(n.args)
+            continue
+        # Heads can be lists too, e.g. the [condition, value] pairs of If.
+        for x in (n.head,) + n.args:
+            if isinstance(x, Node):
+                child = []
+                target.append(child)
+                stack.append((x, child))
+            else:
+                target.append(x)
+    return root
+
+
+def _leaf(x):
+    return sys.intern(x) if type(x) is str else x
+
+
+def _packed(values):
+    """`values` as an array if they are all floats or all 64-bit ints."""
+    kinds = {type(x) for x in values}
+    if kinds == {float}:
+        return array("d", values)
+    if kinds == {int} and _INT64[0] <= min(values) and max(values) <= _INT64[1]:
+        return array("q", values)
+    return None
+
+
+def _intern(head, args):
+    node = Node(_leaf(head), args)
+    canonical = _nodes.get(node)
+    if canonical is not None:
+        canonical = canonical()
+        if canonical is not None:
+            return canonical
+    _nodes[node] = weakref.ref(node)
+    return node
+
+
+def _key(x):
+    """Key of an already compacted element; nodes are keyed by identity."""
+    if isinstance(x, Node):
+        return (Node, id(x))
+    if isinstance(x, float):
+        # repr tells 0.0 from -0.0; 1 == 1.0 == True is told apart by type.
+        return (float, repr(x))
+    try:
+        hash(x)
+    except TypeError:
+        return (type(x), id(x))
+    return (type(x), x)
@@ -0,0 +1,546 @@
+"""
+Optimisation passes over MathJSON expression trees.
+
+`fold_constants(expr)` evaluates every subtree that depends on no parameter
+or local binding once, and replaces it with its value:
+
+    folded, removed = fold_constants(["Multiply", "x", ["Divide", ["Pi"], 2]])
+    # folded == ["Multiply", "x", 1.5707963267948966], removed == 2
+    create_solver({"x": 2})(folded)  # 3.141592653589793
+
+A subtree is folded when its construct is free of side effects and of scope
+access, and all its arguments are closed literals: numbers, `[]` and
+`["Array", ...]` of closed literals. Strings are never closed, since any
+string may name a parameter. The value replaces the subtree only if it can be
+written back as an equivalent literal no larger than the subtree. Subtrees
+that raise are left alone, so the error still happens at evaluation time,
+raised by the same construct, but a `MathJSONException` quotes the node that
+raised it as folded: `["Divide", ["Add", 1, 2], 0]` fails as
+`Problem in Divide. ['Divide', 3.0, 0]. ...`.
+
+Only arguments a construct evaluates as ordinary expressions are visited.
+Many constructs look at some arguments unevaluated (`["Length", ["List",
+...]]` counts the raw arguments of `List`, `Switch` cases are `[value,
+result]` pairs, `Map` takes a call template), and rewriting those would
+change the result.
+
+`share_subexpressions(expr)` hash-conses a tree: structurally equal subtrees
+become one shared object. `create_cse_solver(parameters)` is a drop-in
+replacement for `create_solver` that does this to each expression and to the
+parameter values, and then evaluates every repeated subtree once per
+evaluation:
+
+    solver = create_cse_solver({"ages": [...], "hazards": [...], "age": 52})
+    solver(["Add", ["Interp", "ages", "hazards", "age"],
+                   ["Multiply", 2, ["Interp", "ages", "hazards", "age"]]])
+
+A subtree that may read a local binding (a name bound anywhere by
+`Constants`, `Reduce`, `Function` or `TrapezoidalIntegrate`, directly or
+through parameter expressions) is reused only within the same scope and
+until that scope rebinds a name; any other subtree is reused across the
+whole evaluation.
+"""
+
+import numbers
+from collections import ChainMap
+
+from .solver import (
+    MathJSONException,
+    ParameterGraph,
+    Scope,
+    constructs,
+    create_mathjson_solver,
+    expanded,
+)
+
+# Constructs that must be evaluated on every call: impure ones, and those
+# that bind or read local names.
+NOT_FOLDABLE = frozenset(
+    [
+        "Now",
+        "Today",
+        "Constants",
+        "Reduce",
+        "Map",
+        "StrictMap",
+        "Filter",
+        "Function",
+        "TrapezoidalIntegrate",
+        "Variable",
+        "IsDefined",
+    ]
+)
+
+# Constructs that evaluate every argument as an ordinary expression, in
+# addition to the strict ones.
+_EVALUATES_ALL_ARGUMENTS = frozenset(
+    [
+        "Add",
+        "Subtract",
+        "Multiply",
+        "Sum",
+        "List",
+        "And",
+        "Or",
+        "Not",
+        "Nand",
+        "Nor",
+        "Implies",
+        "Log",
+        "Round",
+        "Clamp",
+        "Str",
+        "Strftime",
+        "Any",
+        "All",
+        "IsEmpty",
+        "Variance",
+        "StandardDeviation",
+        "First",
+        "Last",
+        "Rest",
+        "Most",
+        "Reverse",
+        "Sort",
+        "Unique",
+        "At",
+        "Range",
+        "Join",
+        "Zip",
+        "Product",
+        "Appended",
+        "MultiplyByScalar",
+        "MultiplyByArray",
+        "AddScalar",
+        "SubtractScalar",
+        "AddArray",
+        "SubtractArray",
+        "GenerateRange",
+        "AtIndex",
+        "Slice",
+        "CumulativeProduct",
+        "CumulativeSum",
+        "Interp",
+        "FindIntervalIndex",
+    ]
+)
+
+
+def fold_constants(expression):
+    """
+    Return `(folded_expression, nodes_removed)`. `expression` is not modified;
+    unchanged subtrees are shared with the result.
+
+    A node is a list or an argument that is not a list; heads do not count.
+    """
+    evaluate = create_mathjson_solver({})
+    # Post-order walk with an explicit stack: (node, its expression positions,
+    # index of its first child result) once the children have been pushed.
+    results = []  # (folded node, size, nodes removed below, closed)
+    stack = [(expression, None, None)]
+    while stack:
+        s, positions, first = stack.pop()
+        if positions is None:
+            positions = _expression_positions(s)
+            if positions is None:
+                closed = _is_closed(s)
+                results.append((s, _size(s) if closed else 1, 0, closed))
+                continue
+            stack.append((s, positions, len(results)))
+            for path in reversed(positions):
+                stack.append((_get(s, path), None, None))
+            continue
+
+        children = results[first:]
+        del results[first:]
+        removed = sum(x[2] for x in children)
+        size = 1 + sum(x[1] for x in children)
+        for path, x in zip(positions, children):
+            if x[0] is not _get(s, path):
+                s = _replace(s, path, x[0])
+        if (
+            s[0] in NOT_FOLDABLE
+            or positions != [(i,) for i in range(1, len(s))]
+            or not all(x[3] for x in children)
+        ):
+            results.append((s, size, removed, False))
+            continue
+        try:
+            value = evaluate(s)
+        except Exception:
+            results.append((s, size, removed, False))
+            continue
+        literal = _as_literal(value)
+        if literal is None or _size(literal) > size:
+            results.append((s, size, removed, False))
+            continue
+        results.append((literal, _size(literal), removed + size - _size(literal), True))
+
+    folded, _, removed, _ = results[0]
+    return folded, removed
+
+
+def _expression_positions(s):
+    """
+    Paths, as index tuples, of the parts of construct call `s` it evaluates
+    as ordinary expressions; None if `s` is not a construct call.
+    """
+    if not isinstance(s, list) or not s:
+        return None
+    try:
+        construct = constructs.get(s[0])
+    except TypeError:
+        return None
+    if construct is None or s[0] == "Array":
+        return None
+    name = s[0]
+    arguments = range(1, len(s))
+    if hasattr(construct, "arity"):
+        return [(i,) for i in arguments if i <= construct.arity]
+    if name in _EVALUATES_ALL_ARGUMENTS:
+        return [(i,) for i in arguments]
+    if name in ("Max", "Min"):
+        return [(i,) for i in arguments] if len(s) > 2 else []
+    if name in ("In", "NotIn", "Not_in", "HasMatchingSublist"):
+        return [(i,) for i in arguments if i <= (1 if len(s) == 3 else 4)]
+    if name in ("Switch", "Which", "StrictSwitch"):
+        return [(i,) for i in arguments if i < 3] + _pair_positions(s, 3, len(s))
+    if name == "If" and len(s) >= 3:
+        if not isinstance(s[1], list) or (
+            bool(s[1]) and isinstance(s[1][0], str) and s[1][0] in constructs
+        ):
+            return [(i,) for i in arguments]
+        return _pair_positions(s, 1, len(s) - 1) + [(len(s) - 1,)]
+    if name == "Constants" and len(s) >= 2:
+        return [(i, 1) for i in range(1, len(s) - 1) if _is_list(s[i], 2)] + [
+            (len(s) - 1,)
+        ]
+    if name == "Reduce" and len(s) == 7:
+        return [(1,), (2,), (3,)]
+    if name in ("Reduce", "Map", "StrictMap", "Filter") and len(s) >= 3:
+        positions = [(1,)]
+        if _is_list(s[2]) and s[2][0] == "Function" and len(s[2]) >= 2:
+            positions.append((2, 1))
+        if name == "Reduce" and len(s) == 4:
+            positions.append((3,))
+        return positions
+    if name == "TrapezoidalIntegrate":
+        return [(i,) for i in arguments if i <= 4]
+    return []
+
+
+def _pair_positions(s, start, stop):
+    return [(i, j) for i in range(start, stop) if _is_list(s[i], 2) for j in (0, 1)]
+
+
+def _is_list(x, length=None):
+    return isinstance(x, list) and len(x) >= 1 and length in (None, len(x))
+
+
+def _get(s, path):
+    for i in path:
+        s = s[i]
+    return s
+
+
+def _replace(s, path, value):
+    """A copy of `s` with the part at `path` replaced, sharing the rest."""
+    s = list(s)
+    if len(path) == 1:
+        s[path[0]] = value
+    else:
+        s[path[0]] = _replace(s[path[0]], path[1:], value)
+    return s
+
+
+def _is_closed(x):
+    """A literal whose value, and whose elements' values, are itself."""
+    if isinstance(x, numbers.Number):
+        return True
+    if not isinstance(x, list):
+        return False
+    if not x:
+        return True
+    return x[0] == "Array" and all(_is_closed(e) for e in x[1:])
+
+
+def _as_literal(value):
+    """An expression evaluating to `value`, or None if there is none."""
+    if value is None:
+        return []
+    if isinstance(value, list) and value and value[0] == "Array":
+        return value if _is_closed(value) else None
+    if isinstance(value, (bool, int, float)):
+        return value
+    return None
+
+
+def _size(x):
+    if isinstance(x, list) and x:
+        return 1 + sum(_size(e) for e in x[1:])
+    return 1
+
+
+def share_subexpressions(expression):
+    """
+    Return `(shared_expression, merged)`: `expression` with structurally
+    equal subtrees replaced by one shared object, and the number of subtrees
+    that were replaced. `expression` is not modified.
+    """
+    interner = _Interner()
+    shared = interner.intern(expression)
+    return shared, interner.merged
+
+
+class CseSolver:
+    """
+    The evaluator made by `create_cse_solver`, called as
+    `solver(expression)` like a `Solver`.
+
+    The analysis of an expression (see `_plan`) is cached, keyed by the
+    expression object, and shared; the values memoized while evaluating
+    belong to that one evaluation, so a solver can be shared by threads.
+    A solver pickles as its parameters.
+    """
+
+    __slots__ = ("solver_parameters", "_plans")
+
+    def __init__(self, solver_parameters):
+        if isinstance(solver_parameters, (list, tuple)):
+            solver_parameters = ChainMap(*solver_parameters)
+        self.solver_parameters = solver_parameters
+        self._plans = {}  # id(expression) -> (expression, *_plan(expression))
+
+    def __call__(self, s, c=None):
+        s = expanded(s)
+        plans = self._plans
+        plan = plans.get(id(s))
+        if plan is None or plan[0] is not s:
+            if len(plans) >= 4096:
+                plans.clear()
+            plan = (s,) + _plan(s, self.solver_parameters)
+            plans[id(s)] = plan
+        _, shared, parameters, memoized = plan
+        # Names bound by the caller are not known to the plan; evaluate
+        # without reuse rather than risk a stale value.
+        return _evaluator(parameters, memoized if not c else {})(shared, c)
+
+    def with_params(self, layer):
+        """
+        A solver whose parameters are `layer` in front of this solver's
+        parameters; neither is copied.
+        """
+        parameters = self.solver_parameters
+        if isinstance(parameters, ChainMap):
+            return CseSolver([layer, *parameters.maps])
+        return CseSolver([layer, parameters])
+
+    def __reduce__(self):
+        return (CseSolver, (self.solver_parameters,))
+
+    def __repr__(self):
+        return f"CseSolver({len(self.solver_parameters)} parameters)"
+
+
+def _evaluator(parameters, memoized):
+    """The evaluator of one evaluation: `memo` lives as long as it does."""
+    memo = {}
+    graph = ParameterGraph(parameters)
+
+    def f(s, c=None):
+        if c is None:
+            c = Scope()
+        elif type(c) is dict:
+            c = Scope(c)
+        if isinstance(s, numbers.Number):
+            return s
+        if isinstance(s, list):
+            if not s:
+                return None
+            if s[0] not in constructs:
+                return s
+            dependent = memoized.get(id(s))
+            if dependent is not None:
+                key = (id(s), c, c.version) if dependent else id(s)
+                if key in memo:
+                    return memo[key]
+            try:
+                value = constructs[s[0]](s, f, c)
+            except (TypeError, ValueError, IndexError, ZeroDivisionError) as e:
+                raise MathJSONException(e, s, mathjson_construct=s[0]) from e
+            if dependent is not None:
+                memo[key] = value
+            return value
+        elif s in c:
+            return f(c[s], c)
+        elif s in parameters:
+            return graph.evaluate(f, s, c)
+        else:
+            return s
+
+    f.solver_parameters = parameters
+    f.parameter_graph = graph
+    return f
+
+
+def create_cse_solver(solver_parameters):
+    """
+    Like `create_solver(solver_parameters)`, but repeated subtrees of an
+    expression and the parameter expressions are evaluated once per
+    evaluation. Results and errors are the same, except that `Now` and
+    `Today` read the clock once per evaluation wherever they are repeated.
+    Returns a `CseSolver`.
+    """
+    return CseSolver(solver_parameters)
+
+
+def _is_anonymous(name):
+    # The names Function binds when it declares no parameters: "_", "_1", ...
+    return name[:1] == "_" and (len(name) == 1 or name[1:].isdecimal())
+
+
+class _Interner:
+    """Hash-consing table: one canonical list per distinct subtree."""
+
+    def __init__(self):
+        self.table = {}  # structural key -> canonical list
+        self.uses = {}  # id(canonical list) -> occurrences
+        self.merged = 0
+
+    def intern(self, expression):
+        # Post-order walk with an explicit stack; heads are walked too.
+        results = []
+        stack = [(expression, False)]
+        while stack:
+            s, visited = stack.pop()
+            if not isinstance(s, list):
+                results.append(s)
+                continue
+            if not visited:
+                stack.append((s, True))
+                stack.extend((x, False) for x in reversed(s))
+                continue
+            start = len(results) - len(s)
+            children = results[start:]
+            del results[start:]
+            key = tuple(_key(x) for x in children)
+            canonical = self.table.get(key)
+            if canonical is None:
+                if any(a is not b for a, b in zip(children, s)):
+                    canonical = children
+                else:
+                    canonical = s
+                self.table[key] = canonical
+                self.uses[id(canonical)] = 1
+            else:
+                self.uses[id(canonical)] += 1
+                self.merged += 1
+            results.append(canonical)
+        return results[0]
+
+
+def _key(x):
+    """Structural key of an already interned element."""
+    if isinstance(x, list):
+        return (list, id(x))
+    if isinstance(x, float):
+        # repr tells 0.0 from -0.0; 1 == 1.0 == True is told apart by type.
+        return (float, repr(x))
+    try:
+        hash(x)
+    except TypeError:
+        return (type(x), id(x))
+    return (type(x), x)
+
+
+def _plan(expression, solver_parameters):
+    """
+    Intern `expression` and the parameter values together. Return the shared
+    expression, the shared parameters, and `{id(node): depends_on_scope}` for
+    the nodes worth memoizing: construct calls that occur more than once, and
+    parameter expressions, which are evaluated wherever they are referenced.
+    Calls cheaper than a memo lookup (`Variable`, a strict construct on
+    plain arguments) are left out.
+    """
+    interner = _Interner()
+    parameters = {k: interner.intern(v) for k, v in solver_parameters.items()}
+    shared = interner.intern(expression)
+    nodes = list(interner.table.values())
+
+    # Names that may hold a local binding, then every parameter that reads
+    # one of them, directly or through other parameters.
+    local = set()
+    for s in nodes:
+        local.update(_bound_names(s))
+    readers = {}
+    for name, value in parameters.items():
+        for x in _strings(value):
+            readers.setdefault(x, []).append(name)
+    pending = list(local)
+    while pending:
+        for name in readers.get(pending.pop(), ()):
+            if name not in local:
+                local.add(name)
+                pending.append(name)
+
+    # Children are interned, and so listed, before their parents.
+    dependent = {}
+    for s in nodes:
+        dependent[id(s)] = any(
+            (
+                dependent[id(x)]
+                if isinstance(x, list)
+                else isinstance(x, str) and (x in local or _is_anonymous(x))
+            )
+            for x in s
+        )
+
+    roots = {id(v) for v in parameters.values() if isinstance(v, list)}
+    memoized = {}
+    for s in nodes:
+        if not (interner.uses[id(s)] > 1 or id(s) in roots):
+            continue
+        try:
+            construct = constructs.get(s[0])
+        except (IndexError, TypeError):
+            continue
+        if construct is None or s[0] in ("Array", "Function", "Variable"):
+            continue
+        if hasattr(construct, "arity") and not any(isinstance(x, list) for x in s[1:]):
+            continue
+        memoized[id(s)] = dependent[id(s)]
+    return shared, parameters, memoized
+
+
+def _bound_names(s):
+    """Names construct call `s` binds in a child scope."""
+    try:
+        name = s[0]
+    except IndexError:
+        return []
+    if name == "Constants":
+        return [x[0] for x in s[1:-1] if _is_list(x) and isinstance(x[0], str)]
+    if name == "Reduce" and len(s) == 7:
+        return [_variable_name(x) for x in s[4:7]]
+    if name == "Function":
+        return [x for x in s[2:] if isinstance(x, str)]
+    if name == "TrapezoidalIntegrate" and len(s) > 5:
+        return [_variable_name(s[5])]
+    return []
+
+
+def _variable_name(x):
+    if _is_list(x) and len(x) > 1 and isinstance(x[1], str):
+        return x[1]
+    return None
+
+
+def _strings(expression):
+    """Every string in `expression`, heads included."""
+    stack = [expression]
+    while stack:
+        s = stack.pop()
+        if isinstance(s, list):
+            stack.extend(s)
+        elif isinstance(s, str):
+            yield s
@@ -0,0 +1,2540 @@
+from __future__ import annotations
+
+import numbers
+import sys
+import threading
+from collections import ChainMap
+from functools import reduce
+from itertools import accumulate
+import operator
+import math
+
+NoneType = type(None)
+
+
+class _LazyModule:
+    """
+    Stands for a module in this module's globals until an attribute of it is
+    first used; then the module is imported and takes its place. Keeps
+    modules that only some constructs need out of `import mathjson_solver`.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attribute):
+        module = __import__(self.name)
+        globals()[self.name] = module
+        return getattr(module, attribute)
+
+
+datetime = _LazyModule("datetime")
+statistics = _LazyModule("statistics")
+
+# NumPy, once `_numpy()` looked for it: the module, or None if it is not
+# installed.
+_numpy_module = False
+
+
+def _numpy():
+    """NumPy, imported on first use, or None if it is not installed."""
+    global _numpy_module
+    if _numpy_module is False:
+        try:
+            import numpy as _numpy_module
+        except ImportError:
+            _numpy_module = None
+    return _numpy_module
+
+
+def __getattr__(name):
+    # `NUMPY_AVAILABLE` and `np` are looked up by other modules; resolving
+    # them imports NumPy.
+    if name == "NUMPY_AVAILABLE":
+        return _numpy() is not None
+    if name == "np" and _numpy() is not None:
+        return _numpy()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _try_parse_datetime(value):
+    """Try to parse a string as datetime or date. Returns original value if not parseable."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            pass
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            pass
+    return value
+
+
+# def find_interpolation_bounds(
+#     l: list, target: int | float
+# ) -> Union[Union[int, float], tuple[Union[int, float], Union[int, float]]]:
+#     for i, x in enumerate(l):
+#         if i == 0:
+#             continue
+#         if l[i - 1] <= target and target <= l[i]:
+#             if target == l[i - 1] or target == l[i]:
+#                 return target
+#             else:
+#                 return l[i - 1], l[i]
+#     else:
+#         raise ValueError("Target value is outside interpolation range.")
+
+
+def _MultiplyByScalar(l: list[numbers.Real], a: numbers.Real) -> list[numbers.Real]:
+    return [x * a for x in l]
+
+
+def _MultiplyByArray(
+    l1: list[numbers.Real], l2: list[numbers.Real]
+) -> list[numbers.Real]:
+    return [a * b for a, b in zip(l1, l2)]
+
+
+def _AddScalar(l: list[numbers.Real], a: numbers.Real) -> list[numbers.Real]:
+    return [x + a for x in l]
+
+
+def _SubtractScalar(l: list[numbers.Real], a: numbers.Real) -> list[numbers.Real]:
+    return [x - a for x in l]
+
+
+def _AddArray(l1: list[numbers.Real], l2: list[numbers.Real]) -> list[numbers.Real]:
+    return [a + b for a, b in zip(l1, l2)]
+
+
+def _SubtractArray(
+    l1: list[numbers.Real], l2: list[numbers.Real]
+) -> list[numbers.Real]:
+    return [a - b for a, b in zip(l1, l2)]
+
+
+def _CumulativeProduct(l: list) -> list:
+    return list(accumulate(l, operator.mul))
+
+
+def _CumulativeSum(l: list) -> list:
+    return list(accumulate(l, operator.add))
+
+
+def find_interpolation_bounds_indexes(
+    l: list, target: int | float
+) -> int | float | tuple[int | float, int | float]:
+    for i, x in enumerate(l):
+        if i == 0:
+            continue
+        if l[i - 1] <= target and target <= l[i]:
+            if target == l[i - 1]:
+                return i - 1
+            elif target == l[i]:
+                return i
+            else:
+                return i - 1, i
+    else:
+        raise ValueError("Target value is outside interpolation range.")
+
+
+def find_interpolation_bounds_2indexes(
+    l: list, target: int | float
+) -> int | float | tuple[int | float, int | float]:
+    for i, x in enumerate(l):
+        if i == len(l) - 1:
+            return i - 1, i
+        if l[i] <= target and target < l[i + 1]:
+            return i, i + 1
+    else:
+        raise ValueError("Target value is outside interpolation range.")
+
+
+def linear_interpolate(x_array, y_array, target_x):
+    # Find the interval where target_x falls
+    # Handle edge cases (target_x outside range)
+    # Apply: y = y1 + (y2 - y1) * (target_x - x1) / (x2 - x1)
+
+    # first check if both arrays are the same length
+    if len(x_array) != len(y_array) or len(x_array) < 2:
+        raise ValueError(
+            "Both arrays need to be the same length and with at least 2 elements."
+        )
+    bounds_indexes = find_interpolation_bounds_indexes(x_array, target_x)
+    if isinstance(bounds_indexes, tuple):
+        x1, x2 = x_array[bounds_indexes[0]], x_array[bounds_indexes[1]]
+        y1, y2 = y_array[bounds_indexes[0]], y_array[bounds_indexes[1]]
+        return y1 + (y2 - y1) * (target_x - x1) / (x2 - x1)
+    else:
+        return y_array[bounds_indexes]
+
+
+class MathJSONException(Exception):
+    """Exception for MathJSON processing issues"""
+
+    def __init__(self, e, expr, *args, **kwargs):
+        super().__init__(args)
+        self.e = e
+        self.expr = expr
+        self.construct = kwargs.get("mathjson_construct", "MathJSON")
+
+    def __str__(self):
+        if hasattr(self.e, "message"):
+            m = self.e.message
+        else:
+            m = str(self.e)
+        return f"Problem in {self.construct}. {self.expr}. {m}"
+
+    def __reduce__(self):
+        # The constructor's arguments are not kept in `args`; rebuild from
+        # the attributes so the exception can cross process boundaries.
+        return (type(self), (self.e, self.expr), self.__dict__)
+
+
+class EvaluationCancelled(BaseException):
+    """
+    Stops an evaluation whose result is no longer wanted (see
+    `Solver.evaluate_async`). Like `asyncio.CancelledError` it is not an
+    `Exception`, so constructs that recover from errors let it through.
+    """
+
+
+class Scope:
+    """
+    Local bindings (Constants, Reduce accumulator/current/index, Function
+    parameters, TrapezoidalIntegrate variable) visible during an evaluation.
+
+    Scopes are shared, not copied, as evaluation descends the expression.
+    A construct that binds names first takes `c.child()`, which links to its
+    parent and shares the parent's bindings until its own first write; only
+    then are the bindings copied, shallowly, so bound values such as large
+    arrays are never duplicated. Lookups and child creation are O(1).
+
+    `version` counts writes, so a value computed in a scope can be checked
+    for staleness after a construct rebinds a name in place (`Reduce` and
+    `TrapezoidalIntegrate` rebind their names on every step).
+
+    A name can be bound to a `LazyBinding`, which is evaluated the first
+    time the name is looked up. `limits` maps a `Constants` scope to the
+    index of the binding being evaluated in it: that binding and the ones
+    after it are hidden, and a lookup sees what they shadow instead.
+    """
+
+    __slots__ = ("parent", "version", "limits", "_bindings", "_owned")
+
+    def __init__(self, bindings=None, parent=None, limits=None):
+        self.parent = parent
+        self.version = 0
+        self.limits = limits
+        self._bindings = {} if bindings is None else bindings
+        self._owned = bindings is None
+
+    def child(self):
+        return Scope(self._bindings, self, self.limits)
+
+    def __contains__(self, name):
+        if self.limits is None:
+            return name in self._bindings
+        return self._visible(name) is not _UNBOUND
+
+    def __getitem__(self, name):
+        if self.limits is None:
+            value = self._bindings[name]
+        else:
+            value = self._visible(name)
+            if value is _UNBOUND:
+                raise KeyError(name)
+        if type(value) is LazyBinding:
+            return value.value()
+        return value
+
+    def __setitem__(self, name, value):
+        if not self._owned:
+            self._bindings = dict(self._bindings)
+            self._owned = True
+        self._bindings[name] = value
+        self.version += 1
+
+    def _visible(self, name):
+        value = self._bindings.get(name, _UNBOUND)
+        limits = self.limits
+        while type(value) is LazyBinding and value.group in limits:
+            if value.index < limits[value.group]:
+                break
+            value = value.shadowed
+        return value
+
+    def binds_any(self, names):
+        """Whether any of `names` (a set) is bound."""
+        return not names.isdisjoint(self._bindings)
+
+    def __repr__(self):
+        return f"Scope({self._bindings!r})"
+
+
+_UNBOUND = object()
+
+
+def cyclic_reference_error(name, chain):
+    """The error for parameter `name` referred to again via `chain`."""
+    path = " -> ".join([x for x in chain if x is not None] + [name])
+    return MathJSONException(
+        ValueError(f"Cyclic reference to parameter '{name}' ({path})"), name
+    )
+
+
+class LazyBinding:
+    """
+    A `Constants` binding that is evaluated on first lookup, then reused.
+
+    The binding is evaluated as it would have been in order: in the scope
+    of its `Constants` with itself and the bindings after it hidden (see
+    `Scope.limits`; `group` identifies the `Constants`), so it sees the
+    binding or value it `shadowed` under its name, and an error makes its
+    value None.
+    """
+
+    __slots__ = ("expression", "f", "scope", "group", "index", "shadowed", "_value")
+
+    def __init__(self, expression, f, scope, group, index, shadowed):
+        self.expression = expression
+        self.f = f
+        self.scope = scope
+        self.group = group
+        self.index = index
+        self.shadowed = shadowed
+        self._value = self
+
+    def value(self):
+        if self._value is self:
+            scope = self.scope
+            limits = dict(scope.limits or ())
+            limits[self.group] = self.index
+            c = Scope(scope._bindings, scope, limits)
+            try:
+                self._value = self.f(self.expression, c)
+            except Exception:
+                self._value = None
+            # Only the value is needed from now on.
+            self.expression = self.f = self.scope = None
+        return self._value
+
+    def __repr__(self):
+        if self._value is self:
+            return f"LazyBinding({self.expression!r})"
+        return f"LazyBinding(value={self._value!r})"
+
+
+class ParameterGraph:
+    """
+    Which names each solver parameter refers to, directly or through other
+    parameters, worked out the first time the parameter is looked up.
+
+    A parameter whose value is its own name, `{"a": "a"}`, stands for that
+    string and is not a reference. A parameter that leads into a cycle is
+    evaluated under a guard: referring to it again while its value is being
+    computed raises a `MathJSONException` naming the cycle, instead of
+    recursing until the recursion limit. Parameter expressions see the
+    caller's local bindings, so a cycle can be broken by a binding, e.g.
+    `{"x": ["Constants", ["x", 1], "x"]}`; the guard only fires on a real
+    repeated lookup.
+
+    The graph is kept for the lifetime of the solver and shared by the
+    threads evaluating with it; the parameters being computed are tracked
+    per thread. Call `clear()` after changing a parameter's expression.
+    """
+
+    max_names = 1024
+
+    __slots__ = ("parameters", "_evaluations", "_reachable", "_cycles")
+
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self._evaluations = _Evaluations()
+        self._reachable = {}  # parameter -> frozenset of names, or None
+        self._cycles = {}  # parameter -> the cycle it leads into
+
+    @property
+    def active(self):
+        """Guarded parameters being evaluated by this thread, outermost first."""
+        return self._evaluations.active
+
+    def clear(self):
+        """Forget the graph, e.g. after the parameters were changed."""
+        self._reachable.clear()
+        self._cycles.clear()
+
+    def reachable(self, name):
+        """
+        Every name parameter `name` can look up, directly or through other
+        parameters, or None if it leads into a cycle or can look up more
+        than `max_names` names.
+        """
+        names = self._reachable.get(name, self)
+        if names is self:
+            names = self._resolve(name)
+        return names
+
+    def order(self):
+        """
+        All parameters, each after the parameters it refers to. Raises a
+        `MathJSONException` naming the cycle if there is one.
+        """
+        order = []
+        for name in self.parameters:
+            if self.leads_into_cycle(name):
+                cycle = self._cycles[name]
+                raise cyclic_reference_error(cycle[-1], cycle[:-1])
+        # Depth-first, post-order: dependencies are appended first.
+        done = set()
+        for root in self.parameters:
+            stack = [(root, False)]
+            while stack:
+                name, expanded = stack.pop()
+                if expanded:
+                    order.append(name)
+                    continue
+                if name in done:
+                    continue
+                done.add(name)
+                stack.append((name, True))
+                stack.extend(
+                    (x, False) for x in self._references(name) if x not in done
+                )
+        return order
+
+    def leads_into_cycle(self, name):
+        """Whether parameter `name` can refer to itself."""
+        if name not in self._reachable:
+            self._resolve(name)
+        return name in self._cycles
+
+    def evaluate(self, f, name, c):
+        """`f` of the value of parameter `name` in the local scope `c`."""
+        value = self.parameters[name]
+        if not isinstance(value, (list, str)):
+            return f(value, c)
+        if value == name:
+            return value
+        if not self.leads_into_cycle(name):
+            return f(value, c)
+        active = self._evaluations.active
+        if name in active:
+            raise cyclic_reference_error(name, active[active.index(name) :])
+        active.append(name)
+        try:
+            return f(value, c)
+        finally:
+            active.pop()
+
+    def _references(self, name):
+        value = self.parameters[name]
+        if not isinstance(value, (list, str)) or value == name:
+            return ()
+        return [x for x in _names_in(value) if x in self.parameters]
+
+    def _resolve(self, root):
+        # Depth-first over the parameters `root` refers to. `path` holds the
+        # parameters being resolved, in order, so meeting one again means a
+        # cycle.
+        parameters, memo, cycles = self.parameters, self._reachable, self._cycles
+        own, path = {}, {}
+        stack = [(root, False)]
+        while stack:
+            name, done = stack.pop()
+            if not done:
+                if name in memo or name in path:
+                    continue
+                path[name] = None
+                stack.append((name, True))
+                value = parameters[name]
+                if isinstance(value, (list, str)) and value != name:
+                    own[name] = _names_in(value)
+                else:
+                    own[name] = set()
+                for x in own[name]:
+                    if x in parameters and x not in memo and x not in path:
+                        stack.append((x, False))
+                    elif x in path:
+                        chain = list(path)
+                        cycles.setdefault(name, chain[chain.index(x) :] + [x])
+                continue
+            del path[name]
+            names = own.pop(name)
+            for x in [x for x in names if x in parameters]:
+                if x in cycles and name not in cycles:
+                    cycles[name] = cycles[x]
+                if name in cycles:
+                    names = None
+                    break
+                reached = memo[x]
+                if reached is None:
+                    names = None
+                elif names is not None:
+                    names |= reached
+            if names is not None and len(names) > self.max_names:
+                names = None
+            memo[name] = None if names is None else frozenset(names)
+        return memo[root]
+
+
+class _Evaluations(threading.local):
+    """What the evaluations of one solver in one thread have in progress."""
+
+    def __init__(self):
+        self.active = []
+        self.values = {}
+
+
+class ParameterCache:
+    """
+    Evaluated values of solver parameters whose value is an expression.
+
+    A parameter expression is evaluated in the scope of the reference, so
+    its value can depend on local bindings: `{"p": ["Add", "k", 1]}` inside
+    `["Constants", ["k", 41], "p"]` is 42. A cached value is therefore used,
+    and stored, only where none of the names the parameter can look up,
+    directly or through other parameters (see `ParameterGraph`), is bound.
+    Parameters that lead into a cycle, that read the clock (`Now`, `Today`)
+    or that can look up more than `ParameterGraph.max_names` names are never
+    cached.
+
+    With `per_evaluation`, each thread keeps its own values, and `start()`
+    forgets them at the start of each of its evaluations; otherwise the
+    values are shared by all threads for the lifetime of the cache.
+    """
+
+    __slots__ = ("graph", "per_evaluation", "_values", "_evaluations")
+
+    def __init__(self, graph, per_evaluation=False):
+        self.graph = graph
+        self.per_evaluation = per_evaluation
+        self._values = {}
+        self._evaluations = _Evaluations()
+
+    @property
+    def values(self):
+        """Parameter name -> value, for this thread's evaluation if `per_evaluation`."""
+        if self.per_evaluation:
+            return self._evaluations.values
+        return self._values
+
+    def start(self):
+        """Start an evaluation: forget this thread's values if `per_evaluation`."""
+        if self.per_evaluation:
+            self._evaluations.values = {}
+
+    def clear(self):
+        """Forget all values, e.g. after the parameters were changed."""
+        self.values.clear()
+        self.graph.clear()
+
+    def cacheable(self, name, c):
+        """Whether the value of parameter `name` is the same in every scope like `c`."""
+        names = self.graph.reachable(name)
+        return (
+            names is not None
+            and "Now" not in names
+            and "Today" not in names
+            and not c.binds_any(names)
+        )
+
+
+def _names_in(expression):
+    """Every string in `expression`, heads included."""
+    names = set()
+    stack = [expression]
+    while stack:
+        s = stack.pop()
+        if isinstance(s, list):
+            stack.extend(s)
+        elif isinstance(s, str):
+            names.add(s)
+    return names
+
+
+# def requires_array(func):
+#     def inner1(*args, **kwargs):
+#         try:
+#             if args[0][1][0] == "Array" and len(args[0][1]) > 0:
+#                 return func(*args, **kwargs)
+#             else:
+#                 raise ValueError(f"'{func.__name__}' should receive a list")
+#         except TypeError:
+#             raise ValueError(f"'{func.__name__}' really should receive a list")
+
+#     return inner1
+
+
+def is_numeric(x):
+    try:
+        float(x)
+    except ValueError:
+        return False
+    except TypeError:
+        return False
+    else:
+        return True
+
+
+def _is_prime(n) -> bool:
+    n = int(n)
+    if n < 2:
+        return False
+    if n == 2:
+        return True
+    if n % 2 == 0:
+        return False
+    return all(n % i for i in range(3, int(n**0.5) + 1, 2))
+
+
+def has_matching_sublist(
+    *,
+    my_list: list,
+    required_match_count: int,
+    position: int,
+    contiguous: bool,
+    conditions: list[bool],
+) -> bool:
+    if contiguous:
+        # Check for contiguous matches based on position
+        if position == 0:
+            # Check if the beginning of the list matches
+            count = sum(
+                1
+                for i in range(min(required_match_count, len(my_list)))
+                if conditions[i]
+            )
+            return count == required_match_count
+        elif position > 0:
+            # Skip the first `position` elements
+            count = sum(
+                1
+                for i in range(position, position + required_match_count)
+                if i < len(my_list) and conditions[i]
+            )
+            return count == required_match_count
+        elif position == -1:
+            # Check if the end of the list matches
+            count = sum(
+                1
+                for i in range(len(my_list) - required_match_count, len(my_list))
+                if conditions[i]
+            )
+            return count == required_match_count
+        elif position < -1:
+            # Skip the last `abs(position)` elements
+            count = sum(1 for i in range(len(my_list) + position) if conditions[i])
+            return count == required_match_count
+    else:
+        # Check for non-contiguous matches
+        count = sum(1 for i in range(len(my_list)) if conditions[i])
+        return count >= required_match_count
+
+
+# def has_sublist2(
+#     *,
+#     my_list: list,
+#     required_match_count: int,
+#     position: int,
+#     contiguous: bool,
+#     condition: callable,
+# ) -> bool:
+#     if contiguous:
+#         # Check for contiguous matches based on position
+#         if position == 0:
+#             # Check if the beginning of the list matches
+#             count = sum(1 for x in my_list[:required_match_count] if condition(x))
+#             return count == required_match_count
+#         elif position > 0:
+#             # Skip the first `position` elements
+#             count = sum(
+#                 1
+#                 for x in my_list[position : position + required_match_count]
+#                 if condition(x)
+#             )
+#             return count == required_match_count
+#         elif position == -1:
+#             # Check if the end of the list matches
+#             count = sum(1 for x in my_list[-required_match_count:] if condition(x))
+#             return count == required_match_count
+#         elif position < -1:
+#             # Skip the last `abs(position)` elements
+#             count = sum(1 for x in my_list[:position] if condition(x))
+#             return count == required_match_count
+#     else:
+#         # Check for non-contiguous matches
+#         count = sum(1 for x in my_list if condition(x))
+#         return count >= required_match_count
+
+
+def comparison_safe_converter(x):
+    if type(x) in [bool, NoneType]:  # bool before int (bool IS an int in Python)
+        return "1" if x else "0"
+    elif type(x) in [int, float, str]:
+        return f"{x}"
+    return x
+
+
+def comparison_safe_converter_for_pairs(v1, v2) -> (str | float, str | float):
+    if is_numeric(v1):
+        v1 = float(v1)
+    if is_numeric(v2):
+        v2 = float(v2)
+    return v1, v2
+
+
+def _array(s, f, c):
+    return s
+
+
+def _add(s, f, c):
+    return _add_values([f(x, c) for x in s[1:]])
+
+
+def _add_values(values):
+    tmp = 0
+    for i, res in enumerate(values):
+        if is_numeric(res):
+            res = float(res)
+        if i == 0:
+            tmp = res
+        elif type(res) is float and type(tmp) is float:
+            tmp = tmp + res
+        else:
+            # Handle datetime string + timedelta
+            if isinstance(res, datetime.timedelta):
+                tmp = _try_parse_datetime(tmp)
+            elif isinstance(tmp, datetime.timedelta):
+                res = _try_parse_datetime(res)
+            try:
+                tmp = tmp + res
+            except TypeError:
+                pass
+
+    # Convert datetime result back to string
+    if type(tmp) is not float and isinstance(tmp, (datetime.datetime, datetime.date)):
+        return tmp.isoformat()
+    return tmp
+
+    # tmp = 0
+    # for i, x in enumerate(l):
+    #     if i == 0:
+    #         tmp = x
+    #     else:
+    #         tmp = tmp + x
+    # return tmp
+
+
+# def _sum(s, f, c):
+#     l_res = []
+#     for x in s[1:]:
+#         res = f(x, c)
+#         if isinstance(res, list):
+#             l_res.append(sum([xx for xx in res[1:]]))
+#         else:
+#             l_res.append(res)
+#     return sum(l_res)
+
+
+def _sum(s, f, c):
+    l_res = ["Array"]
+    for x in s[1:]:
+        res = f(x, c)
+        if isinstance(res, list):
+            l_res.append(_add(["Array"] + [xx for xx in res[1:]], f, c))
+        else:
+            l_res.append(res)
+    return _add(l_res, f, c)
+
+
+def _subtract(s, f, c):
+    return _subtract_values([f(x, c) for x in s[1:]])
+
+
+def _subtract_values(values):
+    if all(type(v) in (int, float) for v in values):
+        return reduce(lambda a, b: a - b, values)
+    # Convert datetime strings if we're dealing with timedelta
+    converted = []
+    for i, v in enumerate(values):
+        if isinstance(v, datetime.timedelta):
+            converted.append(v)
+        elif any(isinstance(other, datetime.timedelta) for other in values):
+            converted.append(_try_parse_datetime(v))
+        else:
+            converted.append(v)
+    result = reduce(lambda a, b: a - b, converted)
+    if isinstance(result, (datetime.datetime, datetime.date)):
+        return result.isoformat()
+    return result
+
+
+def _numeric_values(elements, f, c):
+    """Evaluate each element once and keep the numeric results."""
+    values = [f(x, c) for x in elements]
+    return [x for x in values if is_numeric(x)]
+
+
+def _max(s, f, c):
+    args = s[1:]
+    if len(args) == 1:
+        if isinstance(args[0], str):
+            return max(_numeric_values(f(args[0], c), f, c))
+        else:
+            return max(_numeric_values(args[0][1:], f, c))
+    else:
+        # CortexJS-style variadic form: ["Max", a, b, c, ...]
+        return max([f(x, c) for x in args])
+
+
+def _min(s, f, c):
+    args = s[1:]
+    if len(args) == 1:
+        if isinstance(args[0], str):
+            return min(_numeric_values(f(args[0], c), f, c))
+        else:
+            return min(_numeric_values(args[0][1:], f, c))
+    else:
+        # CortexJS-style variadic form: ["Min", a, b, c, ...]
+        return min([f(x, c) for x in args])
+
+
+def _average(s, f, c):
+    if isinstance(s[1], str):
+        # A reference to "answer" has been passed
+        s_ = [float(x) for x in _numeric_values(f(s[1], c), f, c)]
+    else:
+        s_ = [float(x) for x in _numeric_values(s[1][1:], f, c)]
+    try:
+        return sum(s_) / len(s_)
+    except ZeroDivisionError:
+        return None
+
+
+def _median(s, f, c):
+    if isinstance(s[1], str):
+        return statistics.median(_numeric_values(f(s[1], c), f, c))
+    else:
+        return statistics.median(_numeric_values(s[1][1:], f, c))
+
+
+def _length(s, f, c):
+    if isinstance(s[1], str):
+        return len([x for x in f(s[1], c)][1:])
+    else:
+        return len([x for x in s[1][1:]])
+
+
+def _clamp(s, f, c):
+    """
+    ["Clamp", value] or ["Clamp", value, lower, upper]
+    Bounds `value` between `lower` (default -1) and `upper` (default 1),
+    matching CortexJS `Clamp`.
+    """
+    value = f(s[1], c)
+    lower = f(s[2], c) if len(s) > 2 else -1
+    upper = f(s[3], c) if len(s) > 3 else 1
+    return max(lower, min(upper, value))
+
+
+def _arr_vals(s, f, c):
+    lst = f(s[1], c)
+    if not (isinstance(lst, list) and lst[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    return [f(x, c) for x in lst[1:]]
+
+
+def _first(s, f, c):
+    return _arr_vals(s, f, c)[0]
+
+
+def _last(s, f, c):
+    return _arr_vals(s, f, c)[-1]
+
+
+def _rest(s, f, c):
+    return ["Array"] + _arr_vals(s, f, c)[1:]
+
+
+def _most(s, f, c):
+    return ["Array"] + _arr_vals(s, f, c)[:-1]
+
+
+def _reverse(s, f, c):
+    return ["Array"] + list(reversed(_arr_vals(s, f, c)))
+
+
+def _sort(s, f, c):
+    return ["Array"] + sorted(_arr_vals(s, f, c))
+
+
+def _is_empty(s, f, c):
+    lst = f(s[1], c)
+    if not (isinstance(lst, list) and lst[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    return len(lst) <= 1
+
+
+def _range(s, f, c):
+    """
+    CortexJS-compatible `Range`:
+    ["Range", upper]                -> 1..upper (inclusive)
+    ["Range", lower, upper]         -> lower..upper (inclusive)
+    ["Range", lower, upper, step]   -> lower..upper (inclusive), stepped
+    Distinct from `GenerateRange`, which is 0-indexed and exclusive at
+    the upper end.
+    """
+    if len(s) == 2:
+        return ["Array"] + list(range(1, int(f(s[1], c)) + 1))
+    elif len(s) == 3:
+        lo, hi = int(f(s[1], c)), int(f(s[2], c))
+        return ["Array"] + list(range(lo, hi + 1))
+    else:
+        lo, hi, step = (
+            int(f(s[1], c)),
+            int(f(s[2], c)),
+            int(f(s[3], c)),
+        )
+        return ["Array"] + list(range(lo, hi + 1 if step > 0 else hi - 1, step))
+
+
+def _join(s, f, c):
+    """
+    ["Join", array1, array2, ...]
+    Concatenates the given arrays.
+    """
+    result = ["Array"]
+    for arg in s[1:]:
+        lst = f(arg, c)
+        if not (isinstance(lst, list) and lst[0] == "Array"):
+            raise ValueError("All parameters must be arrays.")
+        result += [f(x, c) for x in lst[1:]]
+    return result
+
+
+def _unique(s, f, c):
+    # Hashable values are looked up in a set; values equal as hashable
+    # values are equal as list members too (1, 1.0 and True are one value).
+    result, hashed, unhashable = ["Array"], set(), []
+    for x in _arr_vals(s, f, c):
+        try:
+            if x in hashed:
+                continue
+            hashed.add(x)
+        except TypeError:
+            if x in unhashable:
+                continue
+            unhashable.append(x)
+        result.append(x)
+    return result
+
+
+def _zip(s, f, c):
+    lists = [[f(x, c) for x in f(arg, c)[1:]] for arg in s[1:]]
+    return ["Array"] + [["Array", a, b] for a, b in zip(*lists)]
+
+
+def _at(s, f, c):
+    """
+    ["At", array, index]
+    1-indexed element access (CortexJS `At`), with negative indexes
+    counting from the end.
+    """
+    vals = _arr_vals(s, f, c)
+    idx = int(f(s[2], c))
+    if idx > 0:
+        return vals[idx - 1]
+    else:
+        return vals[idx]
+
+
+def _variance(s, f, c):
+    return statistics.variance(_arr_vals(s, f, c))
+
+
+def _standard_deviation(s, f, c):
+    return statistics.stdev(_arr_vals(s, f, c))
+
+
+def _any(s, f, c):
+    evaluated = f(s[1], c)
+    if isinstance(evaluated, list) and evaluated[0] == "Array":
+        return any([f(x, c) for x in evaluated[1:]])
+    raise ValueError("Parameter 1 must be an array.")
+
+
+def _all(s, f, c):
+    evaluated = f(s[1], c)
+    if isinstance(evaluated, list) and evaluated[0] == "Array":
+        return all([f(x, c) for x in evaluated[1:]])
+    raise ValueError("Parameter 1 must be an array.")
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))
+
+
+def _constants(s, f, c):
+    # Bindings are evaluated when first looked up, so the ones the body
+    # never reaches cost nothing.
+    c, group = c.child(), object()
+    for index, x in enumerate(s[1:-1]):
+        shadowed = c._bindings.get(x[0], _UNBOUND)
+        c[x[0]] = LazyBinding(x[1], f, c, group, index, shadowed)
+    return f(s[-1], c)
+
+
+def _switch(s, f, c):
+    expression = f(s[1], c)
+    for x in s[3:]:
+        if len(x) != 2:
+            raise ValueError("Case of 'Switch' should have exactly two parameters")
+        if comparison_safe_converter(expression) == comparison_safe_converter(
+            f(x[0], c)
+        ):
+            return f(x[1], c)
+    else:
+        return f(s[2], c)
+
+
+def _strict_switch(s, f, c):
+    expression = f(s[1], c)
+    for x in s[3:]:
+        if len(x) != 2:
+            raise ValueError(
+                "Case of 'StrictSwitch' should have exactly two parameters"
+            )
+        if expression == f(x[0], c):
+            return f(x[1], c)
+    else:
+        return f(s[2], c)
+
+
+def _if(s, f, c):
+    if len(s) < 3:
+        raise ValueError("Wrong parameters for 'If'")
+
+    # Detect the CortexJS flat form: ["If", cond, then] or
+    # ["If", cond, then, else]. In the Python pair-form below,
+    # s[1] is always a [condition, value] pair whose first
+    # element (the condition) is itself a MathJSON construct
+    # call, e.g. ["Equal", 1, 0]. A CortexJS flat condition is
+    # either not a list at all, or is itself such a construct
+    # call (its own first element is a *known construct name*).
+    # Requiring a known name - rather than any string - keeps a
+    # Python-form condition that is a bare parameter reference,
+    # e.g. ["If", ["my_flag", "yes"], "no"], from being
+    # misdetected as CortexJS form.
+    is_cortexjs_form = not isinstance(s[1], list) or (
+        bool(s[1]) and isinstance(s[1][0], str) and s[1][0] in constructs
+    )
+
+    if is_cortexjs_form:
+        if len(s) not in (3, 4):
+            raise ValueError("Wrong parameters for 'If'")
+        if f(s[1], c):
+            return f(s[2], c)
+        elif len(s) == 4:
+            return f(s[3], c)
+        else:
+            return None  # CortexJS: Nothing, no else and condition false
+
+    for x in s[1:-1]:
+        if len(x) != 2:
+            raise ValueError("Wrong if or elif in 'If'")
+        try:
+            if f(x[0], c):
+                try:
+                    return f(x[1], c)
+                except MathJSONException:
+                    # Branch failed, try next condition
+                    continue
+        except MathJSONException:
+            return f(s[-1], c)  # return default value (else)
+
+    return f(s[-1], c)
+
+
+def _in(s, f, c):
+    if len(s) != 3:
+        raise ValueError("Wrong parameters for 'In'")
+    if isinstance(s[2], list) and s[2][0] == "Array":
+        return f(s[1], c) in [f(x, c) for x in s[2][1:]]
+
+    elif isinstance(s[2], str):
+        return f(s[1], c) in f(s[2], c)
+    else:
+        raise ValueError("Wrong parameters for 'In'. Parameter 2 must be a list.")
+
+
+def _not_in(s, f, c):
+    return not _in(s, f, c)
+
+
+def _contains_any_of(s, f, c):
+    if isinstance(s[1], list) and s[1][0] == "Array":
+        list1 = [f(x, c) for x in s[1][1:]]
+    elif isinstance(s[1], str):
+        list1 = f(s[1], c)
+
+    if isinstance(s[2], list) and s[2][0] == "Array":
+        list2 = [f(x, c) for x in s[2][1:]]
+    elif isinstance(s[2], str):
+        list2 = f(s[2], c)
+
+    if any(x in list1 for x in list2):
+        return True
+    return False
+
+
+def _contains_all_of(s, f, c):
+    if isinstance(s[1], list) and s[1][0] == "Array":
+        list1 = [f(x, c) for x in s[1][1:]]
+    elif isinstance(s[1], str):
+        list1 = f(s[1], c)
+
+    if isinstance(s[2], list) and s[2][0] == "Array":
+        list2 = [f(x, c) for x in s[2][1:]]
+    elif isinstance(s[2], str):
+        list2 = f(s[2], c)
+
+    if all(x in list1 for x in list2):
+        return True
+    return False
+
+
+def _contains_none_of(s, f, c):
+    return not _contains_any_of(s, f, c)
+
+
+def _str(s, f, c):
+    if len(s) < 2:
+        raise ValueError("Wrong parameters for 'Str'")
+    return f"{f(s[1])}"
+
+
+def _not(s, f, c):
+    return not f(s[1])
+
+
+def _apply_fn(fn_expr, args, f, c):
+    """
+    Apply a "function" argument (as used by Map, Filter, and the
+    CortexJS form of Reduce) to positional `args`. Supports two
+    conventions:
+
+    - CortexJS `["Function", body, param1, param2, ...]`. If no
+      parameter names are given, `args` are bound to the
+      anonymous placeholders "_" (only when there is a single
+      argument) and "_1", "_2", ... (always), for use inside
+      `body`.
+    - The existing "call template" convention:
+      `[function_name, ...]`, applied as
+      `f([function_name] + args, c)`.
+    """
+    if isinstance(fn_expr, list) and fn_expr and fn_expr[0] == "Function":
+        body = fn_expr[1]
+        params = fn_expr[2:]
+        local_c = c.child()
+        if params:
+            for name, value in zip(params, args):
+                local_c[name] = value
+        else:
+            if len(args) == 1:
+                local_c["_"] = args[0]
+            for i, value in enumerate(args, start=1):
+                local_c[f"_{i}"] = value
+        return f(body, local_c)
+    elif isinstance(fn_expr, list) and fn_expr:
+        function_name = fn_expr[0]
+        return f([function_name] + list(args), c)
+    else:
+        raise ValueError(
+            "Wrong function parameter: expected a call template "
+            "(e.g. ['Square']) or a ['Function', body, ...] expression."
+        )
+
+
+def _map(s, f, c):
+    """
+    ["Map", list, function, more parameters]
+    The `function` must accept at least one parameter. That is for the current loop element.
+    The `more parameters` are for any additional parameters that function might have.
+    `function` can also be a CortexJS ["Function", body, ...params] expression.
+    """
+    z = f(s[1], c)
+    if isinstance(z, list):
+        retlist = ["Array"]
+        for x in z[1:]:
+            try:
+                retlist.append(_apply_fn(s[2], [x] + s[3:], f, c))
+            except MathJSONException:
+                retlist.append(x)
+        return retlist
+
+
+def _strict_map(s, f, c):
+    """
+    ["Map", list, function, more parameters]
+    The `function` must accept at least one parameter. That is for the current loop element.
+    The `more parameters` are for any additional parameters that function might have.
+    `function` can also be a CortexJS ["Function", body, ...params] expression.
+    """
+    z = f(s[1], c)
+    if isinstance(z, list):
+        retlist = ["Array"]
+        for x in z[1:]:
+            retlist.append(_apply_fn(s[2], [x] + s[3:], f, c))
+        return retlist
+
+
+def _filter(s, f, c):
+    """
+    ["Filter", list, function, more parameters]
+    The `function` must accept at least one parameter. That is for the current loop element.
+    The `more parameters` are for any additional parameters that function might have.
+    `function` can also be a CortexJS ["Function", body, ...params] expression.
+    """
+    z = f(s[1], c)
+    if isinstance(z, list):
+        retlist = ["Array"]
+        for x in z[1:]:
+            if _apply_fn(s[2], [x] + s[3:], f, c):
+                retlist.append(x)
+        return retlist
+
+
+def _has_matching_sublist(s, f, c):
+    """
+    ["HasMatchingSublist", list, required_match_count, position, contiguous, function, more parameters]
+    """
+    the_list = f(s[1], c)[1:]
+    required_match_count = f(s[2], c)
+    position = f(s[3], c)
+    contiguous = f(s[4], c)
+    conditions = []
+
+    for i, x in enumerate(the_list):
+        the_function_name = s[5][0]
+        ss = [the_function_name, x] + s[6:]
+        conditions.append(f(ss, c))
+        pass
+
+    return has_matching_sublist(
+        my_list=the_list,
+        required_match_count=required_match_count,
+        position=position,
+        contiguous=contiguous,
+        conditions=conditions,
+    )
+
+
+def _strptime(datetime_str, parameters):
+    return datetime.datetime.strptime(datetime_str, parameters).isoformat()
+
+
+def _strftime(s, f, c):
+    dt = _try_parse_datetime(f(s[1], c))
+    if not isinstance(dt, (datetime.datetime, datetime.date)):
+        raise ValueError(f"Strftime: could not parse input as datetime: {dt!r}")
+    parameters = f(s[2], c)
+    return dt.strftime(parameters)
+
+
+def _now(s, f, c):
+    return datetime.datetime.now().isoformat()
+
+
+def _today(s, f, c):
+    return datetime.date.today().isoformat()
+
+
+def _time_delta_days(value):
+    return datetime.timedelta(days=value)
+
+
+def _time_delta_minutes(value):
+    return datetime.timedelta(minutes=value)
+
+
+def _time_delta_hours(value):
+    return datetime.timedelta(hours=value)
+
+
+def _time_delta_weeks(value):
+    return datetime.timedelta(weeks=value)
+
+
+# def Equal(s):
+#     a = comparison_safe_converter(f(s[1], c))
+#     b = comparison_safe_converter(f(s[2], c))
+#     return a == b
+#     if type(a) in [int, float, str]:
+#         a = f"{a}"
+#     elif type(a) in [bool, NoneType]:
+#         if a:
+#             a = True
+#         else:
+#             a = None
+
+
+#     if is_numeric(a):
+
+
+#     lambda s: f"{f(s[1], c)}" == f"{f(s[2], c)}",
+
+
+def _is_defined(s, f, c):
+    return s[1] in f.solver_parameters or s[1] in c
+
+
+def _is_undefined(s, f, c):
+    return not _is_defined(s, f, c)
+
+
+def _greater(a, b):
+    v1, v2 = comparison_safe_converter_for_pairs(a, b)
+    try:
+        return v1 > v2
+    except TypeError:
+        return False
+
+
+def _greater_equal(a, b):
+    v1, v2 = comparison_safe_converter_for_pairs(a, b)
+    try:
+        return v1 >= v2
+    except TypeError:
+        return False
+
+
+def _less(a, b):
+    v1, v2 = comparison_safe_converter_for_pairs(a, b)
+    try:
+        return v1 < v2
+    except TypeError:
+        return False
+
+
+def _less_equal(a, b):
+    v1, v2 = comparison_safe_converter_for_pairs(a, b)
+    try:
+        return v1 <= v2
+    except TypeError:
+        return False
+
+
+def _boolean_and(s, f, c):
+    """
+    Boolean AND operation.
+    ["And", condition1, condition2, ...]
+    """
+    for x in s[1:]:
+        if not f(x, c):
+            return False
+    return True
+
+
+def _boolean_or(s, f, c):
+    """
+    Boolean OR operation.
+    ["Or", condition1, condition2, ...]
+    """
+    for x in s[1:]:
+        if f(x, c):
+            return True
+    return False
+
+
+def _variable(s, f, c):
+    """
+    ["Variable", variable_name]
+    The `variable_name` must be a string.
+    """
+    variable_name = s[1]
+    if variable_name in c:
+        return f(c[variable_name], c)
+    else:
+        raise KeyError(f"Variable '{variable_name}' is not defined")
+
+
+def _function(s, f, c):
+    """
+    ["Function", body_expression, param_name1, param_name2, ...]
+    Defines a CortexJS-style lambda: `body_expression` is evaluated
+    with the given parameter names bound to whatever arguments it
+    is called with. `Function` expressions are meant to be passed
+    as the `function` argument of Map, Filter, and Reduce; if no
+    parameter names are given, the anonymous placeholders "_",
+    "_1", "_2", ... are used instead (see those functions).
+    Evaluating a ["Function", ...] expression outside of such a
+    context just returns it unevaluated.
+    """
+    return s
+
+
+def _multiply_by_scalar(s, f, c):
+    """
+    ["MultiplyByScalar", array, scalar]
+    The `array` must be an array of numeric values.
+    The `scalar` is the number to multiply each element by.
+    """
+    array = f(s[1], c)
+    scalar = f(s[2], c)
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    array = [f(x, c) for x in array[1:]]
+    return ["Array"] + _MultiplyByScalar(array, scalar)
+
+
+def _multiply_by_array(s, f, c):
+    """
+    ["MultiplyByArray", array1, array2]
+    The `array1` and `array2` must be arrays of the same length.
+    """
+    array1 = f(s[1], c)
+    array2 = f(s[2], c)
+    if not (isinstance(array1, list) and array1[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    if not (isinstance(array2, list) and array2[0] == "Array"):
+        raise ValueError("Parameter 2 must be an array.")
+    array1 = [f(x, c) for x in array1[1:]]
+    array2 = [f(x, c) for x in array2[1:]]
+    if len(array1) != len(array2):
+        raise ValueError("Both arrays must be of the same length.")
+    return ["Array"] + _MultiplyByArray(array1, array2)
+
+
+def _add_scalar(s, f, c):
+    """
+    ["AddScalar", array, scalar]
+    The `array` must be an array of numeric values.
+    The `scalar` is the number to add to each element.
+    """
+    array = f(s[1], c)
+    scalar = f(s[2], c)
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    array = [f(x, c) for x in array[1:]]
+    return ["Array"] + _AddScalar(array, scalar)
+
+
+def _subtract_scalar(s, f, c):
+    """
+    ["SubtractScalar", array, scalar]
+    The `array` must be an array of numeric values.
+    The `scalar` is the number to subtract from each element.
+    """
+    array = f(s[1], c)
+    scalar = f(s[2], c)
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    array = [f(x, c) for x in array[1:]]
+    return ["Array"] + _SubtractScalar(array, scalar)
+
+
+def _add_array(s, f, c):
+    """
+    ["AddArray", array1, array2]
+    The `array1` and `array2` must be arrays of the same length.
+    """
+    array1 = f(s[1], c)
+    array2 = f(s[2], c)
+    if not (isinstance(array1, list) and array1[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    if not (isinstance(array2, list) and array2[0] == "Array"):
+        raise ValueError("Parameter 2 must be an array.")
+    array1 = [f(x, c) for x in array1[1:]]
+    array2 = [f(x, c) for x in array2[1:]]
+    if len(array1) != len(array2):
+        raise ValueError("Both arrays must be of the same length.")
+    return ["Array"] + _AddArray(array1, array2)
+
+
+def _subtract_array(s, f, c):
+    """
+    ["SubtractArray", array1, array2]
+    The `array1` and `array2` must be arrays of the same length.
+    """
+    array1 = f(s[1], c)
+    array2 = f(s[2], c)
+    if not (isinstance(array1, list) and array1[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    if not (isinstance(array2, list) and array2[0] == "Array"):
+        raise ValueError("Parameter 2 must be an array.")
+    array1 = [f(x, c) for x in array1[1:]]
+    array2 = [f(x, c) for x in array2[1:]]
+    if len(array1) != len(array2):
+        raise ValueError("Both arrays must be of the same length.")
+    return ["Array"] + _SubtractArray(array1, array2)
+
+
+def _generate_range(s, f, c):
+    """
+    ["GenerateRange", end]
+    or
+    ["GenerateRange", start, end, step]
+    The `start`, `end`, and `step` are numeric values.
+    """
+    if len(s) == 2:
+        end = f(s[1], c)
+        start = 0
+        step = 1
+    elif len(s) == 4:
+        start = f(s[1], c)
+        end = f(s[2], c)
+        step = f(s[3], c)
+    else:
+        raise ValueError(
+            "GenerateRange requires either 1 or 3 parameters (end or start, end, step)."
+        )
+    if step == 0:
+        raise ValueError("Step cannot be zero.")
+    if (start < end and step < 0) or (start > end and step > 0):
+        raise ValueError("Step direction is incorrect for the given range.")
+    result = ["Array"]
+    if start < end:
+        current = start
+        while current < end:
+            result.append(current)
+            current += step
+    else:
+        current = start
+        while current > end:
+            result.append(current)
+            current += step
+    return result
+
+
+def _at_index(s, f, c):
+    """
+    ["AtIndex", array, index]
+    The `array` must be an array of values.
+    The `index` is the index of the element to retrieve.
+    """
+    array = f(s[1], c)
+    index = f(s[2], c)
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    # array = [f(x, c) for x in array[1:]]
+    # return array[index]
+    array = [x for x in array[1:]]
+    return f(array[index], c)
+
+
+def _slice(s, f, c):
+    """
+    ["Slice", array, start, end]
+    The `array` must be an array of values.
+    The `start` and `end` are the slice indices.
+    """
+    array = f(s[1], c)
+    start = f(s[2], c)
+    end = f(s[3], c)
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    array = [f(x, c) for x in array[1:]]
+    return ["Array"] + array[start:end]
+
+
+def _cumulative_product(s, f, c):
+    """
+    ["CumulativeProduct", array]
+    The `array` must be an array of numeric values.
+    """
+    array = f(s[1], c)
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    array = [f(x, c) for x in array[1:]]
+    return ["Array"] + _CumulativeProduct(array)
+    # return _CumulativeProduct(array)
+
+
+def _cumulative_sum(s, f, c):
+    """
+    ["CumulativeSum", array]
+    The `array` must be an array of numeric values.
+    """
+    array = f(s[1], c)
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    array = [f(x, c) for x in array[1:]]
+    return ["Array"] + _CumulativeSum(array)
+    # return
+
+
+def _interp(s, f, c):
+    """
+    ["Interp", x_array, y_array, target_x]
+    The `x_array` and `y_array` must be arrays of the same length.
+    The `target_x` is the x value to interpolate for.
+    """
+    return _interp_values(f(s[1], c), f(s[2], c), f(s[3], c), f, c)
+
+
+def _interp_values(x_array, y_array, target_x, f, c):
+    if not (isinstance(x_array, list) and x_array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    if not (isinstance(y_array, list) and y_array[0] == "Array"):
+        raise ValueError("Parameter 2 must be an array.")
+    x_array = [f(x, c) for x in x_array[1:]]
+    y_array = [f(y, c) for y in y_array[1:]]
+    return linear_interpolate(x_array, y_array, target_x)
+
+
+def _find_interval_index(s, f, c):
+    """
+    ["FindIntervalIndex", array, target_value]
+    The `array` must be an array of numeric values.
+    The `target_value` is the value to find the interval index for.
+    """
+    array = f(s[1], c)
+    target_value = f(s[2], c)
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    array = [f(x, c) for x in array[1:]]
+    zz = find_interpolation_bounds_2indexes(array, target_value)
+    return zz[0]
+
+
+def _trapezoidal_integrate(s, f, c):
+    """
+    ["TrapezoidalIntegrate", function_expression, start, end, n, variable]
+    """
+    np = _numpy()
+    if np is None:
+        raise ImportError(
+            "TrapezoidalIntegrate requires 'numpy'. Install with 'pip install numpy'."
+        )
+    function_expression = s[1]
+    start = f(s[2], c)
+    end = f(s[3], c)
+    n = f(s[4], c)
+    variable = s[5]
+
+    t = np.linspace(start, end, n + 1)
+
+    # Calculate the integral using the trapezoidal rule
+
+    values = []
+    c = c.child()
+    for x in t:
+        variable_name = variable[1]
+        variable_value = x
+        c[variable_name] = variable_value
+        values.append(f(function_expression, c))
+    return _trapezoidal_rule(values, start, end, n)
+
+
+def _trapezoidal_rule(values, start, end, n):
+    h = (end - start) / n
+    return h * (0.5 * values[0] + _numpy().sum(values[1:-1]) + 0.5 * values[-1])
+
+
+def _reduce(s, f, c):
+    """
+    Two calling conventions, disambiguated by argument count:
+
+    CortexJS form (3 or 4 arguments):
+    ["Reduce", list, function]
+    ["Reduce", list, function, initial_value]
+    `function` is applied as `function(accumulator, current_item)`
+    on each element; without `initial_value`, the first element
+    seeds the accumulator. `function` can be a call template
+    (e.g. ["Add"]) or a ["Function", body, ...params] expression
+    (see `_apply_fn`).
+
+    Original Python form (6 arguments):
+    ["Reduce", list, initial_value, function, str_name_of_accumulator, str_name_of_current, str_name_of_index]
+    """
+    if len(s) <= 4:
+        the_list = f(s[1], c)
+        if not (isinstance(the_list, list) and the_list[0] == "Array"):
+            raise ValueError("Parameter 1 must be an array.")
+        elements = the_list[1:]
+        fn_expr = s[2]
+
+        if len(s) == 4:
+            accumulator = f(s[3], c)
+            remaining = elements
+        else:
+            if not elements:
+                raise ValueError(
+                    "'Reduce' on an empty collection requires an initial value."
+                )
+            accumulator = f(elements[0], c)
+            remaining = elements[1:]
+
+        for x in remaining:
+            accumulator = _apply_fn(fn_expr, [accumulator, x], f, c)
+        return accumulator
+
+    the_list = f(s[1], c)[1:]
+    initial_value = f(s[2], c)
+    function_expression = s[3]
+
+    _accumulator = s[4]
+    name_accumulator = _accumulator[1]
+
+    _current = s[5]
+    name_current = _current[1]
+
+    _index = s[6]
+    name_index = _index[1]
+
+    c = c.child()
+    c[name_accumulator] = initial_value
+
+    start = 0
+    appended = _appended_to(function_expression, name_accumulator)
+    if appended is not None and _is_array(initial_value):
+        # ["Appended", accumulator, value] would copy the accumulator on
+        # every step; as `value` does not name it, append to one copy instead.
+        accumulator = list(initial_value)
+        c[name_accumulator] = accumulator
+        for i, x in enumerate(the_list):
+            c[name_current] = x
+            c[name_index] = i
+            value = f(appended, c)
+            if _holds(value, accumulator):
+                # `value` reached the accumulator through a parameter, e.g.
+                # {"p": "acc"}, and must keep seeing it as it is now: append
+                # to a copy, as Appended does, from here on.
+                c[name_accumulator] = accumulator + [value]
+                start = i + 1
+                break
+            accumulator.append(value)
+        else:
+            return accumulator
+
+    for i in range(start, len(the_list)):
+        c[name_current] = the_list[i]
+        c[name_index] = i
+        c[name_accumulator] = f(function_expression, c)
+
+    return c[name_accumulator]
+
+
+def _appended_to(expression, name):
+    """
+    `value` if `expression` is ["Appended", name, value] (or the array is
+    ["Variable", name]) and `value` does not mention `name`, else None.
+    """
+    if not (
+        isinstance(expression, list)
+        and len(expression) == 3
+        and expression[0] == "Appended"
+        and expression[1] in (name, ["Variable", name])
+    ):
+        return None
+    if name in _names_in(expression[2]):
+        return None
+    return expression[2]
+
+
+def _is_array(value):
+    return isinstance(value, list) and bool(value) and value[0] == "Array"
+
+
+def _holds(value, target):
+    """Whether `value` is the list `target` or a list holding it, at any depth."""
+    stack = [value]
+    while stack:
+        x = stack.pop()
+        if x is target:
+            return True
+        if type(x) is list:
+            stack.extend(x)
+    return False
+
+
+def _product(s, f, c):
+    """
+    ["Product", array]
+    Multiplies together the numeric elements of `array`.
+    """
+    the_list = f(s[1], c)
+    if not (isinstance(the_list, list) and the_list[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+    result = 1
+    for x in the_list[1:]:
+        result *= f(x, c)
+    return result
+
+
+def _appended(s, f, c):
+    """
+    ["Appended", array, value]
+    The `array` must be an array of values.
+    The `value` is the value to append to the array.
+    """
+    array = f(s[1], c)
+
+    if not (isinstance(array, list) and array[0] == "Array"):
+        raise ValueError("Parameter 1 must be an array.")
+
+    value = f(s[2], c)
+
+    array = [x for x in array[1:]]
+    array.append(value)
+    return ["Array"] + array
+
+
+def _multiply_values(values):
+    return reduce(lambda a, b: float(a) * float(b), values)
+
+
+def _strict(function, arity=1):
+    """
+    Construct for a plain function of 0, 1 or 2 evaluated arguments, e.g.
+    `_strict(math.exp)` for ["Exp", x]. The arguments are evaluated left to
+    right and passed to `function`; extra arguments are ignored and missing
+    ones raise IndexError, as for the hand-written constructs.
+
+    `function` and `arity` are kept on the construct so that other backends
+    (see `mathjson_solver.compiler`) can call `function` on values directly.
+    """
+    if arity == 0:
+        construct = lambda s, f, c: function()  # noqa: E731
+    elif arity == 1:
+        construct = lambda s, f, c: function(f(s[1], c))  # noqa: E731
+    else:
+        construct = lambda s, f, c: function(f(s[1], c), f(s[2], c))  # noqa: E731
+    construct.function = function
+    construct.arity = arity
+    return construct
+
+
+# Dispatch table shared by every solver, built once at import. Each construct
+# is called as `construct(s, f, c)`: `s` is the expression node, `f` the
+# evaluator of the solver doing the evaluation (itself called as `f(expr, c)`)
+# and `c` the local scope.
+constructs = {
+    "Sum": _sum,
+    "Add": _add,
+    "Subtract": _subtract,
+    "Constants": _constants,
+    "Switch": _switch,
+    "StrictSwitch": _strict_switch,
+    "If": _if,
+    "Multiply": lambda s, f, c: _multiply_values([f(x, c) for x in s[1:]]),
+    "Divide": _strict(lambda a, b: a / b, 2),
+    "Negate": _strict(lambda a: -a),
+    "Power": _strict(pow, 2),
+    "Root": _strict(lambda a, n: pow(a, 1.0 / n), 2),
+    "Sqrt": _strict(lambda a: pow(a, 1.0 / 2)),
+    "Square": _strict(lambda a: pow(a, 2)),
+    "Exp": _strict(math.exp),
+    # CortexJS-compatible: ["Log", x] is log base 10; ["Log", x, b] is
+    # log base b. Use "Ln" for natural log. (BREAKING as of 2.0.0 -
+    # "Log" previously meant natural log.)
+    "Log": lambda s, f, c: (
+        math.log10(f(s[1], c)) if len(s) == 2 else math.log(f(s[1], c), f(s[2], c))
+    ),
+    "Log2": _strict(math.log2),
+    "Log10": _strict(math.log10),
+    "Ln": _strict(math.log),
+    "Lb": _strict(math.log2),  # CortexJS name for Log2
+    "Lg": _strict(math.log10),  # CortexJS name for Log10
+    "LogOnePlus": _strict(math.log1p),
+    # "Equal": lambda s, f, c: f"{f(s[1], c)}" == f"{f(s[2], c)}",
+    "Equal": _strict(
+        lambda a, b: comparison_safe_converter(a) == comparison_safe_converter(b), 2
+    ),
+    "IsTrue": _strict(bool),
+    "IsFalse": _strict(lambda a: not bool(a)),
+    "StrictEqual": _strict(lambda a, b: a == b, 2),
+    # "Greater": lambda s, f, c: f(s[1], c) > f(s[2], c),
+    "Greater": _strict(_greater, 2),
+    # "GreaterEqual": lambda s, f, c: f(s[1], c) >= f(s[2], c),
+    "GreaterEqual": _strict(_greater_equal, 2),
+    # "Less": lambda s, f, c: f(s[1], c) < f(s[2], c),
+    "Less": _strict(_less, 2),
+    # "LessEqual": lambda s, f, c: f(s[1], c) <= f(s[2], c),
+    "LessEqual": _strict(_less_equal, 2),
+    # "NotEqual": lambda s, f, c: f(s[1], c) != f(s[2], c),
+    "NotEqual": _strict(
+        lambda a, b: comparison_safe_converter(a) != comparison_safe_converter(b), 2
+    ),
+    "And": _boolean_and,
+    "Or": _boolean_or,
+    "Abs": _strict(abs),
+    "Round": lambda s, f, c: (
+        round(f(s[1], c), f(s[2], c)) if len(s) == 3 else int(round(f(s[1], c)))
+    ),
+    "Max": _max,
+    "Min": _min,
+    "Average": _average,
+    "Mean": _average,  # CortexJS name for Average
+    "Median": _median,
+    "Length": _length,
+    "Count": _length,  # CortexJS name for Length
+    "Any": _any,
+    "All": _all,
+    "Array": _array,
+    "List": lambda s, f, c: ["Array"]
+    + [f(x, c) for x in s[1:]],  # CortexJS name for Array
+    "In": _in,
+    "Not_in": _not_in,
+    "Contains_any_of": _contains_any_of,
+    "Contains_all_of": _contains_all_of,
+    "Contains_none_of": _contains_none_of,
+    "NotIn": _not_in,
+    "ContainsAnyOf": _contains_any_of,
+    "ContainsAllOf": _contains_all_of,
+    "ContainsNoneOf": _contains_none_of,
+    "Int": _strict(_int),
+    "Float": _strict(float),
+    "Floor": _strict(math.floor),
+    "Ceil": _strict(math.ceil),
+    "Str": _str,
+    "Not": _not,
+    # "IsDefined": lambda s, f, c: s[1] in c,
+    "IsDefined": _is_defined,
+    "IsUndefined": _is_undefined,
+    "Map": _map,
+    "StrictMap": _strict_map,
+    "Filter": _filter,
+    "HasMatchingSublist": _has_matching_sublist,
+    "Strptime": _strict(_strptime, 2),
+    "Strftime": _strftime,
+    "Today": _today,
+    "Now": _now,
+    "TimeDeltaWeeks": _strict(_time_delta_weeks),
+    "TimeDeltaHours": _strict(_time_delta_hours),
+    "TimeDeltaMinutes": _strict(_time_delta_minutes),
+    "TimeDeltaDays": _strict(_time_delta_days),
+    "Function": _function,
+    "Variable": _variable,
+    "MultiplyByScalar": _multiply_by_scalar,
+    "MultiplyByArray": _multiply_by_array,
+    "AddScalar": _add_scalar,
+    "SubtractScalar": _subtract_scalar,
+    "AddArray": _add_array,
+    "SubtractArray": _subtract_array,
+    "GenerateRange": _generate_range,
+    "AtIndex": _at_index,
+    "Slice": _slice,
+    "CumulativeProduct": _cumulative_product,
+    "CumulativeSum": _cumulative_sum,
+    "Interp": _interp,
+    "FindIntervalIndex": _find_interval_index,
+    "TrapezoidalIntegrate": _trapezoidal_integrate,
+    "Reduce": _reduce,
+    "Product": _product,
+    "Appended": _appended,
+    "Sin": _strict(math.sin),
+    "Cos": _strict(math.cos),
+    "Tan": _strict(math.tan),
+    "Arcsin": _strict(math.asin),
+    "Arccos": _strict(math.acos),
+    "Arctan": _strict(math.atan),
+    "Arctan2": _strict(math.atan2, 2),
+    "Pi": _strict(lambda: math.pi, 0),
+    "Which": _switch,  # CortexJS name for Switch
+    # --- Trigonometric: reciprocal, hyperbolic, area-hyperbolic ---
+    "Cot": _strict(lambda a: 1 / math.tan(a)),
+    "Sec": _strict(lambda a: 1 / math.cos(a)),
+    "Csc": _strict(lambda a: 1 / math.sin(a)),
+    "Arccot": _strict(lambda a: math.atan(1 / a)),
+    "Arcsec": _strict(lambda a: math.acos(1 / a)),
+    "Arccsc": _strict(lambda a: math.asin(1 / a)),
+    "Sinh": _strict(math.sinh),
+    "Cosh": _strict(math.cosh),
+    "Tanh": _strict(math.tanh),
+    "Coth": _strict(lambda a: 1 / math.tanh(a)),
+    "Sech": _strict(lambda a: 1 / math.cosh(a)),
+    "Csch": _strict(lambda a: 1 / math.sinh(a)),
+    "Arsinh": _strict(math.asinh),
+    "Arcosh": _strict(math.acosh),
+    "Artanh": _strict(math.atanh),
+    "Arcoth": _strict(lambda a: math.atanh(1 / a)),
+    "Arsech": _strict(lambda a: math.acosh(1 / a)),
+    "Arcsch": _strict(lambda a: math.asinh(1 / a)),
+    "Hypot": _strict(math.hypot, 2),
+    "Sinc": _strict(lambda a: 1.0 if a == 0 else math.sin(a) / a),
+    # --- Constants ---
+    "Degrees": _strict(lambda: math.pi / 180, 0),
+    "ExponentialE": _strict(lambda: math.e, 0),
+    "GoldenRatio": _strict(lambda: (1 + math.sqrt(5)) / 2, 0),
+    # --- Number theory / special functions ---
+    "Chop": _strict(lambda a: 0 if abs(a) < 1e-10 else a),
+    "Mod": _strict(lambda a, b: a % b, 2),
+    "Clamp": _clamp,
+    "GCD": _strict(lambda a, b: math.gcd(int(a), int(b)), 2),
+    "LCM": _strict(lambda a, b: math.lcm(int(a), int(b)), 2),
+    "Factorial": _strict(lambda a: math.factorial(int(a))),
+    "Binomial": _strict(lambda a, b: math.comb(int(a), int(b)), 2),
+    "IsPrime": _strict(_is_prime),
+    "Erf": _strict(math.erf),
+    "Erfc": _strict(math.erfc),
+    # --- Boolean logic ---
+    "Xor": _strict(lambda a, b: bool(a) ^ bool(b), 2),
+    "Nand": lambda s, f, c: not all(f(x, c) for x in s[1:]),
+    "Nor": lambda s, f, c: not any(f(x, c) for x in s[1:]),
+    "Implies": lambda s, f, c: (not f(s[1], c)) or bool(f(s[2], c)),
+    "Equivalent": _strict(lambda a, b: bool(a) == bool(b), 2),
+    # --- Statistics ---
+    "Variance": _variance,
+    "StandardDeviation": _standard_deviation,
+    # --- Collections ---
+    "First": _first,
+    "Last": _last,
+    "Rest": _rest,
+    "Most": _most,
+    "Reverse": _reverse,
+    "Sort": _sort,
+    "IsEmpty": _is_empty,
+    "Range": _range,
+    "Join": _join,
+    "Unique": _unique,
+    "Zip": _zip,
+    "At": _at,
+}
+
+
+def expanded(s):
+    """
+    `s` as nested lists if it is a `Node` (see `mathjson_solver.nodes`),
+    otherwise `s` itself. Solvers and compilers expand the expression they
+    are given; Nodes nested inside lists are not expanded.
+    """
+    # No Node exists before the module defining it is imported.
+    nodes = sys.modules.get(__package__ + ".nodes")
+    if nodes is not None and type(s) is nodes.Node:
+        return nodes.expand(s)
+    return s
+
+
+class Solver:
+    """
+    The evaluator for `solver_parameters`, called as `solver(expression)`.
+
+    Parameters whose value is an expression are evaluated once and reused
+    (see `ParameterCache`) for the duration of one evaluation with the
+    default `parameter_cache="evaluation"`, or for the lifetime of the solver
+    with `"solver"`, when the parameters are not changed afterwards. `None`
+    evaluates a parameter again on every reference. After changing the
+    parameters in place, call `solver.parameter_cache.clear()`, or
+    `solver.parameter_graph.clear()` without a cache. A solver can be
+    shared by threads.
+
+    A parameter that refers back to itself, directly or through other
+    parameters, raises a `MathJSONException` naming the cycle when it is
+    looked up again (see `ParameterGraph`); `solver.parameter_graph.order()`
+    checks all parameters up front.
+
+    `solver_parameters` can also be a list of parameter dicts, looked up in
+    order without being merged, e.g. `[request, tenant, defaults]`; names
+    in an earlier layer hide the same names in later ones.
+    `solver.with_params(layer)` returns a solver with one more layer on top.
+
+    With `plan_cache_size=N`, the last N expressions evaluated are kept
+    compiled (see `compile_expression`) and evaluated as such when they are
+    evaluated again. Plans are keyed by the identity of the expression
+    object, so an expression must not be changed in place once evaluated.
+
+    With `profile=True` the solver counts calls and time per construct and
+    per parameter, read with `solver.stats()` (see
+    `mathjson_solver.profiling`); compiled plans are not used then. With
+    `trace=path` one in every `trace_sample` evaluations is traced, node by
+    node, to the file at `path` (see `mathjson_solver.tracing`).
+
+    `evaluate` is the evaluator handed to constructs, `evaluate(s, c)`, a
+    plain function for speed. A solver pickles as its parameters and
+    options; caches, compiled plans, counters and the trace file are
+    rebuilt or reopened on the other side.
+    """
+
+    __slots__ = (
+        "solver_parameters",
+        "parameter_cache_mode",
+        "plan_cache_size",
+        "evaluate",
+        "profile",
+        "tracer",
+        "_traced",
+        "_plans",
+    )
+
+    def __init__(
+        self,
+        solver_parameters,
+        parameter_cache="evaluation",
+        plan_cache_size=0,
+        profile=False,
+        trace=None,
+        trace_sample=1,
+    ):
+        if parameter_cache not in ("evaluation", "solver", None):
+            raise ValueError(f"Unknown parameter_cache: {parameter_cache!r}")
+        if isinstance(solver_parameters, (list, tuple)):
+            solver_parameters = ChainMap(*solver_parameters)
+        self.solver_parameters = solver_parameters
+        self.parameter_cache_mode = parameter_cache
+        self.plan_cache_size = plan_cache_size
+        self.profile = self.tracer = self._traced = None
+        instruments = []
+        if profile:
+            from .profiling import Profile
+
+            self.profile = Profile()
+            instruments.append(self.profile)
+        self.evaluate = _evaluator(
+            solver_parameters, parameter_cache, None, instruments
+        )
+        if trace is not None:
+            from .tracing import Tracer
+
+            self.tracer = Tracer(trace, trace_sample)
+            self._traced = _evaluator(
+                solver_parameters, parameter_cache, None, instruments + [self.tracer]
+            )
+        self._plans = {}  # id(expression) -> (expression, CompiledExpression)
+
+    @property
+    def parameter_graph(self):
+        return self.evaluate.parameter_graph
+
+    @property
+    def parameter_cache(self):
+        return self.evaluate.parameter_cache
+
+    def __call__(self, s, c=None):
+        if type(s) is not list:
+            s = expanded(s)
+        if c is None:
+            if self.tracer is not None and self.tracer.sampled():
+                return self.tracer.evaluate(self._traced, s)
+            if self.plan_cache_size and isinstance(s, list) and s:
+                if self.profile is None:
+                    return self._plan(s).evaluate_with(self.evaluate)
+        return self.evaluate(s, c)
+
+    def with_params(self, layer):
+        """
+        A solver with the same options whose parameters are `layer` in front
+        of this solver's parameters. Neither is copied, and compiled plans
+        are shared.
+        """
+        parameters = self.solver_parameters
+        if isinstance(parameters, ChainMap):
+            layers = [layer, *parameters.maps]
+        else:
+            layers = [layer, parameters]
+        solver = Solver(
+            layers,
+            self.parameter_cache_mode,
+            self.plan_cache_size,
+            self.profile is not None,
+        )
+        solver._plans = self._plans
+        if self.tracer is not None:
+            # The same file and sampling.
+            solver.tracer = self.tracer
+            solver._traced = _evaluator(
+                solver.solver_parameters,
+                self.parameter_cache_mode,
+                None,
+                [solver.profile, self.tracer] if solver.profile else [self.tracer],
+            )
+        return solver
+
+    async def evaluate_async(self, expression, providers=None, executor=None):
+        """
+        Evaluate `expression` in `executor` without blocking the event loop;
+        see `mathjson_solver.aio`.
+        """
+        from .aio import evaluate_async
+
+        return await evaluate_async(self, expression, providers, executor)
+
+    def cancellable(self, cancelled):
+        """
+        An evaluator `f(expression)` for this solver's parameters that
+        raises `EvaluationCancelled` before evaluating a node once the
+        `threading.Event` `cancelled` is set.
+        """
+        return _evaluator(
+            self.solver_parameters,
+            self.parameter_cache_mode,
+            cancelled,
+            [self.profile] if self.profile else [],
+        )
+
+    def stats(self, clear=False):
+        """
+        Calls, time and array elements per construct and parameter since the
+        solver was created or the stats were last cleared with `clear=True`;
+        see `mathjson_solver.profiling`. Requires `profile=True`.
+        """
+        if self.profile is None:
+            raise ValueError("Profiling is off; create the solver with profile=True.")
+        return self.profile.stats(clear)
+
+    def _plan(self, expression):
+        from .compiler import compile_expression
+
+        plans = self._plans
+        entry = plans.pop(id(expression), None)
+        if entry is None or entry[0] is not expression:
+            entry = (expression, compile_expression(expression))
+            if len(plans) >= self.plan_cache_size:
+                # Evict the least recently used plan (dicts keep insertion
+                # order, and a plan is reinserted whenever it is used).
+                del plans[next(iter(plans))]
+        plans[id(expression)] = entry
+        return entry[1]
+
+    def __reduce__(self):
+        return (
+            type(self),
+            (
+                self.solver_parameters,
+                self.parameter_cache_mode,
+                self.plan_cache_size,
+                self.profile is not None,
+                None if self.tracer is None else self.tracer.path,
+                1 if self.tracer is None else self.tracer.sample,
+            ),
+        )
+
+    def __repr__(self):
+        return (
+            f"Solver({len(self.solver_parameters)} parameters, "
+            f"parameter_cache={self.parameter_cache_mode!r})"
+        )
+
+
+def _evaluator(solver_parameters, parameter_cache, cancelled=None, instruments=()):
+    """The evaluator `f(s, c=None)` of a `Solver`."""
+    graph = ParameterGraph(solver_parameters)
+    cache = None
+    if parameter_cache is not None:
+        cache = ParameterCache(graph, per_evaluation=parameter_cache == "evaluation")
+    # Profiling and tracing swap in instrumented copies of the dispatch table
+    # and of the parameter evaluation, so the evaluator never checks for them.
+    table, evaluate_parameter = constructs, graph.evaluate
+    for instrument in instruments:
+        table = instrument.table(table)
+        evaluate_parameter = instrument.parameter(evaluate_parameter)
+
+    def start_evaluation():
+        if cache is not None:
+            cache.start()
+
+    def f(s, c=None):
+        if cancelled is not None and cancelled.is_set():
+            raise EvaluationCancelled()
+        if c is None:
+            c = Scope()
+            start_evaluation()
+        elif type(c) is dict:
+            c = Scope(c)
+        if isinstance(s, numbers.Number):
+            return s
+        if isinstance(s, list):
+            if not s:
+                # Empty equation given - []
+                return None
+            if s[0] in table:
+                try:
+                    return table[s[0]](s, f, c)
+
+                # except RecursionError:
+                #     return s[0]
+                # except Exception as e:
+                except TypeError as e:
+                    raise MathJSONException(e, s, mathjson_construct=s[0]) from e
+                except ValueError as e:
+                    raise MathJSONException(e, s, mathjson_construct=s[0]) from e
+                except IndexError as e:
+                    raise MathJSONException(e, s, mathjson_construct=s[0]) from e
+                except ZeroDivisionError as e:
+                    raise MathJSONException(e, s, mathjson_construct=s[0]) from e
+            else:
+                # raise MathJSONException(
+                #     NotImplementedError(f"'{s[0]}' is not supported"), s
+                # )
+                return s
+        elif s in c:
+            # Local scope (Constants, Reduce accumulator/current/index,
+            # Function parameters, ...) shadows top-level solver parameters
+            # of the same name, matching normal lexical scoping.
+            return f(c[s], c)
+        elif s in solver_parameters:
+            if (
+                cache is not None
+                and isinstance(solver_parameters[s], (list, str))
+                and cache.cacheable(s, c)
+            ):
+                values = cache.values
+                if s in values:
+                    return values[s]
+                values[s] = result = evaluate_parameter(f, s, c)
+                return result
+            return evaluate_parameter(f, s, c)
+        else:
+            # raise KeyError(f"Parameter '{s}' is not defined")
+            return s
+
+    def parameter(s, c):
+        # The parameter branch of `f`, inlined there, for compiled code that
+        # resolved `s` as a parameter.
+        if (
+            cache is not None
+            and isinstance(solver_parameters[s], (list, str))
+            and cache.cacheable(s, c)
+        ):
+            values = cache.values
+            if s in values:
+                return values[s]
+            values[s] = result = evaluate_parameter(f, s, c)
+            return result
+        return evaluate_parameter(f, s, c)
+
+    # Constructs reach the top-level parameters (e.g. `IsDefined`) through
+    # the evaluator they are handed, since they live outside this closure.
+    f.solver_parameters = solver_parameters
+    f.parameter_graph = graph
+    f.parameter_cache = cache
+    f.parameter = parameter
+    f.start_evaluation = start_evaluation
+    return f
+
+
+def create_mathjson_solver(
+    solver_parameters,
+    parameter_cache="evaluation",
+    plan_cache_size=0,
+    profile=False,
+    trace=None,
+    trace_sample=1,
+):
+    """
+    Return a `Solver` for `solver_parameters`: an evaluator called as
+    `solver(expression)`.
+    """
+    return Solver(
+        solver_parameters,
+        parameter_cache,
+        plan_cache_size,
+        profile,
+        trace,
+        trace_sample,
+    )
+
+
+def extract_variables(s: list | int | float | str, li: set, ignore_list: set):
+    constructs = [
+        "Add",
+        "Sum",
+        "Subtract",
+        "Constants",
+        "Switch",
+        "If",
+        "Multiply",
+        "Divide",
+        "Negate",
+        "Power",
+        "Root",
+        "Sqrt",
+        "Square",
+        "Exp",
+        "Log",
+        "Log2",
+        "Log10",
+        "Ln",
+        "Equal",
+        "IsTrue",
+        "IsFalse",
+        "Greater",
+        "GreaterEqual",
+        "Less",
+        "LessEqual",
+        "NotEqual",
+        "And",
+        "Or",
+        "Abs",
+        "Round",
+        "Max",
+        "Min",
+        "Average",
+        "Median",
+        "Length",
+        "Any",
+        "All",
+        "Array",
+        "In",
+        "Not_in",
+        "Contains_any_of",
+        "Contains_all_of",
+        "Contains_none_of",
+        "NotIn",
+        "ContainsAnyOf",
+        "ContainsAllOf",
+        "ContainsNoneOf",
+        "Int",
+        "Float",
+        "Floor",
+        "Ceil",
+        "Str",
+        "Not",
+        "IsDefined",
+        "IsUndefined",
+        "StrictEqual",
+        "NotEqual",
+        "StrictSwitch",
+        "Map",
+        "StrictMap",
+        "Filter",
+        "HasMatchingSublist",
+        "Strptime",
+        "Strftime",
+        "Today",
+        "Now",
+        "TimeDeltaWeeks",
+        "TimeDeltaHours",
+        "TimeDeltaMinutes",
+        "TimeDeltaDays",
+        "Function",
+        "Variable",
+        "MultiplyByScalar",
+        "MultiplyByArray",
+        "AddScalar",
+        "SubtractScalar",
+        "AddArray",
+        "SubtractArray",
+        "GenerateRange",
+        "AtIndex",
+        "Slice",
+        "CumulativeProduct",
+        "CumulativeSum",
+        "Interp",
+        "FindIntervalIndex",
+        "TrapezoidalIntegrate",
+        "TrapezoidalIntegrate",
+        "Reduce",
+        "Product",
+        "Appended",
+        "Sin",
+        "Cos",
+        "Tan",
+        "Arcsin",
+        "Arccos",
+        "Arctan",
+        "Arctan2",
+        "Pi",
+        "Which",
+        "Lb",
+        "Lg",
+        "LogOnePlus",
+        "Mean",
+        "Count",
+        "List",
+        "Cot",
+        "Sec",
+        "Csc",
+        "Arccot",
+        "Arcsec",
+        "Arccsc",
+        "Sinh",
+        "Cosh",
+        "Tanh",
+        "Coth",
+        "Sech",
+        "Csch",
+        "Arsinh",
+        "Arcosh",
+        "Artanh",
+        "Arcoth",
+        "Arsech",
+        "Arcsch",
+        "Hypot",
+        "Sinc",
+        "Degrees",
+        "ExponentialE",
+        "GoldenRatio",
+        "Chop",
+        "Mod",
+        "Clamp",
+        "GCD",
+        "LCM",
+        "Factorial",
+        "Binomial",
+        "IsPrime",
+        "Erf",
+        "Erfc",
+        "Xor",
+        "Nand",
+        "Nor",
+        "Implies",
+        "Equivalent",
+        "Variance",
+        "StandardDeviation",
+        "First",
+        "Last",
+        "Rest",
+        "Most",
+        "Reverse",
+        "Sort",
+        "IsEmpty",
+        "Range",
+        "Join",
+        "Unique",
+        "Zip",
+        "At",
+    ]
+    if isinstance(s, str):
+        if s in ignore_list:
+            return li
+        if s not in constructs:
+            li.add(s)
+        return li
+    elif isinstance(s, list):
+        if s[0] == "Constants":
+            for x in s[1:-1]:
+                ignore_list.add(x[0])
+                li.update(extract_variables(x[1], li, ignore_list))
+            li.update(extract_variables(s[-1], li, ignore_list))
+        elif s[0] == "If":
+            # Mirror the calling-convention detection used by the solver's
+            # own `If` (see its docstring / comments): CortexJS flat form
+            # ["If", cond, then[, else]] vs. the Python pair form
+            # ["If", [cond, val], ..., else_val].
+            is_cortexjs_form = len(s) > 1 and (
+                not isinstance(s[1], list)
+                or (bool(s[1]) and isinstance(s[1][0], str) and s[1][0] in constructs)
+            )
+            if is_cortexjs_form:
+                for x in s[1:]:
+                    li.update(extract_variables(x, li, ignore_list))
+            else:
+                for elif_block in s[1:-1]:  # s[1] is list
+                    for x in elif_block:
+                        li.update(extract_variables(x, li, ignore_list))
+                li.update(extract_variables(s[-1], li, ignore_list))
+        elif s[0] == "Function":
+            # ["Function", body, param1, param2, ...]: parameter names (and
+            # the anonymous placeholders "_", "_1", "_2", ...) are bound
+            # locally, not free variables.
+            for p in s[2:]:
+                if isinstance(p, str):
+                    ignore_list.add(p)
+            ignore_list.update({f"_{i}" for i in range(1, 10)})
+            ignore_list.add("_")
+            if len(s) > 1:
+                li.update(extract_variables(s[1], li, ignore_list))
+        else:
+            for x in s[1:]:
+                li.update(extract_variables(x, li, ignore_list))
+        return li
+    else:
+        return li
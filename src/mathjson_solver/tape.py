@@ -0,0 +1,693 @@
+"""
+Flat instruction tapes for MathJSON expressions and the stack VM running them.
+
+`compile_tape(expr)` lays `expr` out in postfix order as fixed-width
+instructions `(opcode, a, b, guard)` in a single `array`, of the narrowest
+integer type that holds them. Operands index `Tape.constants`, which holds
+only literals and symbol names, or `Tape.nodes`, the sub-expressions of
+`expr` that instructions are compiled from (`FALLBACK` evaluates them,
+errors quote them). Nodes are references into `Tape.expression`, the one
+copy of `expr` a tape holds. A tape pickles as that expression alone and is
+compiled again when unpickled, so it is no larger than the expression:
+
+    tape = compile_tape(["Add", "x", ["Multiply", "y", 2]])
+    tape({"x": 1, "y": 2})  # 5.0
+    pickle.loads(pickle.dumps(tape))({"x": 3, "y": 4})  # 11.0
+
+Strict constructs, `Add`, `Subtract`, `Multiply`, `List`, `And`, `Or`, both
+forms of `If`, the `Switch` family and `Constants` are lowered to
+instructions. Every other construct in `constructs` is covered by `FALLBACK`,
+which calls the construct itself. `guard` names the node whose construct the
+interpreter would blame for an error raised by the instruction, so results
+and `MathJSONException`s are the same as `create_solver(parameters)(expr)`.
+
+Compilation and the VM both work on explicit stacks: symbols whose value is
+itself an expression run as a new frame of the same VM, and constructs
+handled by `FALLBACK` get an evaluator that runs tapes too. Nesting of lowered
+constructs is limited only by memory, not by the Python recursion limit (see
+`IterativeSolver` for the constructs that are not lowered). Like the interpreter, the VM raises a
+`MathJSONException` naming the cycle on a cyclic parameter reference, also
+when the cycle runs through constructs handled by `FALLBACK`. A
+parameter whose value is its own name, `{"a": "a"}`, is not a cycle: it
+stands for the string itself, as in the interpreter.
+"""
+
+import numbers
+import threading
+from array import array
+from collections import ChainMap
+
+from . import solver as _solver
+from .solver import (
+    MathJSONException,
+    Scope,
+    comparison_safe_converter,
+    constructs,
+    create_mathjson_solver,
+    cyclic_reference_error,
+    expanded,
+)
+
+# Errors that the interpreter turns into a MathJSONException naming the
+# construct that raised them.
+_WRAPPED_ERRORS = (TypeError, ValueError, IndexError, ZeroDivisionError)
+
+# Opcodes. Unless noted, `a` is the constant index of the instruction's node.
+CONST = 0  # push constants[a]
+SYMBOL = 1  # push the value of the symbol constants[a]
+FALLBACK = 2  # push the value of nodes[a] computed by its construct
+STRICT = 3  # pop b arguments, push the strict construct's function of them
+VALUES = 4  # pop b values, push Add/Subtract/Multiply of them
+LIST = 5  # pop b values, push ["Array", *values]
+JUMP = 6  # continue at instruction b
+JUMP_IF_FALSE = 7  # pop a value, continue at instruction b if it is falsy
+AND_TEST = 8  # pop a value; if falsy push False, continue at instruction b
+OR_TEST = 9  # pop a value; if truthy push True, continue at instruction b
+SWITCH_VALUE = 10  # convert the value on top for comparison unless b (strict)
+CASE_TEST = 11  # pop a key; on a match pop the value, else continue at b
+#                 (`a` is 1 for StrictSwitch)
+POP = 12  # discard the value on top
+INTERPRET = 13  # push the interpreter's value of nodes[a]
+ENTER_SCOPE = 14  # continue in a child of the current Scope
+BIND = 15  # pop a value, bind it to the name constants[a]
+EXIT_SCOPE = 16  # return to the parent Scope
+SETUP_CATCH = 17  # errors continue at b until POP_CATCH; `a` is 1 to catch
+#                   every error (Constants), 0 for MathJSONExceptions raised
+#                   inside the construct `guard` (If)
+POP_CATCH = 18  # leave the innermost SETUP_CATCH region
+
+OPCODE_NAMES = {
+    CONST: "CONST",
+    SYMBOL: "SYMBOL",
+    FALLBACK: "FALLBACK",
+    STRICT: "STRICT",
+    VALUES: "VALUES",
+    LIST: "LIST",
+    JUMP: "JUMP",
+    JUMP_IF_FALSE: "JUMP_IF_FALSE",
+    AND_TEST: "AND_TEST",
+    OR_TEST: "OR_TEST",
+    SWITCH_VALUE: "SWITCH_VALUE",
+    CASE_TEST: "CASE_TEST",
+    POP: "POP",
+    INTERPRET: "INTERPRET",
+    ENTER_SCOPE: "ENTER_SCOPE",
+    BIND: "BIND",
+    EXIT_SCOPE: "EXIT_SCOPE",
+    SETUP_CATCH: "SETUP_CATCH",
+    POP_CATCH: "POP_CATCH",
+}
+
+# Opcodes whose `a` indexes `constants`; for the others not listed in
+# `_NO_OPERAND` it indexes `nodes`. `guard` always indexes `nodes`.
+_CONSTANT_OPERAND = (CONST, SYMBOL, BIND)
+_NO_OPERAND = (JUMP, CASE_TEST, POP, ENTER_SCOPE, EXIT_SCOPE, SETUP_CATCH, POP_CATCH)
+
+_WIDTH = 4
+_NO_GUARD = -1
+_TAPE_CACHE_SIZE = 4096
+
+_values_functions = {
+    "Add": _solver._add_values,
+    "Subtract": _solver._subtract_values,
+    "Multiply": _solver._multiply_values,
+}
+
+
+class Tape:
+    """A MathJSON expression as a flat postfix instruction tape."""
+
+    __slots__ = ("code", "constants", "nodes", "expression")
+
+    def __init__(self, code, constants, nodes, expression):
+        self.code = code
+        self.constants = constants
+        self.nodes = nodes
+        self.expression = expression
+
+    def evaluate(self, parameters=None):
+        """Evaluate against `parameters`, as `create_solver(parameters)` would."""
+        f = _evaluator({} if parameters is None else parameters)
+        return run_tape(self, f, Scope())
+
+    __call__ = evaluate
+
+    def __len__(self):
+        return len(self.code) // _WIDTH
+
+    def __reduce__(self):
+        # The instructions are larger than the expression they come from,
+        # and compiling is deterministic: ship the expression alone.
+        return (compile_tape, (self.expression,))
+
+    def __repr__(self):
+        return f"Tape({len(self)} instructions, {len(self.constants)} constants)"
+
+    def disassemble(self):
+        """Return a readable listing of the instructions."""
+        lines = []
+        code = self.code
+        for pc in range(len(self)):
+            op, a, b, guard = code[pc * _WIDTH : pc * _WIDTH + _WIDTH]
+            if op in _NO_OPERAND:
+                operand = ""
+            elif op in _CONSTANT_OPERAND:
+                operand = _describe(self.constants[a])
+            else:
+                operand = _describe(self.nodes[a])
+            lines.append(f"{pc:>5} {OPCODE_NAMES[op]:<14}{b:>5}  {operand}")
+        return "\n".join(lines)
+
+
+def _describe(value):
+    if isinstance(value, list) and value:
+        # Only the head: nodes may be nested too deeply for repr().
+        return f"[{value[0]!r}, ...]" if len(value) > 1 else f"[{value[0]!r}]"
+    return repr(value)
+
+
+def compile_tape(expression):
+    """Compile `expression` into a `Tape`."""
+    expression = expanded(expression)
+    compiler = _TapeCompiler()
+    compiler.compile(expression)
+    code = compiler.code
+    # Most tapes index fewer than 128 constants and instructions.
+    largest = max(max(code), -1 - min(code))
+    for typecode in "bh":
+        if largest < 1 << (8 * array(typecode).itemsize - 1):
+            code = array(typecode, code)
+            break
+    return Tape(code, compiler.constants, compiler.nodes, expression)
+
+
+class _TapeCompiler:
+    """
+    Emits instructions in postfix order without recursing: lowerings are
+    generators that yield `(child, guard)` for each child to be compiled
+    before continuing with their own instructions.
+    """
+
+    def __init__(self):
+        self.code = array("i")
+        self.constants = []
+        self.nodes = []
+        self._indexes = {}
+        self._node_indexes = {}
+
+    def constant(self, value):
+        key = (type(value), id(value))
+        if key not in self._indexes:
+            self._indexes[key] = len(self.constants)
+            self.constants.append(value)
+        return self._indexes[key]
+
+    def node(self, s):
+        """The index in `nodes` of the sub-expression `s`."""
+        if id(s) not in self._node_indexes:
+            self._node_indexes[id(s)] = len(self.nodes)
+            self.nodes.append(s)
+        return self._node_indexes[id(s)]
+
+    def emit(self, op, a=0, b=0, guard=_NO_GUARD):
+        self.code.extend((op, a, b, guard))
+        return len(self.code) // _WIDTH - 1
+
+    def patch(self, pc):
+        """Point the jump at instruction `pc` to the next instruction."""
+        self.code[pc * _WIDTH + 2] = len(self.code) // _WIDTH
+
+    def compile(self, expression):
+        pending = []
+        child = (expression, _NO_GUARD)
+        while True:
+            if child is not None:
+                lowering = self.visit(*child)
+                if lowering is not None:
+                    pending.append(lowering)
+            if not pending:
+                return
+            steps, s = pending[-1]
+            try:
+                child = next(steps)
+            except StopIteration as done:
+                pending.pop()
+                child = None
+                if done.value is False:
+                    # The lowering rejected the node's shape before emitting
+                    # anything; the construct itself raises or handles it.
+                    node = self.node(s)
+                    self.emit(FALLBACK, node, 0, node)
+
+    def visit(self, s, guard):
+        """Emit the instructions for a leaf, or return the node's lowering."""
+        if isinstance(s, numbers.Number):
+            self.emit(CONST, self.constant(s))
+            return None
+        if isinstance(s, str):
+            self.emit(SYMBOL, self.constant(s), 0, guard)
+            return None
+        if not isinstance(s, list):
+            self.emit(INTERPRET, self.node(s), 0, guard)
+            return None
+        if not s:
+            self.emit(CONST, self.constant(None))
+            return None
+        try:
+            is_construct = s[0] in constructs
+        except TypeError:
+            # Unhashable head: the interpreter raises, the parent construct
+            # names the error.
+            self.emit(INTERPRET, self.node(s), 0, guard)
+            return None
+        if not is_construct or s[0] == "Array":
+            self.emit(CONST, self.constant(s))
+            return None
+        lowering = _lowerings.get(s[0])
+        if lowering is None and hasattr(constructs[s[0]], "function"):
+            lowering = _lower_strict
+        if lowering is None:
+            node = self.node(s)
+            self.emit(FALLBACK, node, 0, node)
+            return None
+        return lowering(self, s, self.node(s)), s
+
+
+def _lower_strict(t, s, node):
+    arity = constructs[s[0]].arity
+    if len(s) - 1 < arity:
+        return False
+    for x in s[1 : arity + 1]:
+        yield x, node
+    t.emit(STRICT, node, arity, node)
+
+
+def _lower_values(t, s, node):
+    for x in s[1:]:
+        yield x, node
+    t.emit(VALUES, node, len(s) - 1, node)
+
+
+def _lower_list(t, s, node):
+    for x in s[1:]:
+        yield x, node
+    t.emit(LIST, node, len(s) - 1, node)
+
+
+def _lower_and_or(t, s, node):
+    test = AND_TEST if s[0] == "And" else OR_TEST
+    jumps = []
+    for x in s[1:]:
+        yield x, node
+        jumps.append(t.emit(test, node, 0, node))
+    t.emit(CONST, t.constant(s[0] == "And"))
+    for pc in jumps:
+        t.patch(pc)
+
+
+def _lower_if(t, s, node):
+    if len(s) < 3:
+        return False
+    is_cortexjs_form = not isinstance(s[1], list) or (
+        bool(s[1]) and isinstance(s[1][0], str) and s[1][0] in constructs
+    )
+    if is_cortexjs_form:
+        if len(s) not in (3, 4):
+            return False
+        yield s[1], node
+        otherwise = t.emit(JUMP_IF_FALSE, node, 0, node)
+        yield s[2], node
+        end = t.emit(JUMP)
+        t.patch(otherwise)
+        if len(s) == 4:
+            yield s[3], node
+        else:
+            t.emit(CONST, t.constant(None))
+        t.patch(end)
+        return
+
+    if not all(isinstance(x, list) and len(x) == 2 for x in s[1:-1]):
+        return False
+    # A failing condition selects the default, a failing branch moves on to
+    # the next condition.
+    to_default, ends = [], []
+    for condition, value in s[1:-1]:
+        to_default.append(t.emit(SETUP_CATCH, 0, 0, node))
+        yield condition, node
+        t.emit(POP_CATCH)
+        next_condition = t.emit(JUMP_IF_FALSE, node, 0, node)
+        branch_failed = t.emit(SETUP_CATCH, 0, 0, node)
+        yield value, node
+        t.emit(POP_CATCH)
+        ends.append(t.emit(JUMP))
+        t.patch(next_condition)
+        t.patch(branch_failed)
+    for pc in to_default:
+        t.patch(pc)
+    yield s[-1], node
+    for pc in ends:
+        t.patch(pc)
+
+
+def _lower_switch(t, s, node):
+    if len(s) < 3 or not all(isinstance(x, list) and len(x) == 2 for x in s[3:]):
+        return False
+    strict = int(s[0] == "StrictSwitch")
+    yield s[1], node
+    t.emit(SWITCH_VALUE, node, strict, node)
+    ends = []
+    for key, result in s[3:]:
+        yield key, node
+        next_case = t.emit(CASE_TEST, strict, 0, node)
+        yield result, node
+        ends.append(t.emit(JUMP))
+        t.patch(next_case)
+    t.emit(POP)
+    yield s[2], node
+    for pc in ends:
+        t.patch(pc)
+
+
+def _is_binding(x):
+    """A `[name, value]` entry of Constants."""
+    if not (isinstance(x, list) and len(x) >= 2):
+        return False
+    try:
+        hash(x[0])
+    except TypeError:
+        return False
+    return True
+
+
+def _lower_constants(t, s, node):
+    if len(s) < 2 or not all(_is_binding(x) for x in s[1:-1]):
+        return False
+    t.emit(ENTER_SCOPE)
+    for x in s[1:-1]:
+        # Like the interpreter, a binding that cannot be computed is None.
+        failed = t.emit(SETUP_CATCH, 1, 0, node)
+        yield x[1], node
+        t.emit(POP_CATCH)
+        bind = t.emit(JUMP)
+        t.patch(failed)
+        t.emit(CONST, t.constant(None))
+        t.patch(bind)
+        t.emit(BIND, t.constant(x[0]))
+    yield s[-1], node
+    t.emit(EXIT_SCOPE)
+
+
+_lowerings = {
+    "Add": _lower_values,
+    "Subtract": _lower_values,
+    "Multiply": _lower_values,
+    "List": _lower_list,
+    "And": _lower_and_or,
+    "Or": _lower_and_or,
+    "If": _lower_if,
+    "Switch": _lower_switch,
+    "Which": _lower_switch,
+    "StrictSwitch": _lower_switch,
+    "Constants": _lower_constants,
+}
+
+
+def run_tape(tape, f, c):
+    """
+    Run `tape` in the local scope `c`. `f` is an evaluator made by
+    `create_iterative_solver`; constructs without instructions get it too.
+    """
+    solver_parameters, interpreter, tape_for = (
+        f.solver_parameters,
+        f.interpreter,
+        f.tape_for,
+    )
+    code, constants, nodes = tape.code, tape.constants, tape.nodes
+    stack, scopes, handlers, frames = [], [], [], []
+    push, pop = stack.append, stack.pop
+    # Shared with the tapes run for constructs handled by FALLBACK, so a
+    # cycle through such a construct is found too.
+    active, computing = f.chain.active, f.chain.computing
+    pc = 0
+    while True:
+        if pc >= len(code):
+            if not frames:
+                return pop()
+            code, constants, nodes, pc, c, _ = frames.pop()
+            computing.discard(active.pop())
+            continue
+        op, a, b = code[pc], code[pc + 1], code[pc + 2]
+        try:
+            if op == CONST:
+                push(constants[a])
+            elif op == SYMBOL:
+                # Resolve without recursing: follow symbols bound to other
+                # symbols here, run expressions as a new frame.
+                name, chain, called = constants[a], None, False
+                while True:
+                    if name in c:
+                        value, parameter = c[name], None
+                    elif name in solver_parameters:
+                        if name in computing:
+                            raise cyclic_reference_error(name, active + (chain or []))
+                        value, parameter = solver_parameters[name], name
+                    else:
+                        push(name)
+                        break
+                    if isinstance(value, numbers.Number):
+                        push(value)
+                    elif value == name:
+                        # A symbol bound to its own name stands for itself.
+                        push(value)
+                    elif isinstance(value, str):
+                        chain = (chain or []) + [name]
+                        if value in chain:
+                            raise cyclic_reference_error(value, active + chain)
+                        name = value
+                        continue
+                    elif isinstance(value, list) and not (
+                        value and value[0] == "Array"
+                    ):
+                        frames.append(
+                            (code, constants, nodes, pc + _WIDTH, c, len(scopes))
+                        )
+                        active.append(parameter)
+                        computing.add(parameter)
+                        callee = tape_for(value)
+                        code, constants, nodes = (
+                            callee.code,
+                            callee.constants,
+                            callee.nodes,
+                        )
+                        pc = 0
+                        called = True
+                    elif isinstance(value, list):
+                        push(value)
+                    else:
+                        push(interpreter(value, c))
+                    break
+                if called:
+                    continue
+            elif op == FALLBACK:
+                s = nodes[a]
+                push(constructs[s[0]](s, f, c))
+            elif op == INTERPRET:
+                push(interpreter(nodes[a], c))
+            elif op == STRICT:
+                function = constructs[nodes[a][0]].function
+                if b == 0:
+                    push(function())
+                elif b == 1:
+                    push(function(pop()))
+                else:
+                    right = pop()
+                    push(function(pop(), right))
+            elif op == VALUES or op == LIST:
+                values = stack[len(stack) - b :]
+                del stack[len(stack) - b :]
+                if op == LIST:
+                    push(["Array"] + values)
+                else:
+                    push(_values_functions[nodes[a][0]](values))
+            elif op == JUMP:
+                pc = b * _WIDTH
+                continue
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc = b * _WIDTH
+                    continue
+            elif op == AND_TEST:
+                if not pop():
+                    push(False)
+                    pc = b * _WIDTH
+                    continue
+            elif op == OR_TEST:
+                if pop():
+                    push(True)
+                    pc = b * _WIDTH
+                    continue
+            elif op == SWITCH_VALUE:
+                if not b:
+                    push(comparison_safe_converter(pop()))
+            elif op == CASE_TEST:
+                key = pop()
+                if a:
+                    matched = stack[-1] == key
+                else:
+                    matched = stack[-1] == comparison_safe_converter(key)
+                if not matched:
+                    pc = b * _WIDTH
+                    continue
+                pop()
+            elif op == POP:
+                pop()
+            elif op == ENTER_SCOPE:
+                scopes.append(c)
+                c = c.child()
+            elif op == BIND:
+                c[constants[a]] = pop()
+            elif op == EXIT_SCOPE:
+                c = scopes.pop()
+            elif op == SETUP_CATCH:
+                handlers.append(
+                    (b, len(stack), len(scopes), c, code[pc + 3], a, len(frames))
+                )
+            elif op == POP_CATCH:
+                handlers.pop()
+        except Exception as e:
+            error = e
+            while True:
+                # Name the construct the interpreter would, then look for a
+                # handler of the current frame that catches the error.
+                guard = code[pc + 3]
+                wrapped_at = None
+                if isinstance(error, _WRAPPED_ERRORS) and guard != _NO_GUARD:
+                    s = nodes[guard]
+                    cause = error
+                    error = MathJSONException(cause, s, mathjson_construct=s[0])
+                    error.__cause__ = cause
+                    wrapped_at = guard
+                handler = None
+                while handlers and handlers[-1][6] == len(frames):
+                    candidate = handlers.pop()
+                    target, _, _, _, owner, catch_all, _ = candidate
+                    if catch_all or (
+                        isinstance(error, MathJSONException) and wrapped_at != owner
+                    ):
+                        handler = candidate
+                        break
+                if handler is not None:
+                    target, depth, scope_depth, c, _, _, _ = handler
+                    del stack[depth:]
+                    del scopes[scope_depth:]
+                    pc = target * _WIDTH
+                    break
+                if not frames:
+                    raise error
+                # Leave the frame; the symbol that opened it raised the error.
+                code, constants, nodes, pc, c, scope_depth = frames.pop()
+                del scopes[scope_depth:]
+                computing.discard(active.pop())
+                pc -= _WIDTH
+            continue
+        pc += _WIDTH
+
+
+class _Chain(threading.local):
+    def __init__(self):
+        # Parameters whose value is being computed, outermost first (None
+        # for local bindings), and the same parameters as a set.
+        self.active = []
+        self.computing = set()
+
+
+def _evaluator(solver_parameters):
+    """The evaluator handed to constructs; it runs tapes rather than recursing."""
+    tapes = {}
+
+    def tape_for(s):
+        entry = tapes.get(id(s))
+        if entry is None or entry[0] is not s:
+            if len(tapes) >= _TAPE_CACHE_SIZE:
+                # Constructs also evaluate throwaway nodes built per call.
+                tapes.clear()
+            entry = tapes[id(s)] = (s, compile_tape(s))
+        return entry[1]
+
+    def f(s, c=None):
+        if c is None:
+            c = Scope()
+        elif type(c) is dict:
+            c = Scope(c)
+        if isinstance(s, numbers.Number):
+            return s
+        return run_tape(tape_for(s), f, c)
+
+    f.solver_parameters = solver_parameters
+    f.interpreter = create_mathjson_solver(solver_parameters).evaluate
+    f.tape_for = tape_for
+    f.chain = _Chain()
+    return f
+
+
+class IterativeSolver:
+    """
+    The evaluator for `solver_parameters` made by `create_iterative_solver`,
+    called as `solver(expression)` like a `Solver`.
+
+    Lowered constructs (see `compile_tape`) and parameters referring to
+    other parameters nest without Python recursion. Every other construct,
+    e.g. `Map`, `Reduce`, `Filter`, `Max` or `Interp`, still calls back into
+    the solver for its arguments, a few Python frames per call, so nesting
+    such constructs inside one another is limited by the recursion limit
+    (a few hundred levels by default), as with `create_solver`; the lowered
+    constructs between them do not count.
+
+    A solver can be shared by threads and pickles as its parameters.
+    Compiled tapes are cached per solver. There is no parameter cache:
+    a parameter is evaluated again on every reference.
+    """
+
+    __slots__ = ("solver_parameters", "evaluate")
+
+    def __init__(self, solver_parameters):
+        if isinstance(solver_parameters, (list, tuple)):
+            solver_parameters = ChainMap(*solver_parameters)
+        self.solver_parameters = solver_parameters
+        self.evaluate = _evaluator(solver_parameters)
+
+    def __call__(self, s, c=None):
+        return self.evaluate(expanded(s), c)
+
+    def with_params(self, layer):
+        """
+        A solver whose parameters are `layer` in front of this solver's
+        parameters; neither is copied.
+        """
+        parameters = self.solver_parameters
+        if isinstance(parameters, ChainMap):
+            return IterativeSolver([layer, *parameters.maps])
+        return IterativeSolver([layer, parameters])
+
+    def stats(self, clear=False):
+        """Not available: profiling needs `Solver(..., profile=True)`."""
+        raise ValueError(
+            "Iterative solvers do not profile; use Solver(parameters, profile=True)."
+        )
+
+    def __reduce__(self):
+        return (IterativeSolver, (self.solver_parameters,))
+
+    def __repr__(self):
+        return f"IterativeSolver({len(self.solver_parameters)} parameters)"
+
+
+def create_iterative_solver(solver_parameters):
+    """
+    Like `create_solver`, but evaluates on an explicit stack instead of by
+    Python recursion, so machine-generated formulas (long `If` chains, deep
+    `Add` trees, long chains of parameters referring to each other) are not
+    limited by the recursion limit. See `IterativeSolver` for the constructs
+    that still are.
+    """
+    return IterativeSolver(solver_parameters)
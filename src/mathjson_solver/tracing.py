@@ -0,0 +1,170 @@
+"""
+Evaluation traces in the Chrome trace-event format.
+
+    solver = create_solver(parameters, trace="trace.json", trace_sample=100)
+
+traces one in every 100 evaluations of the solver, the first included. A
+traced evaluation writes a span for itself, for each construct it
+evaluates and for each parameter it evaluates, with the construct or
+parameter name, the nesting depth, the duration and the expression
+shortened to `Tracer.summary_length` characters. Open the file in
+chrome://tracing or https://ui.perfetto.dev to see, e.g., the `Interp`
+and `Multiply` calls nested in each step of a `TrapezoidalIntegrate`.
+
+Evaluations that are not sampled run on the solver's plain evaluator;
+a sampled one runs on a second evaluator whose dispatch table entries
+record spans, so tracing costs nothing between samples.
+
+The events of an evaluation are appended to the file when it ends, so a
+trace can be read while the solver keeps writing to it. The file is in
+the JSON array format without the closing `]`, which the trace viewers
+accept. Solvers in several threads or processes can share a file: each
+span carries the process and thread ids.
+"""
+
+import itertools
+import json
+import os
+import threading
+from time import perf_counter
+
+
+class _Spans(threading.local):
+    def __init__(self):
+        self.events = None
+        self.depth = 0
+
+
+class Tracer:
+    """Writes the spans of sampled evaluations to `path`; see the module."""
+
+    summary_length = 80
+
+    def __init__(self, path, sample=1):
+        if sample < 1:
+            raise ValueError("sample must be at least 1")
+        self.path = path
+        self.sample = sample
+        self._evaluations = itertools.count()
+        self._spans = _Spans()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def sampled(self):
+        """Whether the next evaluation is traced."""
+        return next(self._evaluations) % self.sample == 0
+
+    def evaluate(self, f, expression):
+        """`f(expression)`, traced."""
+        spans = self._spans
+        outer = spans.events, spans.depth
+        spans.events, spans.depth = [], 0
+        start = perf_counter()
+        error = None
+        try:
+            return f(expression)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            end = perf_counter()
+            events = spans.events
+            spans.events, spans.depth = outer
+            events.append(
+                ("evaluation", "evaluation", start, end, -1, expression, error)
+            )
+            self._write(events)
+
+    def table(self, constructs):
+        """A copy of the dispatch table `constructs` whose entries record spans."""
+        return {
+            name: self._traced("construct", name, fn) for name, fn in constructs.items()
+        }
+
+    def parameter(self, evaluate):
+        """`ParameterGraph.evaluate` recording a span per parameter."""
+        return self._traced("parameter", None, evaluate)
+
+    def _traced(self, category, name, fn):
+        spans = self._spans
+
+        def traced(*args):
+            depth = spans.depth
+            spans.depth = depth + 1
+            error = None
+            start = perf_counter()
+            try:
+                return fn(*args)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                end = perf_counter()
+                spans.depth = depth
+                if spans.events is not None:
+                    # Constructs get (s, f, c), parameters (f, name, c).
+                    s = args[0] if name is not None else args[1]
+                    label = name if name is not None else s
+                    spans.events.append((category, label, start, end, depth, s, error))
+
+        return traced
+
+    def _write(self, events):
+        pid, tid = os.getpid(), threading.get_ident()
+        lines = []
+        for category, name, start, end, depth, s, error in events:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": {
+                    "depth": depth + 1,
+                    "expression": summary(s, self.summary_length),
+                },
+            }
+            if error is not None:
+                event["args"]["error"] = str(error)[: self.summary_length]
+            lines.append(json.dumps(event, default=str) + ",\n")
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a")
+                if self._file.tell() == 0:
+                    self._file.write("[\n")
+            self._file.write("".join(lines))
+            self._file.flush()
+
+    def close(self):
+        """Close the file; it is opened again by the next traced evaluation."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def summary(expression, limit):
+    """`expression` as JSON, cut to about `limit` characters with "..."."""
+    parts, size = [], 0
+
+    def emit(text):
+        nonlocal size
+        parts.append(text)
+        size += len(text)
+        return size <= limit
+
+    def walk(x):
+        if not isinstance(x, list):
+            return emit(json.dumps(x, default=str))
+        if not emit("["):
+            return False
+        for i, item in enumerate(x):
+            if (i and not emit(", ")) or not walk(item):
+                return False
+        return emit("]")
+
+    if walk(expression):
+        return "".join(parts)
+    return "".join(parts)[: max(limit - 3, 0)] + "..."
@@ -0,0 +1,66 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import create_solver
+from mathjson_solver.solver import constructs
+
+BMI = ["Divide", "weight", ["Square", "height"]]
+
+
+def test_evaluates_in_the_default_executor():
+    solver = create_solver({"weight": 72, "height": 1.8})
+    assert asyncio.run(solver.evaluate_async(BMI)) == solver(BMI)
+
+
+def test_providers_are_awaited_first():
+    async def weight():
+        await asyncio.sleep(0)
+        return 72
+
+    async def main():
+        solver = create_solver({"weight": 1, "height": 2})
+        return await solver.evaluate_async(
+            BMI, providers={"weight": weight, "height": asyncio.sleep(0, 1.8)}
+        )
+
+    assert asyncio.run(main()) == pytest.approx(72 / 1.8**2)
+
+
+def test_process_executor():
+    solver = create_solver({"weight": 72, "height": 1.8})
+    with ProcessPoolExecutor(1) as executor:
+        result = asyncio.run(solver.evaluate_async(BMI, executor=executor))
+    assert result == solver(BMI)
+
+
+def test_cancellation_stops_the_evaluation(monkeypatch):
+    calls = []
+    started = threading.Event()
+    square = constructs["Square"]
+
+    def slow_square(s, f, c):
+        calls.append(s)
+        started.set()
+        time.sleep(0.001)
+        return square(s, f, c)
+
+    monkeypatch.setitem(constructs, "Square", slow_square)
+    expression = ["Map", ["GenerateRange", 10000], ["Function", ["Square", "x"], "x"]]
+
+    async def main():
+        task = asyncio.create_task(create_solver({}).evaluate_async(expression))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    # asyncio.run waits for the executor's threads, so the evaluation ended.
+    assert len(calls) < 1000
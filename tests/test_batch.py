@@ -0,0 +1,90 @@
+import sys
+import os
+import math
+import pytest
+from array import array
+from itertools import count, islice
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import (
+    MathJSONException,
+    compile_expression,
+    create_solver,
+    evaluate_many,
+    solver_imap,
+)
+
+BMI = ["Divide", "weight", ["Square", "height"]]
+ROWS = [
+    {"weight": 72, "height": 1.8},
+    {"weight": 90, "height": 0},
+    {"weight": 55, "height": 1.6},
+]
+
+
+def test_results_in_order_with_errors_per_row():
+    results = evaluate_many(BMI, ROWS)
+    assert results[0] == create_solver(ROWS[0])(BMI)
+    assert isinstance(results[1], MathJSONException)
+    assert results[2] == create_solver(ROWS[2])(BMI)
+
+
+def test_other_errors_are_per_row():
+    rows = [{"x": 1}, {"x": 1000}, {"x": 0}]
+    results = evaluate_many(["Exp", "x"], rows)
+    assert results[0] == pytest.approx(math.e) and results[2] == 1
+    assert isinstance(results[1], MathJSONException)
+    assert isinstance(results[1].__cause__, OverflowError)
+    assert math.isnan(evaluate_many(["Exp", "x"], rows, as_array=True)[1])
+
+    # Variable only sees local bindings and raises KeyError otherwise.
+    expression = ["If", ["Greater", "x", 0], ["Variable", "x"], 0]
+    results = evaluate_many(expression, [{"x": 0}, {"x": 1}, {"x": -1}])
+    assert results[0] == 0 and results[2] == 0
+    assert isinstance(results[1].__cause__, KeyError)
+
+
+def test_rows_can_be_any_iterable():
+    rows = ({"x": i} for i in range(5))
+    assert evaluate_many(["Multiply", "x", 2], rows) == [0, 2, 4, 6, 8]
+    assert evaluate_many(["Multiply", "x", 2], []) == []
+
+
+def test_as_array():
+    results = evaluate_many(BMI, ROWS, as_array=True)
+    assert isinstance(results, array) and results.typecode == "d"
+    assert results[0] == pytest.approx(72 / 1.8**2)
+    assert math.isnan(results[1])
+    assert results[2] == pytest.approx(55 / 1.6**2)
+
+
+def test_as_array_non_numeric_results_are_nan():
+    expression = ["If", ["Greater", "x", 0], "x", "negative"]
+    results = evaluate_many(expression, [{"x": 1}, {"x": -1}, {"x": True}], True)
+    assert results[0] == 1.0 and math.isnan(results[1]) and results[2] == 1.0
+
+
+def test_compiled_expression_is_reused():
+    compiled = compile_expression(BMI)
+    assert evaluate_many(compiled, ROWS[:1]) == [compiled(ROWS[0])]
+
+
+def test_solver_imap_matches_evaluate_many():
+    rows = [{"weight": 50 + i, "height": i % 3} for i in range(50)]
+    results = list(solver_imap(BMI, rows, workers=2, chunksize=7))
+    expected = evaluate_many(BMI, rows)
+    assert isinstance(results[0], MathJSONException)
+    assert [str(r) for r in results] == [str(r) for r in expected]
+
+
+def test_solver_imap_reads_rows_lazily():
+    rows = ({"x": i} for i in count())
+    results = solver_imap(["Multiply", "x", 2], rows, workers=2, chunksize=10)
+    assert list(islice(results, 25)) == [2.0 * i for i in range(25)]
+    results.close()
+
+
+def test_solver_imap_chunksize():
+    with pytest.raises(ValueError):
+        list(solver_imap("x", [{}], chunksize=0))
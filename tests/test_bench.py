@@ -0,0 +1,72 @@
+import sys
+import os
+import json
+import pytest
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import create_solver
+from mathjson_solver.bench import compare, harvest, main, percentile
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_harvests_each_test_up_to_its_first_evaluation():
+    cases = harvest(os.path.join(TESTS, "test_state_tuples_reduce.py"))
+    assert len(cases) == 4
+    for name, parameters, expression in cases:
+        assert name.startswith("test_")
+        assert "Reduce" in json.dumps(expression)
+        create_solver(parameters)(expression)
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy not available")
+def test_harvests_each_set_of_parametrized_arguments():
+    cases = harvest(os.path.join(TESTS, "test_TrapezoidalIntegratel.py"))
+    assert len(cases) == 13
+    assert cases[0][0] == "test_integrals[0]"
+    assert all(e[0] == "TrapezoidalIntegrate" for _, _, e in cases)
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.95) == 7
+
+
+def test_saves_results_and_fails_on_regression(tmp_path, capsys):
+    saved = str(tmp_path / "results.json")
+    argv = ["--workload", "state_tuples", "--workload", "batch_10k"]
+    argv += ["--repeat", "2", "--rows", "50", "--root", os.path.dirname(TESTS)]
+    assert main(argv + ["--save", saved]) == 0
+    with open(saved) as f:
+        results = json.load(f)
+    assert set(results["workloads"]) == {"state_tuples", "batch_10k"}
+    assert results["workloads"]["state_tuples"]["samples"] == 8
+    assert "p99_ms" in capsys.readouterr().out.replace(" ", "_")
+
+    assert compare(results, results, 0.2) == []
+    faster = json.loads(json.dumps(results))
+    faster["workloads"]["batch_10k"]["p50_ms"] /= 10
+    assert [r[0] for r in compare(results, faster, 0.2)] == ["batch_10k"]
+
+    baseline = str(tmp_path / "baseline.json")
+    with open(baseline, "w") as f:
+        json.dump(faster, f)
+    assert main(argv + ["--baseline", baseline]) == 1
+    assert "regression: batch_10k" in capsys.readouterr().err
+
+
+def test_missing_workloads_are_skipped(tmp_path, capsys):
+    assert main(["--workload", "gail", "--root", str(tmp_path)]) == 0
+    assert "gail: skipped" in capsys.readouterr().err
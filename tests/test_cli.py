@@ -0,0 +1,117 @@
+import sys
+import os
+import json
+import subprocess
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver.cli import main
+
+BMI = ["Divide", "weight", ["Square", "height"]]
+
+
+@pytest.fixture
+def expression_file(tmp_path):
+    path = tmp_path / "bmi.json"
+    path.write_text(json.dumps(BMI))
+    return str(path)
+
+
+def test_csv_to_jsonl(tmp_path, expression_file, capsys):
+    rows = tmp_path / "rows.csv"
+    rows.write_text("weight,height\n72,1.8\n90,0\n")
+    assert main([expression_file, str(rows)]) == 0
+    out, err = capsys.readouterr()
+    results = [json.loads(line) for line in out.splitlines()]
+    assert results[0] == {"row": 0, "result": 72 / 1.8**2}
+    assert results[1]["row"] == 1 and "division by zero" in results[1]["error"]
+    assert err.startswith("2 rows, 1 errors in ") and "rows/sec" in err
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_jsonl_to_csv(tmp_path, expression_file, workers):
+    rows = tmp_path / "rows.jsonl"
+    rows.write_text("".join(f'{{"weight": {w}, "height": 2}}\n' for w in range(5)))
+    output = tmp_path / "results.csv"
+    argv = [expression_file, str(rows), "-o", str(output), "--chunksize", "2"]
+    assert main(argv + ["--workers", str(workers)]) == 0
+    lines = output.read_text().splitlines()
+    assert lines[0] == "row,result,error"
+    assert lines[1:] == [f"{i},{i / 4}," for i in range(5)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rows_that_raise_other_errors_are_written_as_errors(tmp_path, workers, capsys):
+    expression = tmp_path / "exp.json"
+    expression.write_text(json.dumps(["Exp", "x"]))
+    rows = tmp_path / "rows.jsonl"
+    rows.write_text('{"x": 0}\n{"x": 1000}\n{"x": 1}\n')
+    argv = [str(expression), str(rows), "--workers", str(workers)]
+    assert main(argv) == 0
+    out, err = capsys.readouterr()
+    results = [json.loads(line) for line in out.splitlines()]
+    assert [r["row"] for r in results] == [0, 1, 2]
+    assert results[0]["result"] == 1 and "math range error" in results[1]["error"]
+    assert err.startswith("3 rows, 1 errors in ")
+
+
+@pytest.mark.parametrize("module", ["mathjson_solver.cli", "mathjson_solver"])
+def test_python_dash_m(tmp_path, expression_file, module):
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(__file__), "../src"))
+    process = subprocess.run(
+        [sys.executable, "-m", module, expression_file],
+        input='{"weight": 72, "height": 1.8}\n',
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    assert process.returncode == 0
+    assert json.loads(process.stdout) == {"row": 0, "result": 72 / 1.8**2}
+    assert process.stderr.startswith("1 rows, 0 errors")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rows_that_cannot_be_read_are_written_as_errors(tmp_path, workers, capsys):
+    expression = tmp_path / "exp.json"
+    expression.write_text(json.dumps(["Add", "x", 1]))
+    rows = tmp_path / "rows.jsonl"
+    rows.write_text('{"x": 1}\n{"x": \n[1, 2]\n{"x": 2}\n{"x": 3\n')
+    argv = [str(expression), str(rows), "--workers", str(workers), "--chunksize", "1"]
+    assert main(argv) == 0
+    out, err = capsys.readouterr()
+    results = [json.loads(line) for line in out.splitlines()]
+    assert [r["row"] for r in results] == [0, 1, 2, 3, 4]
+    assert [r.get("result") for r in results] == [2, None, None, 3, None]
+    assert "Expecting value" in results[1]["error"]
+    assert "not a JSON object" in results[2]["error"]
+    assert err.startswith("5 rows, 3 errors in ")
+
+
+def test_csv_records_with_the_wrong_fields_are_written_as_errors(tmp_path, capsys):
+    expression = tmp_path / "exp.json"
+    expression.write_text(json.dumps(["Add", "x", "y"]))
+    rows = tmp_path / "rows.csv"
+    rows.write_text('x,y\n1,2\n3\n\n4,5,6\n"7,8\n')
+    assert main([str(expression), str(rows)]) == 0
+    out, err = capsys.readouterr()
+    results = [json.loads(line) for line in out.splitlines()]
+    assert results[0] == {"row": 0, "result": 3}
+    assert "1 fields, expected 2" in results[1]["error"]
+    assert "3 fields, expected 2" in results[2]["error"]
+    assert len(results) == 4 and "error" in results[3]
+
+
+def test_results_without_a_json_form_are_written_as_errors(tmp_path, capsys):
+    expression = tmp_path / "exp.json"
+    expression.write_text(json.dumps(["Multiply", "x", 1e308, 10]))
+    rows = tmp_path / "rows.jsonl"
+    rows.write_text('{"x": 1}\n{"x": 0}\n')
+    assert main([str(expression), str(rows), "--output-format", "csv"]) == 0
+    out, err = capsys.readouterr()
+    assert out.splitlines() == [
+        "row,result,error",
+        "0,,Result inf has no JSON form",
+        "1,0.0,",
+    ]
+    assert err.startswith("2 rows, 1 errors in ")
@@ -0,0 +1,144 @@
+import sys
+import os
+import pytest
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import create_solver, compile_to_python, to_python_source
+
+CASES = [
+    ({"x": 2, "y": 3}, ["Add", "x", "y", 4]),
+    ({"x": 2, "y": 3}, ["Multiply", ["Add", "x", 1], ["Subtract", "y", 1]]),
+    ({"x": 7}, ["Multiply", "x"]),
+    ({}, ["Add", "2024-01-01", ["TimeDeltaDays", 3]]),
+    ({"x": "5"}, ["Add", "x", "not a number", 1]),
+    ({"rate": 0.1, "t": 2}, ["Exp", ["Negate", ["Multiply", "rate", "t"]]]),
+    ({}, ["Divide", ["Sqrt", 16], ["Root", 27, 3]]),
+    ({}, ["List", ["Mod", 7, 3], ["Square", 3], ["IsFalse", 0], ["Ln", 1]]),
+    ({}, ["List", ["StrictEqual", 1, 1.0], ["Abs", -2], ["Pi"], ["Sinc", 0]]),
+    ({}, ["Round", 5.5]),
+    ({"x": 5}, ["If", ["Greater", "x", 3], 42, 99]),
+    ({"x": 1}, ["If", ["Greater", "x", 3], 42]),
+    ({}, ["If", [["Equal", 1, 0], 10], [["Equal", 2, 2], 20], 9000]),
+    ({"my_flag": False}, ["If", ["my_flag", "yes"], "no"]),
+    # A failing branch falls through to the next condition / the default.
+    ({}, ["If", [["Equal", 1, 1], ["Divide", 1, 0]], 7]),
+    ({}, ["If", [["Divide", 1, 0], 1], 7]),
+    ({"14": "1"}, ["Switch", "14", 0, ["0", 0], ["1", 1], ["2", 2]]),
+    ({"v": 2}, ["Which", "v", -1, [1, 10], [2, 20]]),
+    ({"v": "2"}, ["StrictSwitch", "v", -1, [2, 20], ["2", 22]]),
+    ({"x": 5}, ["Constants", ["x", 100], ["Add", "x", 1]]),
+    (
+        {"x": 10},
+        [
+            "Constants",
+            ["bad", ["Divide", "missing", 2]],
+            ["good", "x"],
+            ["If", [["Greater", "good", 0], "good"], "bad"],
+        ],
+    ),
+    # Parameter expressions see the local bindings of the caller.
+    ({"p": ["Add", "k", 1]}, ["Constants", ["k", 41], "p"]),
+    ({"a": 1, "b": 0}, ["And", "a", ["Or", "b", ["Not", "b"]]]),
+    ({"a": 1, "b": 0}, ["Or", "b", ["And", "a", "b"]]),
+    ({"a": 12}, ["Constants", ["x", 5], ["List", ["IsDefined", "x"], "a"]]),
+    (
+        {"x": 5},
+        [
+            "Reduce",
+            ["Array", 1, 2, 3, 4],
+            0,
+            ["Add", "accumulator", "x"],
+            ["Variable", "accumulator"],
+            ["Variable", "x"],
+            ["Variable", "index"],
+        ],
+    ),
+    ({}, ["Reduce", ["Array", 1, 2, 3, 4], ["Function", ["Add", "_1", "_2"]]]),
+    ({}, ["Map", ["Array", 1, 2, 3], ["Function", ["Add", "n", 1], "n"]]),
+    ({}, ["Map", ["Array", 1, 4, 9], ["Function", ["Sqrt", "_"]]]),
+    # Map keeps the elements its function fails on.
+    ({}, ["Map", ["Array", 1, 0, 2], ["Function", ["Divide", 1, "_"]]]),
+    ({}, ["StrictMap", ["Array", 1, 2], ["Function", ["Add", "_1", "_2"]], 10]),
+    ({}, ["Filter", ["Array", 1, 5, 2, 7], ["Function", ["Greater", "v", 3], "v"]]),
+    ({}, ["Map", ["Array", 1, 2], ["Square"]]),
+    ({}, ["Map", 5, ["Function", "_"]]),
+    (
+        {"ages": ["Array", 20, 25, 30], "hazards": ["Array", 1, 2, 4]},
+        ["Interp", "ages", "hazards", 27.5],
+    ),
+    ({"a": ["Add", "b", 1], "b": 2}, ["Multiply", "a", 2]),
+    ({"a": "a"}, "a"),
+    ({}, ["NotAConstruct", 1]),
+    ({}, ["Array", 1, 2]),
+    ({}, []),
+]
+
+ERROR_CASES = [
+    ({}, ["Divide", 1, 0]),
+    ({}, ["Power", 1]),
+    ({}, ["Sqrt", "x"]),
+    ({}, ["Interp", ["Array", 1, 2, 3], ["Array", 10, 20, 30], 4]),
+    ({}, ["If", ["Greater", 1, 0]]),
+    ({}, ["Add", 1, ["Multiply", 2, ["Ln", 0]]]),
+    ({}, ["Variable", "undefined"]),
+    ({}, ["StrictMap", ["Array", 1, 0], ["Function", ["Divide", 1, "_"]]]),
+]
+
+
+@pytest.mark.parametrize("parameters, expression", CASES)
+def test_generated_matches_interpreter(parameters, expression):
+    program = compile_to_python(expression)
+    assert program(parameters) == create_solver(parameters)(expression)
+
+
+@pytest.mark.parametrize("parameters, expression", ERROR_CASES)
+def test_generated_raises_like_interpreter(parameters, expression):
+    with pytest.raises(Exception) as expected:
+        create_solver(parameters)(expression)
+    with pytest.raises(type(expected.value)) as actual:
+        compile_to_python(expression)(parameters)
+    assert str(actual.value) == str(expected.value)
+
+
+def test_generated_source_is_compiled_once_and_cached():
+    expression = ["Add", "x", ["Multiply", "y", 2]]
+    program = compile_to_python(expression)
+    assert compile_to_python(["Add", "x", ["Multiply", "y", 2]]) is program
+    assert program({"x": 1, "y": 2}) == 5.0
+    assert program.evaluate({"x": 3, "y": 4}) == 11.0
+
+
+def test_generated_source_is_exported():
+    source = to_python_source(["Exp", ["Sin", "x"]])
+    assert source.startswith("def mathjson_expression(f, c):")
+    assert "math.exp(math.sin(_ref('x', f, c)))" in source
+    assert compile_to_python(["Exp", ["Sin", "x"]]).source == source
+
+
+def test_deeply_nested_expression_falls_back_to_interpreter():
+    expression = 1
+    for _ in range(120):
+        expression = ["If", ["Greater", "x", 0], ["Add", expression, 1], 0]
+    assert compile_to_python(expression)({"x": 1}) == 121.0
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy not available")
+def test_generated_trapezoidal_integrate():
+    expression = [
+        "TrapezoidalIntegrate",
+        ["Multiply", ["Variable", "x"], ["Sin", ["Variable", "x"]]],
+        0,
+        ["Pi"],
+        200,
+        ["Variable", "x"],
+    ]
+    assert compile_to_python(expression)({}) == create_solver({})(expression)
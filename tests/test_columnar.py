@@ -0,0 +1,156 @@
+import sys
+import os
+import math
+import pytest
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import MathJSONException, create_solver, evaluate_columns
+
+pytestmark = pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy not available")
+
+
+def _columns():
+    return {
+        "x": np.array([-2.5, -1.0, 0.0, 0.5, 1.0, 3.0, -0.0, 40.0]),
+        "k": np.array([-3, -1, 0, 1, 2, 0, 5, 1]),
+        "flag": np.array([True, False, True, False, True, False, True, False]),
+        "group": np.array(["a", "c", "a", "c", "d", "d", "a", "c"]),
+        "ages": ["Array", 20, 30, 40, 50],
+        "hazards": ["Array", 0.1, 0.2, 0.5, 0.25],
+        "shifted": ["Add", "x", 1],
+    }
+
+
+def _per_row(expression, columns):
+    """Each row's result with a solver per row, NaN where it is not a number."""
+    size = len(columns["x"])
+    results = []
+    for i in range(size):
+        row = {
+            name: value[i].item() if isinstance(value, np.ndarray) else value
+            for name, value in columns.items()
+        }
+        try:
+            value = create_solver(row)(expression)
+        except MathJSONException:
+            value = None
+        is_number = isinstance(value, (int, float))
+        results.append(float(value) if is_number else math.nan)
+    return results
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        ["Add", "x", "k", 1],
+        ["Subtract", "k", "x", 2],
+        ["Multiply", "shifted", "k"],
+        ["Divide", "x", "k"],
+        ["Ln", "x"],
+        ["Log", "x", 2],
+        ["Sqrt", "x"],
+        ["Power", "x", 0.5],
+        ["Square", "k"],
+        ["Exp", "x"],
+        ["Arcsin", "x"],
+        ["Negate", "flag"],
+        ["If", ["Greater", "x", 0], "x", ["Negate", "k"]],
+        ["If", ["Greater", "x", 0], "x"],
+        ["If", [["Less", "x", -1], 1], [["Equal", "group", "a"], ["Ln", "x"]], 3],
+        ["Switch", "group", 0, ["a", "x"], ["c", "k"]],
+        ["Which", "k", 9, [1, 10], [0.0, 11], [0, 12]],
+        ["Equal", "x", 0.0],
+        ["Equal", "flag", 1],
+        ["And", "flag", ["Greater", "x", 0]],
+        ["Or", "flag", ["Divide", 1, "k"]],
+        ["Not", "flag"],
+        ["Constants", ["y", ["Multiply", "x", 2]], ["z", ["Add", "y", 1]], "z"],
+        ["Constants", ["y", ["Ln", "x"]], ["If", ["Greater", "x", 0], "y", 0]],
+        ["Interp", "ages", "hazards", ["Add", ["Multiply", "x", 5], 35]],
+        ["Max", "x", "k"],
+        ["Divide", 1, 0],
+    ],
+)
+def test_matches_a_solver_per_row(expression):
+    columns = _columns()
+    values, _ = evaluate_columns(expression, columns)
+    assert values.dtype == np.float64
+    assert values.tolist() == pytest.approx(
+        _per_row(expression, columns), rel=1e-12, nan_ok=True
+    )
+
+
+def test_vectorised_constructs_do_not_fall_back():
+    expression = [
+        "If",
+        [["Greater", ["Interp", "ages", "hazards", "x"], 0.3], ["Exp", "x"]],
+        [["And", "flag", ["Equal", "group", "a"]], ["Divide", "shifted", "k"]],
+        ["Ln", ["Abs", "x"]],
+    ]
+    _, fallbacks = evaluate_columns(expression, _columns())
+    assert fallbacks == []
+
+
+def test_other_constructs_fall_back_row_by_row():
+    reduce = ["Reduce", ["Array", "x", "k"], ["Function", ["Add", "_1", "_2"]], 0]
+    expression = ["Multiply", reduce, ["Max", 1, 2]]
+    values, fallbacks = evaluate_columns(expression, _columns())
+    assert fallbacks == [reduce]
+    assert values.tolist() == pytest.approx(_per_row(expression, _columns()))
+
+
+def test_rows_that_fail_are_nan():
+    values, _ = evaluate_columns(["Divide", 1, "k"], {"k": np.array([2, 0, 4])})
+    assert values[0] == 0.5 and math.isnan(values[1]) and values[2] == 0.25
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        ["Exp", "x"],
+        ["Add", ["Exp", "x"], ["Max", "x", 0]],
+        ["Max", ["Exp", "x"], 0],
+    ],
+)
+def test_rows_that_overflow_are_nan(expression):
+    columns = {"x": np.array([1.0, 1000.0, 0.0])}
+    values, _ = evaluate_columns(expression, columns)
+    assert math.isnan(values[1])
+    others = {"x": columns["x"][[0, 2]]}
+    assert values[[0, 2]].tolist() == pytest.approx(_per_row(expression, others))
+
+
+def test_shared_values_that_overflow_make_every_row_nan():
+    columns = {"x": np.array([1.0, 2.0]), "z": 1000}
+    values, _ = evaluate_columns(["Add", ["Exp", "z"], "x"], columns)
+    assert all(math.isnan(v) for v in values)
+
+
+def test_strings_that_name_parameters_are_looked_up():
+    columns = {"code": np.array(["a", "b", "other"]), "a": 1, "b": ["Add", "a", 1]}
+    values, fallbacks = evaluate_columns(["Add", "code", 0], columns)
+    assert values.tolist()[:2] == [1.0, 2.0]
+    assert math.isnan(values[2])
+    assert "code" in fallbacks
+
+
+def test_shared_values_are_broadcast():
+    values, _ = evaluate_columns(["Multiply", 2, "rate"], {"rate": 3, "x": np.zeros(4)})
+    assert values.tolist() == [6.0] * 4
+
+
+def test_columns_of_different_lengths():
+    with pytest.raises(ValueError):
+        evaluate_columns("x", {"x": np.zeros(3), "y": np.zeros(4)})
+    with pytest.raises(ValueError):
+        evaluate_columns("x", {"x": np.zeros((3, 2))})
@@ -0,0 +1,203 @@
+import sys
+import os
+import pytest
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import create_solver, compile_expression, MathJSONException
+from mathjson_solver.solver import constructs
+
+CASES = [
+    ({"x": 2, "y": 3}, ["Add", "x", "y", 4]),
+    ({"x": 2, "y": 3}, ["Multiply", ["Add", "x", 1], ["Subtract", "y", 1]]),
+    ({}, ["Add", "2024-01-01", ["TimeDeltaDays", 3]]),
+    ({"x": "5"}, ["Add", "x", "not a number", 1]),
+    ({"a": ["Array", 1, 2, 3]}, ["Max", "a"]),
+    ({}, ["Sinc", 0]),
+    ({}, ["Log", 100]),
+    ({}, ["Log", 8, 2]),
+    ({}, ["Round", 5.5]),
+    ({}, ["Pi"]),
+    ({"x": 5}, ["If", ["Greater", "x", 3], 42, 99]),
+    ({"x": 1}, ["If", ["Greater", "x", 3], 42]),
+    ({}, ["If", [["Equal", 1, 0], 10], [["Equal", 2, 2], 20], 9000]),
+    ({"my_flag": False}, ["If", ["my_flag", "yes"], "no"]),
+    # A failing branch falls through to the next condition / the default.
+    ({}, ["If", [["Equal", 1, 1], ["Divide", 1, 0]], 7]),
+    ({"14": "1"}, ["Switch", "14", 0, ["0", 0], ["1", 1], ["2", 2]]),
+    ({"v": 2}, ["Which", "v", -1, [1, 10], [2, 20]]),
+    ({"v": "2"}, ["StrictSwitch", "v", -1, [2, 20], ["2", 22]]),
+    ({"x": 5}, ["Constants", ["x", 100], ["Add", "x", 1]]),
+    (
+        {"x": 10},
+        [
+            "Constants",
+            ["bad", ["Divide", "missing", 2]],
+            ["good", "x"],
+            ["If", [["Greater", "good", 0], "good"], "bad"],
+        ],
+    ),
+    ({"a": 1, "b": 0}, ["And", "a", ["Or", "b", ["Not", "b"]]]),
+    ({"a": 12}, ["Constants", ["x", 5], ["List", ["IsDefined", "x"], "a"]]),
+    (
+        {"x": 5},
+        [
+            "Reduce",
+            ["Array", 1, 2, 3, 4],
+            0,
+            ["Add", "accumulator", "x"],
+            ["Variable", "accumulator"],
+            ["Variable", "x"],
+            ["Variable", "index"],
+        ],
+    ),
+    ({}, ["Reduce", ["Array", 1, 2, 3, 4], ["Function", ["Add", "_1", "_2"]]]),
+    ({}, ["Map", ["Array", 1, 2, 3], ["Function", ["Add", "n", 1], "n"]]),
+    (
+        {"ages": ["Array", 20, 25, 30], "hazards": ["Array", 1, 2, 4]},
+        ["Interp", "ages", "hazards", 27.5],
+    ),
+    # Parameters that are themselves expressions, including a cycle.
+    ({"a": ["Add", "b", 1], "b": 2}, ["Multiply", "a", 2]),
+    ({"a": "a"}, "a"),
+    ({}, ["NotAConstruct", 1]),
+    ({}, []),
+    # Local names: each binding sees the ones before it, inner bindings
+    # shadow outer ones, and parameter expressions see the caller's locals.
+    ({"x": 1}, ["Constants", ["x", ["Add", "x", 1]], ["y", "x"], ["List", "x", "y"]]),
+    ({}, ["Constants", ["x", 1], ["x", ["Add", "x", 1]], "x"]),
+    (
+        {},
+        [
+            "Constants",
+            ["x", 1],
+            ["List", ["Constants", ["x", 2], "x"], "x", ["Variable", "x"]],
+        ],
+    ),
+    ({"p": ["Add", "k", 1]}, ["Constants", ["k", 41], "p"]),
+    (
+        {"k": 0.5},
+        [
+            "Reduce",
+            ["Array", 1, 2, 3],
+            0,
+            ["Constants", ["k", ["Multiply", "i", 10]], ["Add", "acc", "k", "x"]],
+            ["Variable", "acc"],
+            ["Variable", "x"],
+            ["Variable", "i"],
+        ],
+    ),
+    ({"v": "w", "w": 3}, ["Constants", ["t", "v"], ["Add", "t", 1]]),
+]
+
+ERROR_CASES = [
+    ({}, ["Divide", 1, 0]),
+    ({}, ["Power", 1]),
+    ({}, ["Sqrt", "x"]),
+    ({}, ["Interp", ["Array", 1, 2, 3], ["Array", 10, 20, 30], 4]),
+    ({}, ["If", ["Greater", 1, 0]]),
+    ({}, ["Add", 1, ["Multiply", 2, ["Ln", 0]]]),
+    ({}, ["Variable", "undefined"]),
+]
+
+
+@pytest.mark.parametrize("parameters, expression", CASES)
+def test_compiled_matches_interpreter(parameters, expression):
+    compiled = compile_expression(expression)
+    assert compiled(parameters) == create_solver(parameters)(expression)
+
+
+@pytest.mark.parametrize("parameters, expression", ERROR_CASES)
+def test_compiled_raises_like_interpreter(parameters, expression):
+    with pytest.raises(Exception) as expected:
+        create_solver(parameters)(expression)
+    with pytest.raises(type(expected.value)) as actual:
+        compile_expression(expression)(parameters)
+    assert str(actual.value) == str(expected.value)
+
+
+def test_compiled_construct_errors_name_the_construct():
+    compiled = compile_expression(["Add", 1, ["Divide", 1, "x"]])
+    with pytest.raises(MathJSONException, match=r"Problem in Divide\."):
+        compiled({"x": 0})
+    assert compiled({"x": 2}) == 1.5
+
+
+def test_compiled_expression_is_reusable():
+    compiled = compile_expression(["Add", "x", ["Multiply", "y", 2]])
+    assert compiled({"x": 1, "y": 2}) == 5.0
+    assert compiled({"x": 3, "y": 4}) == 11.0
+    assert compiled.evaluate({"x": 0, "y": 0}) == 0.0
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy not available")
+def test_compiled_trapezoidal_integrate():
+    expression = [
+        "TrapezoidalIntegrate",
+        ["Multiply", ["Variable", "x"], ["Sin", ["Variable", "x"]]],
+        0,
+        ["Pi"],
+        200,
+        ["Variable", "x"],
+    ]
+    assert compile_expression(expression)({}) == create_solver({})(expression)
+
+
+def test_symbols_are_resolved_at_compile_time():
+    compiled = compile_expression(
+        [
+            "Constants",
+            ["rate", ["Divide", "annual_rate", 12]],
+            ["If", ["Greater", "rate", 0], ["Multiply", "principal", "rate"], "Pi"],
+        ],
+        parameters={"annual_rate": 0.06, "principal": 1000},
+    )
+    assert compiled.symbols == {
+        "annual_rate": "parameter",
+        "rate": "local",
+        "principal": "parameter",
+        "Pi": "construct",
+    }
+    assert compiled.unknown_symbols == frozenset()
+    assert compiled({"annual_rate": 0.06, "principal": 1000}) == 5.0
+
+
+def test_unknown_symbols_are_reported():
+    compiled = compile_expression(
+        ["Add", "wieght", ["Constants", ["x", 1], "x"], "x"], parameters=["weight"]
+    )
+    assert compiled.unknown_symbols == frozenset({"wieght", "x"})
+    # Declaring parameters does not restrict evaluation.
+    assert compiled({"wieght": 2, "x": 3}) == 6.0
+
+
+def test_unknown_symbols_need_declared_parameters():
+    compiled = compile_expression(["Add", "weight", ["Constants", ["x", 1], "x"]])
+    assert compiled.unknown_symbols is None
+    assert compiled.symbols == {"weight": "free", "x": "local"}
+    assert compiled({"weight": 2}) == 3.0
+
+
+def test_constants_are_evaluated_when_first_read(monkeypatch):
+    calls = []
+    monkeypatch.setitem(constructs, "Probe", lambda s, f, c: calls.append(s[1]) or s[1])
+    compiled = compile_expression(
+        [
+            "Constants",
+            ["a", ["Probe", 1]],
+            ["b", ["Probe", 2]],
+            ["a", ["Add", "a", "b"]],
+            ["Add", "b", "b"],
+        ]
+    )
+    assert compiled({}) == 4
+    # b is read twice, evaluated once; a is never read.
+    assert calls == [2]
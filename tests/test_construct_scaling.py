@@ -0,0 +1,35 @@
+import sys
+import os
+import importlib.util
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import create_solver
+from mathjson_solver.solver import NUMPY_AVAILABLE, constructs
+
+PATH = os.path.join(os.path.dirname(__file__), "../benchmarks/construct_scaling.py")
+spec = importlib.util.spec_from_file_location("construct_scaling", PATH)
+scaling = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(scaling)
+
+
+def test_every_construct_has_a_declared_complexity():
+    declared = {name for name, _, _ in scaling.CASES}
+    if not NUMPY_AVAILABLE:
+        declared.add("TrapezoidalIntegrate")
+    assert declared == set(constructs)
+    assert all(c in scaling.EXPONENTS for _, c, _ in scaling.CASES)
+
+
+@pytest.mark.parametrize("name, complexity, build", scaling.CASES)
+def test_cases_evaluate(name, complexity, build):
+    parameters, expression = build(100)
+    assert expression[0] == name or name in str(expression)
+    create_solver(parameters)(expression)
+
+
+def test_fit_exponent():
+    assert scaling.fit_exponent([(10, 1.0), (100, 1.0)]) == pytest.approx(0)
+    points = [(n, 3e-9 * n**2) for n in (100, 1000, 10000)]
+    assert scaling.fit_exponent(points) == pytest.approx(2)
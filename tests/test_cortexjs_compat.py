@@ -73,6 +73,11 @@ from mathjson_solver import create_solver
             ["Unique", ["Array", 1, 2, 2, 3, 1]],
             ["Array", 1, 2, 3],
         ),
+        (
+            {},
+            ["Unique", ["Array", 1, 1.0, True, ["Array", 1], ["Array", 1], "a", "a"]],
+            ["Array", 1, ["Array", 1], "a"],
+        ),
         ({}, ["Sort", ["Array", 3, 1, 2]], ["Array", 1, 2, 3]),
         (
             {},
@@ -27,3 +27,12 @@ def test_CumulativeSum1():
     solver = create_solver(parameters)
     # assert solver(expression) == expected_result
     assert solver(expression) == expected_result
+
+
+def test_cumulative_of_long_arrays():
+    # Each prefix used to be reduced again, so this took minutes.
+    array = ["Array"] + [1] * 100_000
+    solver = create_solver({})
+    assert solver(["CumulativeSum", array])[-1] == 100_000
+    assert solver(["CumulativeProduct", array])[-1] == 1
+    assert solver(["CumulativeSum", ["Array"]]) == ["Array"]
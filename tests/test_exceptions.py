@@ -2,6 +2,7 @@ import sys
 import os
 import pytest
 import re
+import pickle
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
 
@@ -81,3 +82,12 @@ def test_handle_exception():
         assert True
     else:
         assert False
+
+
+def test_pickles():
+    with pytest.raises(MathJSONException) as info:
+        create_solver({})(["Divide", 1, 0])
+    copy = pickle.loads(pickle.dumps(info.value))
+    assert str(copy) == str(info.value)
+    assert isinstance(copy.e, ZeroDivisionError)
+    assert copy.construct == "Divide"
@@ -0,0 +1,45 @@
+import sys
+import os
+import subprocess
+
+SRC = os.path.join(os.path.dirname(__file__), "../src/")
+
+
+def _modules_after(code):
+    process = subprocess.run(
+        [sys.executable, "-c", code + "\nimport sys\nprint(' '.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH=SRC),
+    )
+    return set(process.stdout.split())
+
+
+def test_import_loads_no_heavy_modules():
+    modules = _modules_after("import mathjson_solver")
+    for heavy in ("numpy", "statistics", "datetime", "concurrent.futures"):
+        assert heavy not in modules
+    assert "mathjson_solver.compiler" not in modules
+    # Importing the package must not import the module run by `python -m`.
+    assert "mathjson_solver.__main__" not in modules
+
+
+def test_modules_are_loaded_by_the_constructs_that_need_them():
+    modules = _modules_after(
+        "from mathjson_solver import create_solver\n"
+        "assert create_solver({})(['Median', ['Array', 1, 2, 3]]) == 2\n"
+        "assert create_solver({})(['Add', 1, 2]) == 3"
+    )
+    assert "statistics" in modules
+    assert "numpy" not in modules
+
+
+def test_lazy_exports():
+    modules = _modules_after(
+        "import mathjson_solver\n"
+        "assert mathjson_solver.compile_expression(['Add', 1, 2])() == 3\n"
+        "assert 'evaluate_columns' in dir(mathjson_solver)"
+    )
+    assert "mathjson_solver.compiler" in modules
+    assert "mathjson_solver.columnar" not in modules
@@ -0,0 +1,106 @@
+import sys
+import os
+import pickle
+import pytest
+from array import array
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import (
+    compact,
+    compile_expression,
+    compile_tape,
+    compile_to_python,
+    create_cse_solver,
+    create_iterative_solver,
+    create_solver,
+)
+from mathjson_solver.nodes import Node, expand
+
+HAZARDS = ["Array", 2.7e-6, 16.8e-6, 60.3e-6, 114.6e-6]
+AGES = ["Array", 20, 25, 30, 35]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        ["Interp", AGES, HAZARDS, "age"],
+        ["If", [["Equal", "x", 1], "one"], [["Equal", "x", 2], "two"], "other"],
+        ["Constants", ["k", ["Add", 1, 2.5]], ["List", "k", True, None]],
+        ["Array", 1, 2.0, "three"],
+        ["Array", -0.0, 0.0],
+        ["Array"],
+        [],
+        [[], ["Array", True, False]],
+        "x",
+        1.5,
+    ],
+)
+def test_round_trip(expression):
+    node = compact(expression)
+    assert expand(node) == expression
+    assert repr(expand(node)) == repr(expression)
+
+
+def test_literal_arrays_are_packed():
+    node = compact(["Interp", AGES, HAZARDS, "age"])
+    assert node.head == "Interp"
+    assert node.args[0].args == array("q", [20, 25, 30, 35])
+    assert node.args[1].args == array("d", HAZARDS[1:])
+    assert node.args[2] == "age"
+    assert len(node) == 4
+
+
+def test_identical_subtrees_are_shared_across_expressions():
+    first = compact(["Interp", AGES, HAZARDS, "age"])
+    second = compact(["Multiply", 2, ["Interp", list(AGES), list(HAZARDS), "age"]])
+    assert second.args[1] is first
+    assert compact(["Array", 0.0]) is not compact(["Array", -0.0])
+    assert compact(["Abs", 1]) is not compact(["Abs", 1.0])
+
+
+def test_nodes_are_immutable():
+    node = compact(["Add", 1, 2])
+    with pytest.raises(AttributeError):
+        node.head = "Subtract"
+    with pytest.raises(AttributeError):
+        node.extra = 1
+
+
+def test_pickle_interns_again():
+    node = compact(["Interp", AGES, HAZARDS, ["Add", "age", 1]])
+    assert pickle.loads(pickle.dumps(node)) is node
+
+
+def test_evaluates_like_the_expression():
+    expression = ["Interp", AGES, HAZARDS, ["Add", "age", 0.5]]
+    node = compact(expression)
+    assert isinstance(node, Node)
+    solver = create_solver({"age": 27})
+    assert solver(node.to_expression()) == solver(expression)
+
+
+def test_solvers_and_compilers_expand_nodes():
+    expression = ["Interp", AGES, HAZARDS, ["Add", "age", 0.5]]
+    node = compact(expression)
+    expected = create_solver({"age": 27})(expression)
+    assert create_solver({"age": 27})(node) == expected
+    assert compile_expression(node).expression == expression
+    assert compile_expression(node)({"age": 27}) == expected
+    assert compile_tape(node)({"age": 27}) == expected
+    assert compile_to_python(node)({"age": 27}) == expected
+    assert create_iterative_solver({"age": 27})(node) == expected
+    assert create_cse_solver({"age": 27})(node) == expected
+
+
+def test_deep_expression():
+    expression = 0
+    for _ in range(10000):
+        expression = ["Add", expression, 1]
+    node = compact(expression)
+    expanded = expand(node)
+    for _ in range(10000):
+        assert node.head == "Add" and node.args[1] == 1
+        assert expanded[0] == "Add" and expanded[2] == 1
+        node, expanded = node.args[0], expanded[1]
+    assert node == expanded == 0
@@ -0,0 +1,277 @@
+import sys
+import os
+import pickle
+import threading
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import (
+    MathJSONException,
+    create_cse_solver,
+    create_solver,
+    fold_constants,
+    share_subexpressions,
+)
+from mathjson_solver.solver import constructs
+
+
+@pytest.mark.parametrize(
+    "expression, expected_folded, expected_removed",
+    [
+        (["Add", 1, 2], 3.0, 2),
+        (
+            ["Multiply", "x", ["Divide", ["Pi"], 2]],
+            ["Multiply", "x", 1.5707963267948966],
+            2,
+        ),
+        (["Add", "x", ["Sqrt", ["Add", 2, 2]]], ["Add", "x", 2.0], 3),
+        (["List", ["Square", 3], "x"], ["List", 9, "x"], 1),
+        (["List", 1, 2], ["Array", 1, 2], 0),
+        (["If", ["Greater", 2, 1], "a", "b"], ["If", True, "a", "b"], 2),
+        (
+            ["Switch", "x", 0, [["Pi"], ["Add", 1, 1]]],
+            ["Switch", "x", 0, [3.141592653589793, 2.0]],
+            2,
+        ),
+        (["If", [["Equal", 1, 0], "a"], "b"], ["If", [False, "a"], "b"], 2),
+        (
+            ["Constants", ["k", ["Add", 1, 1]], ["Add", "k", "x"]],
+            ["Constants", ["k", 2.0], ["Add", "k", "x"]],
+            2,
+        ),
+        (
+            ["Map", "xs", ["Function", ["Multiply", "_", ["Exp", 0]]]],
+            ["Map", "xs", ["Function", ["Multiply", "_", 1.0]]],
+            1,
+        ),
+        (["Add", "x", 1], ["Add", "x", 1], 0),
+        ("x", "x", 0),
+    ],
+)
+def test_fold_constants(expression, expected_folded, expected_removed):
+    folded, removed = fold_constants(expression)
+    assert folded == expected_folded
+    assert removed == expected_removed
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        ["Now"],
+        ["Today"],
+        ["Add", ["Now"], 1],
+        ["Divide", 1, 0],
+        ["Reduce", ["Array", 1, 2, 3], ["Add"]],
+        ["Constants", ["x", 1], "x"],
+        ["Variable", "x"],
+        ["IsDefined", "x"],
+        # Unevaluated arguments are left as written.
+        ["Length", ["List", ["Add", 1, 2], 2]],
+        ["Average", ["List", ["Add", 1, 2], 2]],
+        ["In", 2, ["Array", ["Add", 1, 1]]],
+        ["Map", ["Array", 1, 2], ["Pi"]],
+        ["Switch", "x", 0, ["Pi", 10]],
+    ],
+)
+def test_not_foldable(expression):
+    assert fold_constants(expression) == (expression, 0)
+
+
+def test_fold_constants_does_not_modify_expression():
+    expression = ["Add", "x", ["Multiply", 2, 3], ["Sin", "y"]]
+    folded, _ = fold_constants(expression)
+    assert expression == ["Add", "x", ["Multiply", 2, 3], ["Sin", "y"]]
+    assert folded[3] is expression[3]
+
+
+@pytest.mark.parametrize(
+    "parameters, expression",
+    [
+        ({"x": 2}, ["Multiply", "x", ["Divide", ["Pi"], 2]]),
+        ({"x": 3}, ["Switch", "x", 0, [["Add", 1, 2], ["Square", 4]], [4, 5]]),
+        ({"x": 1}, ["If", [["Equal", "x", ["Add", 0, 1]], ["Sqrt", 9]], -1]),
+        ({}, ["Max", ["List", ["Add", 1, 2], 2]]),
+        ({}, ["Max", ["Add", 1, 2], 2]),
+        ({}, ["Sum", ["Array", 1, 2], ["Add", 3, 4]]),
+        ({}, ["Reduce", ["Range", 3], ["Function", ["Add", "_1", ["Square", "_2"]]]]),
+        ({}, ["If", [["Divide", 1, 0], 1], ["Add", 3, 4]]),
+        ({"a": ["Add", 1, 2]}, ["Multiply", "a", ["Negate", 2]]),
+    ],
+)
+def test_folded_expression_evaluates_like_original(parameters, expression):
+    solver = create_solver(parameters)
+    assert solver(fold_constants(expression)[0]) == solver(expression)
+
+
+def test_errors_quote_the_folded_node():
+    folded, _ = fold_constants(["Divide", ["Add", 1, 2], 0])
+    with pytest.raises(MathJSONException) as e:
+        create_solver({})(folded)
+    assert e.value.construct == "Divide"
+    assert str(e.value).startswith("Problem in Divide. ['Divide', 3.0, 0].")
+
+
+def test_deep_expression():
+    expression = 1
+    for _ in range(10000):
+        expression = ["Add", expression, 1]
+    assert fold_constants(expression) == (10001.0, 20000)
+
+
+def test_share_subexpressions():
+    interp = ["Interp", "ages", "hazards", ["Add", "age", 1]]
+    expression = ["Add", interp, ["Multiply", 2, list(interp)]]
+    shared, merged = share_subexpressions(expression)
+    assert shared == expression
+    assert shared[1] is shared[2][2]
+    # The repeated Interp call, and the Add inside it.
+    assert merged == 2
+    # 1, 1.0 and True are different literals.
+    shared, merged = share_subexpressions(["List", ["Abs", 1], ["Abs", 1.0]])
+    assert merged == 0
+
+
+@pytest.fixture
+def interp_calls(monkeypatch):
+    calls = []
+    interp = constructs["Interp"]
+
+    def counting_interp(s, f, c):
+        calls.append(s)
+        return interp(s, f, c)
+
+    monkeypatch.setitem(constructs, "Interp", counting_interp)
+    return calls
+
+
+GAIL_TABLES = {
+    "ages": ["Array", 20, 25, 30, 35],
+    "hazards": ["Array", 2.7e-6, 16.8e-6, 60.3e-6, 114.6e-6],
+    "age": 27,
+}
+
+
+def test_repeated_subtree_is_evaluated_once(interp_calls):
+    expression = [
+        "Add",
+        ["Interp", "ages", "hazards", "age"],
+        ["Multiply", 2, ["Interp", "ages", "hazards", "age"]],
+    ]
+    expected = create_solver(GAIL_TABLES)(expression)
+    assert len(interp_calls) == 2
+    del interp_calls[:]
+    solver = create_cse_solver(GAIL_TABLES)
+    assert solver(expression) == expected
+    assert len(interp_calls) == 1
+    # Once per evaluation, not once per solver.
+    assert solver(expression) == expected
+    assert len(interp_calls) == 2
+
+
+def test_parameter_expression_is_evaluated_once(interp_calls):
+    parameters = dict(GAIL_TABLES, h=["Interp", "ages", "hazards", "age"])
+    expression = ["Add", "h", ["Multiply", "h", "h"]]
+    assert create_cse_solver(parameters)(expression) == create_solver(
+        parameters, parameter_cache=None
+    )(expression)
+    assert len(interp_calls) == 4
+
+
+def test_reuse_follows_local_bindings(interp_calls):
+    step = ["Interp", "ages", "hazards", ["Add", "age", "x"]]
+    expression = [
+        "Reduce",
+        ["Array", 0, 1, 2],
+        0,
+        ["Add", "acc", step, step],
+        ["Variable", "acc"],
+        ["Variable", "x"],
+        ["Variable", "i"],
+    ]
+    expected = create_solver(GAIL_TABLES)(expression)
+    assert len(interp_calls) == 6
+    assert create_cse_solver(GAIL_TABLES)(expression) == expected
+    # Once per step: each step rebinds x.
+    assert len(interp_calls) == 9
+
+
+@pytest.mark.parametrize(
+    "parameters, expression",
+    [
+        # Parameter expressions see the bindings of the caller.
+        (
+            {"p": ["Add", "k", ["Square", "k"]]},
+            ["List", ["Constants", ["k", 1], "p"], ["Constants", ["k", 2], "p"]],
+        ),
+        (
+            {},
+            [
+                "Map",
+                ["Array", 1, 2, 3],
+                ["Function", ["Add", ["Square", ["Add", "_", 1]], ["Add", "_", 1]]],
+            ],
+        ),
+        (
+            {"xs": ["Array", 1, 2], "ys": ["Array", 2, 4]},
+            ["Map", "xs", ["Function", ["Interp", "xs", "ys", ["Add", "v", 0.5]], "v"]],
+        ),
+        ({"a": "a"}, ["Switch", "a", 0, ["a", 1]]),
+        ({"x": 3}, ["Add", ["Max", ["List", "x", 1]], ["Max", ["List", "x", 1]]]),
+    ],
+)
+def test_cse_solver_matches_interpreter(parameters, expression):
+    assert create_cse_solver(parameters)(expression) == create_solver(
+        parameters, parameter_cache=None
+    )(expression)
+
+
+def test_cse_solver_raises_like_interpreter():
+    expression = ["Add", ["Divide", 1, "x"], ["Divide", 1, "x"]]
+    with pytest.raises(Exception) as expected:
+        create_solver({"x": 0})(expression)
+    with pytest.raises(type(expected.value)) as actual:
+        create_cse_solver({"x": 0})(expression)
+    assert str(actual.value) == str(expected.value)
+
+
+def test_cse_solver_is_shared_by_threads(monkeypatch):
+    # One evaluation binds x and so must not reuse, or publish, the value of
+    # p computed by the other, which runs while it is paused.
+    started, computed, done = (threading.Event() for _ in range(3))
+
+    def pause(s, f, c):
+        if s[1] == 1 and "x" in c:
+            started.wait(5)
+        elif s[1] == 1:
+            started.set()
+            computed.wait(5)
+        elif "x" in c:
+            computed.set()
+            done.wait(5)
+        return 0
+
+    monkeypatch.setitem(constructs, "Pause", pause)
+    solver = create_cse_solver({"x": 2, "p": ["Square", ["Add", "x", 0]]})
+    expression = ["Add", ["Pause", 1], "p", ["Pause", 2], "p"]
+    results = {}
+
+    def run(c):
+        results[bool(c)] = solver(expression, c)
+        done.set()
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in ({"x": 5}, None)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {True: 50, False: 8}
+
+
+def test_cse_solver_is_a_solver():
+    solver = create_cse_solver([{"x": 2}, {"p": ["Square", "x"]}])
+    assert repr(solver) == "CseSolver(2 parameters)"
+    rebound = solver.with_params({"x": 3})
+    assert rebound(["Add", "p", "p"]) == 18
+    assert solver(["Add", "p", "p"]) == 8
+    assert pickle.loads(pickle.dumps(rebound))(["Add", "p", "p"]) == 18
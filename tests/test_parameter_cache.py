@@ -0,0 +1,89 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import create_solver
+from mathjson_solver.solver import constructs
+
+PARAMETERS = {
+    "weight": 72,
+    "height": 1.8,
+    "bmi": ["Divide", "weight", ["Square", "height"]],
+}
+
+
+@pytest.fixture
+def square_calls(monkeypatch):
+    calls = []
+    square = constructs["Square"]
+
+    def counting(s, f, c):
+        calls.append(s)
+        return square(s, f, c)
+
+    monkeypatch.setitem(constructs, "Square", counting)
+    return calls
+
+
+def test_parameter_expression_is_evaluated_once_per_evaluation(square_calls):
+    solver = create_solver(PARAMETERS)
+    expression = ["Add", "bmi", ["Multiply", "bmi", "bmi"]]
+    assert solver(expression) == pytest.approx(22.2222 + 22.2222**2, rel=1e-4)
+    assert len(square_calls) == 1
+    solver(expression)
+    assert len(square_calls) == 2
+
+
+def test_disabled(square_calls):
+    solver = create_solver(PARAMETERS, parameter_cache=None)
+    solver(["Add", "bmi", "bmi", "bmi"])
+    assert len(square_calls) == 3
+    assert solver.parameter_cache is None
+
+
+def test_per_solver(square_calls):
+    parameters = dict(PARAMETERS)
+    solver = create_solver(parameters, parameter_cache="solver")
+    assert solver(["Add", "bmi", "bmi"]) == solver("bmi") * 2
+    assert len(square_calls) == 1
+
+    parameters["height"] = 2
+    assert solver("bmi") == pytest.approx(72 / 1.8**2)
+    solver.parameter_cache.clear()
+    assert solver("bmi") == 18
+    assert len(square_calls) == 2
+
+
+def test_local_bindings_are_not_shadowed_by_the_cache():
+    solver = create_solver({"p": ["Add", "k", 1], "k": 0})
+    assert solver(["List", "p", ["Constants", ["k", 41], "p"], "p"]) == [
+        "Array",
+        1,
+        42,
+        1,
+    ]
+    assert solver(["Constants", ["j", 1], ["List", "p", "p"]]) == ["Array", 1, 1]
+
+
+def test_indirect_references_are_followed():
+    solver = create_solver({"q": ["Multiply", "p", 2], "p": ["Add", "k", 1], "k": 0})
+    assert solver(["List", "q", ["Constants", ["k", 1], "q"]]) == ["Array", 2, 4]
+
+
+def test_clock_is_not_cached():
+    solver = create_solver({"t": ["Now"]}, parameter_cache="solver")
+    solver("t")
+    assert "t" not in solver.parameter_cache.values
+
+
+def test_cyclic_parameters_are_not_cached():
+    solver = create_solver({"a": "b", "b": ["If", "c", "a", 1], "c": False})
+    assert solver("a") == 1
+    assert solver.parameter_cache.values == {}
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        create_solver({}, parameter_cache="forever")
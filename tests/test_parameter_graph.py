@@ -0,0 +1,86 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import (
+    MathJSONException,
+    compile_expression,
+    compile_to_python,
+    create_cse_solver,
+    create_solver,
+)
+from mathjson_solver.solver import ParameterGraph
+
+EVALUATORS = [
+    lambda parameters, expression: create_solver(parameters)(expression),
+    lambda parameters, expression: create_solver(parameters, parameter_cache=None)(
+        expression
+    ),
+    lambda parameters, expression: create_cse_solver(parameters)(expression),
+    lambda parameters, expression: compile_expression(expression)(parameters),
+    lambda parameters, expression: compile_to_python(expression)(parameters),
+]
+
+
+@pytest.mark.parametrize("evaluate", EVALUATORS)
+@pytest.mark.parametrize(
+    "parameters, message",
+    [
+        ({"a": ["Add", "a", 1]}, r"'a' \(a -> a\)"),
+        ({"a": "b", "b": "a"}, r"'a' \(a -> b -> a\)"),
+        ({"a": ["Add", "b", 1], "b": ["Multiply", "a", 2]}, r"\(a -> b -> a\)"),
+        ({"a": ["Add", "b", 1], "b": ["Add", "c", 1], "c": "b"}, r"\(b -> c -> b\)"),
+        ({"a": ["If", ["Greater", "a", 0], 1, 0]}, r"\(a -> a\)"),
+    ],
+)
+def test_cycles_raise(evaluate, parameters, message):
+    with pytest.raises(MathJSONException, match=message):
+        evaluate(parameters, ["Add", "a", 1])
+
+
+@pytest.mark.parametrize("evaluate", EVALUATORS)
+@pytest.mark.parametrize(
+    "parameters, expression, expected",
+    [
+        # A parameter bound to its own name stands for itself.
+        ({"a": "a"}, "a", "a"),
+        # A local binding breaks the cycle before it is entered again.
+        ({"x": ["Constants", ["x", 1], ["Add", "x", 1]]}, "x", 2),
+        ({"a": ["If", "flag", "a", 1], "flag": False}, "a", 1),
+        # Not a cycle: `b` is reached twice, but never from itself.
+        ({"a": ["Add", "b", "b"], "b": ["Add", "c", 1], "c": 1}, "a", 4),
+    ],
+)
+def test_not_cycles(evaluate, parameters, expression, expected):
+    assert evaluate(parameters, expression) == expected
+
+
+def test_deep_chains_are_not_cycles():
+    parameters = {"p0": 0}
+    for i in range(1, 5000):
+        parameters[f"p{i}"] = ["Add", f"p{i - 1}", 1]
+    graph = ParameterGraph(parameters)
+    assert not graph.leads_into_cycle("p4999")
+    assert graph.reachable("p3") == {"Add", "p2", "p1", "p0"}
+    assert graph.reachable("p4999") is None  # more than max_names
+    assert graph.order() == list(parameters)
+
+
+def test_order():
+    parameters = {"bmi": ["Divide", "weight", "h2"], "h2": ["Square", "height"]}
+    parameters.update(weight=72, height=1.8)
+    order = ParameterGraph(parameters).order()
+    assert sorted(order) == sorted(parameters)
+    assert order.index("h2") < order.index("bmi")
+    assert order.index("height") < order.index("h2")
+    assert order.index("weight") < order.index("bmi")
+
+
+def test_order_rejects_cycles():
+    graph = ParameterGraph({"ok": 1, "a": ["Add", "b", 1], "b": ["Negate", "a"]})
+    with pytest.raises(MathJSONException, match="Cyclic reference to parameter"):
+        graph.order()
+    assert graph.reachable("ok") == frozenset()
+    assert graph.leads_into_cycle("a") and graph.reachable("a") is None
@@ -0,0 +1,94 @@
+import sys
+import os
+import pickle
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import MathJSONException, Solver, create_solver
+
+PARAMETERS = {
+    "ages": ["Array", 20, 30, 40, 50],
+    "hazards": ["Array", 0.1, 0.2, 0.4, 0.8],
+    "hazard": ["Interp", "ages", "hazards", "age"],
+    "age": 35,
+}
+
+
+def test_counts_calls_time_and_elements_per_construct():
+    solver = create_solver(PARAMETERS, profile=True)
+    expression = ["Add", ["Multiply", "hazard", 2], ["Sum", ["Array", 1, 2, 3]]]
+    assert solver(expression) == pytest.approx(6.6)
+    constructs = solver.stats()["constructs"]
+    assert constructs["Add"]["calls"] == 1
+    assert constructs["Interp"]["calls"] == 1
+    assert constructs["Interp"]["elements"] == 8
+    assert constructs["Sum"]["elements"] == 3
+    assert constructs["Multiply"]["elements"] == 0
+    for entry in constructs.values():
+        assert 0 <= entry["self"] <= entry["total"]
+    assert constructs["Add"]["total"] >= constructs["Multiply"]["total"]
+    self_times = [entry["self"] for entry in constructs.values()]
+    assert self_times == sorted(self_times, reverse=True)
+
+
+def test_arrays_computed_by_constructs_are_counted_by_their_consumer():
+    solver = create_solver({}, profile=True)
+    solver(["Sum", ["Map", ["Array", 1, 2, 3, 4], ["Square"]]])
+    constructs = solver.stats()["constructs"]
+    assert constructs["Map"]["elements"] == 4
+    assert constructs["Sum"]["elements"] == 4
+
+
+def test_recursive_calls_count_their_time_once():
+    solver = create_solver({}, profile=True)
+    solver(["Add", 1, ["Add", 2, ["Add", 3, 4]]])
+    add = solver.stats()["constructs"]["Add"]
+    assert add["calls"] == 3
+    assert add["total"] == pytest.approx(add["self"], abs=1e-3)
+
+
+def test_counts_parameter_evaluations():
+    solver = create_solver(PARAMETERS, profile=True)
+    solver(["Add", "hazard", "hazard"])
+    parameters = solver.stats()["parameters"]
+    assert parameters["hazard"]["calls"] == 1  # then from the parameter cache
+    assert parameters["age"]["calls"] == 1
+
+    uncached = create_solver(PARAMETERS, parameter_cache=None, profile=True)
+    uncached(["Add", "hazard", "hazard"])
+    assert uncached.stats()["parameters"]["hazard"]["calls"] == 2
+
+
+def test_counters_survive_errors_and_can_be_cleared():
+    solver = create_solver({}, profile=True)
+    with pytest.raises(MathJSONException):
+        solver(["Add", 1, ["Divide", 1, 0]])
+    assert solver(["Add", 1, 2]) == 3
+    stats = solver.stats(clear=True)["constructs"]
+    assert stats["Add"]["calls"] == 2 and stats["Divide"]["calls"] == 1
+    assert all(entry["self"] >= 0 for entry in stats.values())
+    assert solver.stats() == {"constructs": {}, "parameters": {}}
+
+
+def test_profiling_is_opt_in():
+    solver = create_solver(PARAMETERS)
+    assert solver.profile is None
+    with pytest.raises(ValueError):
+        solver.stats()
+
+
+def test_profiling_solvers_keep_profiling():
+    solver = Solver(PARAMETERS, plan_cache_size=4, profile=True)
+    solver(["Multiply", "hazard", 2])
+    solver(["Multiply", "hazard", 2])
+    assert solver.stats()["constructs"]["Interp"]["calls"] == 2
+
+    rebound = solver.with_params({"age": 45})
+    rebound("hazard")
+    assert rebound.stats()["constructs"]["Interp"]["calls"] == 1
+
+    copy = pickle.loads(pickle.dumps(solver))
+    assert copy.stats() == {"constructs": {}, "parameters": {}}
+    copy("hazard")
+    assert copy.stats()["constructs"]["Interp"]["calls"] == 1
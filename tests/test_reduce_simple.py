@@ -184,6 +184,42 @@ def test_reduce_with_array_acumulator():
     assert result == expected_result, f"Expected {expected_result}, got {result}"
 
 
+def test_reduce_appending_to_a_shared_initial_array():
+    """
+    Appending builds the result in one list, without changing the initial
+    array, and a value that reads the accumulator sees it as it was.
+    """
+    parameters = {"start": ["Array", 0]}
+    names = [["Variable", "acc"], ["Variable", "x"], ["Variable", "i"]]
+    solver = create_solver(parameters)
+
+    appended = ["Reduce", ["GenerateRange", 50_000], "start", ["Appended", "acc", "x"]]
+    result = solver(appended + names)
+    assert result[:4] == ["Array", 0, 0, 1] and len(result) == 50_002
+    assert parameters["start"] == ["Array", 0]
+
+    lengths = ["Appended", ["Variable", "acc"], ["Length", "acc"]]
+    result = solver(["Reduce", ["Array", 7, 8, 9], "start", lengths] + names)
+    assert result == ["Array", 0, 1, 2, 3]
+
+
+def test_reduce_appending_a_parameter_that_reads_the_accumulator():
+    """A value reaching the accumulator through a parameter sees a snapshot."""
+    names = [["Variable", "acc"], ["Variable", "x"], ["Variable", "i"]]
+    expression = ["Reduce", ["Array", 1, 2, 3], ["Array", 0], ["Appended", "acc", "p"]]
+    result = create_solver({"p": "acc"})(expression + names)
+    assert result == [
+        "Array",
+        0,
+        ["Array", 0],
+        ["Array", 0, ["Array", 0]],
+        ["Array", 0, ["Array", 0], ["Array", 0, ["Array", 0]]],
+    ]
+    result = create_solver({"p": ["List", "acc"]})(expression + names)
+    assert result[2] == ["Array", ["Array", 0]]
+    assert result[3] == ["Array", ["Array", 0, ["Array", ["Array", 0]]]]
+
+
 if __name__ == "__main__":
     """Manual testing of the reduce cases"""
     print("Testing Reduce functionality...")
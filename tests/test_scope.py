@@ -0,0 +1,154 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import create_solver
+from mathjson_solver.solver import Scope, constructs
+
+
+@pytest.mark.parametrize(
+    "parameters, expression, expected_result",
+    [
+        # A binding is visible to the rest of its own Constants block only,
+        # not to siblings of that block.
+        ({"x": 5}, ["Add", ["Constants", ["x", 1], "x"], "x"], 6.0),
+        ({}, ["Add", ["Constants", ["y", 1], "y"], ["IsDefined", "y"]], 1.0),
+        # Nested Constants shadow outer ones, then the outer value is back.
+        (
+            {},
+            [
+                "Constants",
+                ["x", 1],
+                ["Add", ["Constants", ["x", 10], "x"], "x"],
+            ],
+            11.0,
+        ),
+        # Reduce variables do not leak out of the Reduce.
+        (
+            {"x": 100},
+            [
+                "Add",
+                [
+                    "Reduce",
+                    ["Array", 1, 2, 3],
+                    0,
+                    ["Add", "acc", "x"],
+                    ["Variable", "acc"],
+                    ["Variable", "x"],
+                    ["Variable", "i"],
+                ],
+                "x",
+            ],
+            106.0,
+        ),
+        # Function parameters do not leak into later elements' evaluation.
+        (
+            {},
+            ["Map", ["Array", 1, 2], ["Function", ["IsDefined", "n"], "n"]],
+            ["Array", True, True],
+        ),
+    ],
+)
+def test_scope_bindings_do_not_leak(parameters, expression, expected_result):
+    solver = create_solver(parameters)
+    assert solver(expression) == expected_result
+
+
+def test_child_shares_bindings_until_first_write():
+    table = ["Array"] + list(range(10000))
+    parent = Scope()
+    parent["table"] = table
+    child = parent.child()
+    assert child.parent is parent
+    assert child["table"] is table
+
+    child["x"] = 1
+    assert "x" in child
+    assert "x" not in parent
+    # Copy-on-write is shallow: the bound array itself is never copied.
+    assert child["table"] is table
+
+
+def test_solver_accepts_plain_dict_scope_without_mutating_it():
+    solver = create_solver({})
+    local = {"a": 2}
+    assert solver(["Constants", ["a", 3], ["Multiply", "a", "a"]], local) == 9.0
+    assert solver(["Multiply", "a", "a"], local) == 4.0
+    assert local == {"a": 2}
+
+
+@pytest.fixture
+def sqrt_calls(monkeypatch):
+    calls = []
+    sqrt = constructs["Sqrt"]
+
+    def counting(s, f, c):
+        calls.append(s[1])
+        return sqrt(s, f, c)
+
+    monkeypatch.setitem(constructs, "Sqrt", counting)
+    return calls
+
+
+def test_constants_are_evaluated_on_first_use_only(sqrt_calls):
+    expression = [
+        "Constants",
+        ["unused", ["Sqrt", 1]],
+        ["failing", ["Sqrt", ["Divide", 1, 0]]],
+        ["used", ["Sqrt", 4]],
+        ["Add", "used", "used", "used"],
+    ]
+    assert create_solver({})(expression) == 6
+    assert sqrt_calls == [4]
+
+
+@pytest.mark.parametrize(
+    "parameters, expression, expected_result",
+    [
+        # A binding sees the bindings before it, not the ones after it; a
+        # value that is a name is looked up again where it is used.
+        ({}, ["Constants", ["y", "x"], ["x", 2], "y"], 2),
+        ({"x": 1}, ["Constants", ["y", "x"], ["x", 2], ["List", "x", "y"]], [2, 1]),
+        ({"x": 1}, ["Constants", ["y", ["Add", "x", 0]], ["x", 2], "y"], 1),
+        (
+            {"x": 1},
+            ["Constants", ["x", ["Add", "x", 1]], ["x", ["Add", "x", 1]], "x"],
+            3,
+        ),
+        # A failing binding is None wherever it is used.
+        (
+            {},
+            ["Constants", ["bad", ["Divide", 1, 0]], ["List", "bad", "bad"]],
+            [None, None],
+        ),
+        # Bindings used only by a parameter expression are still bound.
+        ({"p": ["Add", "k", 1]}, ["Constants", ["k", 41], "p"], 42),
+        # Used by the next binding only.
+        ({}, ["Constants", ["a", 2], ["b", ["Multiply", "a", 3]], "b"], 6),
+        # A later binding of the same name hides, and sees, the earlier one,
+        # also from a parameter expression and inside a nested Constants.
+        ({}, ["Constants", ["a", 1], ["a", ["Add", "a", 1]], "a"], 2),
+        (
+            {"p": ["Add", "a", 1]},
+            ["Constants", ["a", 1], ["b", "p"], ["a", 100], ["List", "b", "p"]],
+            [2, 101],
+        ),
+        (
+            {},
+            [
+                "Constants",
+                ["x", 1],
+                ["Constants", ["y", "x"], ["x", 10], ["Add", "y", "x"]],
+            ],
+            11,
+        ),
+        ({}, ["Constants", ["a", ["IsDefined", "b"]], ["b", 1], "a"], False),
+    ],
+)
+def test_lazy_constants_keep_eager_semantics(parameters, expression, expected_result):
+    result = create_solver(parameters)(expression)
+    if isinstance(result, list) and result[:1] == ["Array"]:
+        result = result[1:]
+    assert result == expected_result
@@ -0,0 +1,170 @@
+import sys
+import os
+import pickle
+import functools
+import threading
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import Solver, create_solver
+
+PARAMETERS = {
+    "weight": 72,
+    "height": 1.8,
+    "bmi": ["Divide", "weight", ["Square", "height"]],
+}
+EXPRESSION = ["If", ["Greater", "bmi", 25], "overweight", ["Round", "bmi", 1]]
+
+
+def test_create_solver_returns_a_solver():
+    solver = create_solver(PARAMETERS)
+    assert isinstance(solver, Solver)
+    assert solver.solver_parameters is PARAMETERS
+    assert solver(EXPRESSION) == 22.2
+    assert repr(solver) == "Solver(3 parameters, parameter_cache='evaluation')"
+
+
+def test_pickles_small():
+    solver = Solver(PARAMETERS, parameter_cache="solver", plan_cache_size=4)
+    solver(EXPRESSION)
+    data = pickle.dumps(solver)
+    assert len(data) < 200 + len(pickle.dumps(PARAMETERS))
+    copy = pickle.loads(data)
+    assert copy.solver_parameters == PARAMETERS
+    assert copy.parameter_cache_mode == "solver"
+    assert copy.plan_cache_size == 4
+    assert copy(EXPRESSION) == 22.2
+
+
+@pytest.mark.parametrize("parameter_cache", ["evaluation", "solver", None])
+@pytest.mark.parametrize(
+    "parameters, expression",
+    [
+        (
+            {
+                "w": 70,
+                "h": 1.8,
+                "bmi": ["Divide", "w", ["Square", "h"]],
+                "a": ["Multiply", "w", 2],
+                "s": ["Add", "bmi", "a"],
+            },
+            ["Add", "s", "bmi"],
+        ),
+        # Guarded against cycles, but not one.
+        ({"y": ["Constants", ["y", 1], ["Add", "y", 1]]}, ["Add", "y", "y"]),
+    ],
+)
+def test_shared_between_threads(parameter_cache, parameters, expression):
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        solver = Solver(parameters, parameter_cache=parameter_cache)
+        expected = solver(expression)
+        failures = []
+
+        def run():
+            for _ in range(300):
+                try:
+                    assert solver(expression) == expected
+                except Exception as e:
+                    failures.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert failures == []
+
+
+def test_usable_as_cache_key():
+    solver = Solver(PARAMETERS)
+
+    @functools.lru_cache
+    def score(solver):
+        return solver(EXPRESSION)
+
+    assert score(solver) == score(solver) == 22.2
+    assert score.cache_info().hits == 1
+
+
+def test_plans_are_compiled_once_and_reused():
+    solver = Solver(PARAMETERS, plan_cache_size=2)
+    assert solver(EXPRESSION) == 22.2
+    plan = solver._plans[id(EXPRESSION)][1]
+    assert solver(EXPRESSION) == 22.2
+    assert solver._plans[id(EXPRESSION)][1] is plan
+
+
+def test_plans_use_the_parameter_cache():
+    solver = Solver(PARAMETERS, parameter_cache="solver", plan_cache_size=2)
+    assert solver(EXPRESSION) == 22.2
+    assert list(solver.parameter_cache.values) == ["bmi"]
+    solver.parameter_cache.values["bmi"] = 30
+    assert solver(EXPRESSION) == "overweight"
+
+
+def test_plans_are_evicted_least_recently_used_first():
+    solver = Solver({"x": 2}, plan_cache_size=2)
+    a, b, c = ["Add", "x", 1], ["Add", "x", 2], ["Add", "x", 3]
+    assert [solver(a), solver(b), solver(a), solver(c)] == [3, 4, 3, 5]
+    assert set(solver._plans) == {id(a), id(c)}
+
+
+def test_plans_match_the_interpreter():
+    expressions = [
+        EXPRESSION,
+        ["Divide", "x", 0],
+        ["Constants", ["k", 2], ["Multiply", "k", "x"]],
+    ]
+    for expression in expressions:
+        results = []
+        for solver in (Solver({"x": 3}), Solver({"x": 3}, plan_cache_size=8)):
+            try:
+                results.append(solver(expression))
+            except Exception as e:
+                results.append(str(e))
+        assert results[0] == results[1]
+
+
+def test_unknown_parameter_cache_mode():
+    with pytest.raises(ValueError):
+        Solver({}, parameter_cache="forever")
+
+
+DEFAULTS = {
+    "bmi": ["Divide", "weight", ["Square", "height"]],
+    "cutoff": 30,
+    "table": ["Array", 1, 2, 3],
+}
+
+
+def test_layers_are_looked_up_in_order():
+    tenant = {"cutoff": 25}
+    solver = create_solver([{"weight": 72, "height": 1.8}, tenant, DEFAULTS])
+    assert solver(["Greater", "bmi", "cutoff"]) is False
+    assert solver(["IsDefined", "table"]) is True
+    tenant["cutoff"] = 20
+    assert solver(["Greater", "bmi", "cutoff"]) is True
+
+
+def test_with_params_rebinds_without_copying():
+    base = create_solver([{"cutoff": 25}, DEFAULTS])
+    heavy = base.with_params({"weight": 90, "height": 1.8})
+    light = base.with_params({"weight": 50, "height": 1.8})
+    assert heavy(["Greater", "bmi", "cutoff"]) is True
+    assert light(["Greater", "bmi", "cutoff"]) is False
+    assert heavy.solver_parameters.maps[2] is DEFAULTS
+    assert base("weight") == "weight"
+    assert base.with_params({"cutoff": 20})("cutoff") == 20
+
+
+def test_with_params_keeps_options():
+    base = Solver(DEFAULTS, parameter_cache="solver", plan_cache_size=2)
+    rebound = base.with_params({"weight": 72, "height": 1.8})
+    assert rebound.parameter_cache_mode == "solver"
+    assert rebound(EXPRESSION) == 22.2
+    assert pickle.loads(pickle.dumps(rebound))(EXPRESSION) == 22.2
@@ -0,0 +1,170 @@
+import sys
+import os
+import pickle
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import (
+    create_solver,
+    compile_tape,
+    create_iterative_solver,
+    MathJSONException,
+)
+from mathjson_solver.solver import constructs
+from mathjson_solver.tape import FALLBACK
+
+CASES = [
+    ({"x": 2, "y": 3}, ["Add", "x", "y", 4]),
+    ({"x": 2, "y": 3}, ["Multiply", ["Add", "x", 1], ["Subtract", "y", 1]]),
+    ({}, ["Add", "2024-01-01", ["TimeDeltaDays", 3]]),
+    ({"x": "5"}, ["Add", "x", "not a number", 1]),
+    ({"a": ["Array", 1, 2, 3]}, ["Max", "a"]),
+    ({}, ["List", ["Sinc", 0], ["Pi"], ["Arctan2", 1, 1], ["Log", 8, 2]]),
+    ({"x": 5}, ["If", ["Greater", "x", 3], 42, 99]),
+    ({"x": 1}, ["If", ["Greater", "x", 3], 42]),
+    ({}, ["If", [["Equal", 1, 1], ["Divide", 1, 0]], 7]),
+    ({}, ["If", [["Divide", 1, 0], 1], 7]),
+    ({"p": ["Divide", 1, 0]}, ["If", [["Greater", 1, 0], "p"], 7]),
+    (
+        {},
+        [
+            "If",
+            [["Equal", 1, 1], ["If", [["Equal", 1, 1], ["Divide", 1, 0]], 5]],
+            7,
+        ],
+    ),
+    ({"14": "1"}, ["Switch", "14", 0, ["0", 0], ["1", 1], ["2", 2]]),
+    ({"v": 2}, ["Which", "v", -1, [1, 10], [2, 20]]),
+    ({"v": "2"}, ["StrictSwitch", "v", -1, [2, 20], ["2", 22]]),
+    ({"v": 5}, ["Switch", "v", ["Add", "v", 1], [1, 10]]),
+    ({"a": 1, "b": 0}, ["And", "a", ["Or", "b", ["Not", "b"]]]),
+    ({"a": 1, "b": 0}, ["Or", "b", ["And", "a", "b"]]),
+    ({}, ["And"]),
+    ({"x": 5}, ["Constants", ["x", 100], ["Add", "x", 1]]),
+    (
+        {"x": 10},
+        [
+            "Constants",
+            ["bad", ["Divide", "missing", 2]],
+            ["good", "x"],
+            ["If", [["Greater", "good", 0], "good"], "bad"],
+        ],
+    ),
+    ({"p": ["Add", "k", 1]}, ["Constants", ["k", 41], "p"]),
+    ({"a": "b", "b": ["Add", "c", 1], "c": 2}, ["Multiply", "a", 2]),
+    ({}, ["Map", ["Array", 1, 2, 3], ["Function", ["Add", "n", 1], "n"]]),
+    ({"a": ["Add", "b", 1], "b": 2}, ["Multiply", "a", 2]),
+    ({"a": "a"}, "a"),
+    ({}, ["NotAConstruct", 1]),
+    ({}, ["Array", 1, 2]),
+    ({}, []),
+]
+
+ERROR_CASES = [
+    ({}, ["Divide", 1, 0]),
+    ({}, ["Power", 1]),
+    ({}, ["Sqrt", "x"]),
+    ({}, ["If", ["Greater", 1, 0]]),
+    ({}, ["Add", 1, ["Multiply", 2, ["Ln", 0]]]),
+    ({}, ["Variable", "undefined"]),
+    ({"p": [["Add"], 1]}, ["Add", "p", 1]),
+    ({}, ["Multiply", [["Add"], 1]]),
+    ({}, ["Constants", ["x", 1], ["Divide", "x", 0]]),
+    ({"p": ["Divide", 1, 0]}, ["Add", "p", 1]),
+    # Raised by the If itself, so not caught by its own branch handler.
+    ({"p": [["Add"], 1]}, ["If", [["Greater", 1, 0], "p"], 7]),
+]
+
+
+@pytest.mark.parametrize("parameters, expression", CASES)
+def test_tape_matches_interpreter(parameters, expression):
+    tape = compile_tape(expression)
+    assert tape(parameters) == create_solver(parameters)(expression)
+
+
+@pytest.mark.parametrize("parameters, expression", ERROR_CASES)
+def test_tape_raises_like_interpreter(parameters, expression):
+    with pytest.raises(Exception) as expected:
+        create_solver(parameters)(expression)
+    with pytest.raises(type(expected.value)) as actual:
+        compile_tape(expression)(parameters)
+    assert str(actual.value) == str(expected.value)
+
+
+def test_tape_is_flat_and_picklable():
+    tape = compile_tape(["Add", "x", ["Multiply", "y", ["Sqrt", 4]]])
+    assert tape.code.typecode == "b"
+    assert len(tape) == 6
+    assert tape.constants == ["x", "y", 4]
+    data = pickle.dumps(tape)
+    assert len(data) < 100 + len(pickle.dumps(tape.expression))
+    restored = pickle.loads(data)
+    assert list(restored.code) == list(tape.code)
+    assert restored({"x": 1, "y": 2}) == 5.0
+    assert "VALUES" in tape.disassemble()
+
+
+def test_every_construct_compiles():
+    for head in constructs:
+        tape = compile_tape([head])
+        assert len(tape) >= 1
+    assert compile_tape(["Median", ["Array", 1, 2]]).code[0] == FALLBACK
+
+
+def test_iterative_solver_is_not_limited_by_recursion():
+    depth = 10000
+    additions = 0
+    rules = -1
+    for i in range(depth):
+        additions = ["Add", additions, 1]
+        rules = ["If", [["Equal", "x", i], i], rules]
+    parameters = {"x": depth - 1, "p0": 0}
+    for i in range(1, depth):
+        parameters[f"p{i}"] = ["Add", f"p{i - 1}", 1]
+
+    solver = create_iterative_solver(parameters)
+    assert solver(additions) == depth
+    assert solver(rules) == depth - 1
+    assert solver(f"p{depth - 1}") == depth - 1
+
+
+def test_iterative_solver_is_a_solver():
+    solver = create_iterative_solver([{"x": 2}, {"y": ["Add", "x", 1]}])
+    assert repr(solver) == "IterativeSolver(2 parameters)"
+    assert solver(["Multiply", "x", "y"]) == 6
+    rebound = solver.with_params({"x": 5})
+    assert rebound(["Multiply", "x", "y"]) == 30
+    assert rebound.solver_parameters.maps[1:] == solver.solver_parameters.maps
+    copy = pickle.loads(pickle.dumps(rebound))
+    assert copy(["Multiply", "x", "y"]) == 30
+    with pytest.raises(ValueError):
+        solver.stats()
+
+
+def test_iterative_solver_nests_lowered_constructs_inside_fallbacks():
+    body = "n"
+    for _ in range(5000):
+        body = ["Add", body, 1]
+    expression = ["Map", ["Array", 1, 2], ["Function", body, "n"]]
+    assert create_iterative_solver({})(expression) == ["Array", 5001, 5002]
+
+
+@pytest.mark.parametrize(
+    "parameters",
+    [
+        {"a": "b", "b": "a"},
+        {"a": ["Add", "b", 1], "b": ["Multiply", "a", 2]},
+        {"a": ["If", ["Greater", "a", 0], 1, 0]},
+        # Through constructs run by FALLBACK.
+        {"a": ["Max", "a", 1]},
+        {"a": ["Round", "a"]},
+        {"a": ["Add", ["Max", "b", 1]], "b": ["Round", "a"]},
+    ],
+)
+def test_iterative_solver_reports_cycles(parameters):
+    with pytest.raises(MathJSONException) as expected:
+        create_solver(parameters)(["Add", "a", 1])
+    with pytest.raises(MathJSONException, match="Cyclic reference to parameter") as e:
+        create_iterative_solver(parameters)(["Add", "a", 1])
+    assert str(e.value) == str(expected.value)
@@ -0,0 +1,90 @@
+import sys
+import os
+import json
+import pickle
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src/"))
+
+from mathjson_solver import MathJSONException, Solver, create_solver
+from mathjson_solver.tracing import summary
+
+PARAMETERS = {"x": 3, "p": ["Add", "x", 1]}
+EXPRESSION = ["Add", ["Multiply", "x", 2], "p"]
+
+
+def _events(path):
+    with open(path) as f:
+        text = f.read()
+    assert text.startswith("[\n")
+    return json.loads(text.rstrip().rstrip(",") + "]")
+
+
+def test_spans_of_a_traced_evaluation(tmp_path):
+    path = str(tmp_path / "trace.json")
+    solver = create_solver(PARAMETERS, trace=path)
+    assert solver(EXPRESSION) == 10
+    events = _events(path)
+    spans = {(e["cat"], e["name"]): e for e in events}
+    assert set(spans) == {
+        ("evaluation", "evaluation"),
+        ("construct", "Add"),
+        ("construct", "Multiply"),
+        ("parameter", "x"),
+        ("parameter", "p"),
+    }
+    assert [spans["construct", n]["args"]["depth"] for n in ("Add", "Multiply")] == [
+        1,
+        2,
+    ]
+    assert spans["parameter", "p"]["args"]["depth"] == 2
+    assert spans["construct", "Add"]["args"]["expression"] == json.dumps(EXPRESSION)
+    for event in events:
+        assert event["ph"] == "X" and event["dur"] >= 0
+        assert event["pid"] == os.getpid() and "tid" in event
+    outer, inner = spans["construct", "Add"], spans["construct", "Multiply"]
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_one_in_n_evaluations_is_traced(tmp_path):
+    path = str(tmp_path / "trace.json")
+    solver = create_solver(PARAMETERS, trace=path, trace_sample=3)
+    results = [solver(EXPRESSION) for _ in range(7)]
+    assert results == [10] * 7
+    evaluations = [e for e in _events(path) if e["name"] == "evaluation"]
+    assert len(evaluations) == 3
+
+
+def test_failed_evaluations_are_traced(tmp_path):
+    path = str(tmp_path / "trace.json")
+    solver = create_solver({}, trace=path)
+    with pytest.raises(MathJSONException):
+        solver(["Add", 1, ["Divide", 1, 0]])
+    divide = [e for e in _events(path) if e["name"] == "Divide"][0]
+    assert "division by zero" in divide["args"]["error"]
+    assert solver(["Add", 1, 2]) == 3
+
+
+def test_solvers_share_a_trace_file(tmp_path):
+    path = str(tmp_path / "trace.json")
+    solver = Solver(PARAMETERS, trace=path, trace_sample=2)
+    rebound = solver.with_params({"x": 5})
+    copy = pickle.loads(pickle.dumps(solver))
+    assert copy.tracer.path == path and copy.tracer.sample == 2
+    assert [solver(EXPRESSION), rebound(EXPRESSION), copy(EXPRESSION)] == [10, 16, 10]
+    copy.tracer.close()
+    evaluations = [e for e in _events(path) if e["name"] == "evaluation"]
+    assert len(evaluations) == 2
+
+
+def test_sample_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        create_solver({}, trace=str(tmp_path / "trace.json"), trace_sample=0)
+
+
+def test_summary():
+    assert summary(["Add", "x", 1.5], 80) == '["Add", "x", 1.5]'
+    long = summary(["Array"] + list(range(1000)), 40)
+    assert long.startswith('["Array", 0, 1, 2') and long.endswith("...")
+    assert len(long) == 40